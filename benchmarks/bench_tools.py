@@ -0,0 +1,105 @@
+"""
+Tool-call benchmarks
+Latency of the hot tool paths against a fake Bedrock client.
+
+Usage (from the repository root, with pytest-benchmark installed):
+    pytest benchmarks                                  # run and compare by eye
+    pytest benchmarks --benchmark-storage=benchmarks/baselines \
+        --benchmark-compare=0001 --benchmark-compare-fail=mean:25%
+    pytest benchmarks --benchmark-storage=benchmarks/baselines --benchmark-save=baseline
+
+Baselines are stored as JSON under benchmarks/baselines/<machine>/, so a change that
+slows a tool down shows up in review next to the committed numbers.
+"""
+
+import itertools
+import json
+
+import pytest
+from mcp.types import CallToolResult
+
+from conftest import PROMPT, make_record, populate
+
+HISTORY_SIZES = [100, 1_000, 10_000]
+STARTUP_SIZES = [10_000, 100_000]
+
+
+def test_start_async_invoke(benchmark, server, run):
+    """Submit one job (validation, accounting, indexing and saving the store) with 1k jobs tracked"""
+    populate(server.store, 1_000)
+    seeds = itertools.count()
+
+    def submit():
+        return run(server.start_async_invoke(PROMPT, seed=next(seeds)))
+
+    result = benchmark.pedantic(submit, rounds=100, iterations=1, warmup_rounds=1)
+    assert "job_id" in result, result
+
+
+@pytest.mark.parametrize("count", HISTORY_SIZES)
+def test_list_async_invokes(benchmark, server, run, count):
+    """List every tracked job of the tenant; finished jobs are not polled"""
+    populate(server.store, count)
+
+    result = benchmark(lambda: run(server.list_async_invokes()))
+    assert result["total_invocations"] == count, result
+
+
+@pytest.mark.parametrize("count", HISTORY_SIZES)
+def test_get_async_invoke_by_arn(benchmark, server, run, count):
+    """Look up one job by invocation ARN among `count` tracked jobs"""
+    populate(server.store, count)
+    arn = make_record(count // 2).invocation_arn
+
+    result = benchmark(lambda: run(server.get_async_invoke(arn)))
+    assert result["invocation_arn"] == arn, result
+
+
+@pytest.mark.parametrize("count", STARTUP_SIZES)
+def test_load_invocations(benchmark, server, count):
+    """Read the invocations file and rebuild the indexes at startup"""
+    populate(server.store, count)
+    server.save_invocations()
+
+    benchmark.pedantic(server.load_invocations, rounds=5, iterations=1)
+    assert len(server.store) == count
+
+
+@pytest.mark.parametrize("count", STARTUP_SIZES)
+def test_load_invocations_snapshot(benchmark, server, tmp_path, count):
+    """Open the memory-mapped snapshot at startup; records are decoded when accessed"""
+    server.store.snapshot_path = str(tmp_path / "invocations.snapshot")
+    populate(server.store, count)
+    server.save_invocations()
+
+    benchmark.pedantic(server.load_invocations, rounds=5, iterations=1)
+    assert len(server.store) == count
+
+
+def tool_caller(server, run, name: str):
+    """Call a tool, convert its result as fastmcp does and serialize it as the transport does"""
+    tool = run(server.mcp.get_tool(name))
+
+    def call(**arguments) -> str:
+        result = tool.convert_result(run(getattr(server, name)(**arguments)))
+        wire = CallToolResult(content=result.content, structuredContent=result.structured_content)
+        return wire.model_dump_json(by_alias=True, exclude_none=True)
+
+    return call
+
+
+@pytest.mark.parametrize("section", [None, "camera_control"])
+def test_get_prompting_guide(benchmark, server, run, section):
+    """Return the guide response and serialize it as the transport does"""
+    call = tool_caller(server, run, "get_prompting_guide")
+    result = benchmark(lambda: call(section=section))
+    assert "version" in json.loads(result)["structuredContent"]
+
+
+def test_get_prompting_guide_not_modified(benchmark, server, run):
+    """Revalidate a guide the client already holds"""
+    call = tool_caller(server, run, "get_prompting_guide")
+    version = json.loads(call())["structuredContent"]["version"]
+
+    result = benchmark(lambda: call(known_version=version))
+    assert "not_modified" in json.loads(result)["structuredContent"]
@@ -0,0 +1,93 @@
+"""
+Benchmark fixtures
+A Nova Reel server module wired to a fake Bedrock client and a temporary store.
+
+Nothing here talks to AWS: the fake client answers instantly, so the numbers
+measure the server's own work (validation, indexing, persistence, serialization).
+"""
+
+import asyncio
+import importlib.util
+import itertools
+import os
+import sys
+
+import pytest
+
+# Add src directory to path to import the server modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from novareel_mcp_server import server as server_module
+from novareel_mcp_server.accounting import Accountant
+from novareel_mcp_server.records import InvocationRecord, JobStatus
+from novareel_mcp_server.store import InvocationStore
+
+if importlib.util.find_spec("pytest_benchmark") is None:
+    # No benchmark fixture without the plugin: plain pytest runs the unit tests only
+    collect_ignore_glob = ["bench_*.py"]
+
+BUCKET = "my-novareel-bucket"
+REGION = "us-east-1"
+PROMPT = ("A majestic eagle soars over a mountain valley at golden hour, camera tracking "
+          "its flight as it circles above a pristine lake")
+
+
+class FakeBedrockClient:
+    """Answers start_async_invoke and get_async_invoke like Bedrock, without the network"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def start_async_invoke(self, **request):
+        job_id = f"{next(self._ids):012x}fake"
+        return {"invocationArn": f"arn:aws:bedrock:{REGION}:123456789012:async-invoke/{job_id}"}
+
+    def get_async_invoke(self, invocationArn):
+        return {"invocationArn": invocationArn, "status": "InProgress"}
+
+
+def make_record(index: int, status: JobStatus = JobStatus.COMPLETED) -> InvocationRecord:
+    """A tracked job as it looks after a typical generation"""
+    job_id = f"{index:012x}abcd"
+    record = InvocationRecord(
+        job_id=job_id,
+        invocation_arn=f"arn:aws:bedrock:{REGION}:123456789012:async-invoke/{job_id}",
+        prompt=PROMPT,
+        duration_seconds=12,
+        fps=24,
+        dimension="1280x720",
+        seed=index,
+        task_type="MULTI_SHOT_AUTOMATED",
+        s3_location=f"s3://{BUCKET}/{job_id}",
+        status=status,
+    )
+    if status is JobStatus.COMPLETED:
+        record.video_url = f"https://{BUCKET}.s3.{REGION}.amazonaws.com/{job_id}/output.mp4"
+        record.completed_at = record.created_at + 90
+    return record
+
+
+def populate(store: InvocationStore, count: int):
+    """Fill the store with `count` finished jobs"""
+    for index in range(count):
+        store.add(make_record(index))
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """The stdio server module with a fake Bedrock client and an empty store in tmp_path"""
+    monkeypatch.setattr(server_module, "store", InvocationStore(str(tmp_path / "invocations.json")))
+    monkeypatch.setattr(server_module, "bedrock_client", FakeBedrockClient())
+    monkeypatch.setattr(server_module, "s3_bucket", BUCKET)
+    monkeypatch.setattr(server_module, "aws_region", REGION)
+    monkeypatch.setattr(server_module, "accountant", Accountant())
+    monkeypatch.setattr(server_module, "webhook_url", None)
+    return server_module
+
+
+@pytest.fixture
+def run():
+    """Run a tool coroutine to completion on one event loop shared by the whole benchmark"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
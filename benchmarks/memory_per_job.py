@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for tracked invocations
+Compares bytes per job of the old dict records with InvocationRecord.
+
+Usage: python benchmarks/memory_per_job.py [count]
+"""
+
+import gc
+import sys
+import os
+import tracemalloc
+from datetime import datetime
+
+# Add src directory to path to import the server modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from novareel_mcp_server.records import InvocationRecord, JobStatus
+
+BUCKET = "my-novareel-bucket"
+REGION = "us-east-1"
+PROMPT = ("A majestic eagle soars over a mountain valley at golden hour, camera tracking "
+          "its flight as it circles above a pristine lake")
+
+
+def job_fields(index: int):
+    job_id = f"{index:012x}abcd"
+    return {
+        "invocation_arn": f"arn:aws:bedrock:{REGION}:123456789012:async-invoke/{job_id}",
+        "job_id": job_id,
+        "s3_location": f"s3://{BUCKET}/{job_id}",
+        "video_url": f"https://{BUCKET}.s3.{REGION}.amazonaws.com/{job_id}/output.mp4",
+    }
+
+
+def make_dict(index: int):
+    fields = job_fields(index)
+    return {
+        "invocation_arn": fields["invocation_arn"],
+        "job_id": fields["job_id"],
+        "prompt": PROMPT,
+        "duration_seconds": 12,
+        "fps": 24,
+        "dimension": "1280x720",
+        "seed": index,
+        "task_type": "MULTI_SHOT_AUTOMATED",
+        "s3_location": fields["s3_location"],
+        "status": "Completed",
+        "created_at": datetime.now().isoformat(),
+        "video_url": fields["video_url"],
+        "completed_at": datetime.now().isoformat(),
+    }
+
+
+def make_record(index: int):
+    fields = job_fields(index)
+    record = InvocationRecord(
+        job_id=fields["job_id"],
+        invocation_arn=fields["invocation_arn"],
+        prompt=PROMPT,
+        duration_seconds=12,
+        fps=24,
+        dimension="1280x720",
+        seed=index,
+        task_type="MULTI_SHOT_AUTOMATED",
+        s3_location=fields["s3_location"],
+        status=JobStatus.COMPLETED,
+    )
+    record.video_url = fields["video_url"]
+    record.completed_at = datetime.now().timestamp()
+    return record
+
+
+def measure(factory, count: int) -> float:
+    """Return traced bytes per job for `count` jobs built by `factory`"""
+    gc.collect()
+    tracemalloc.start()
+    jobs = {}
+    for index in range(count):
+        job = factory(index)
+        jobs[f"{index:012x}abcd"] = job
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del jobs
+    return current / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    as_dicts = measure(make_dict, count)
+    as_records = measure(make_record, count)
+
+    print(f"Jobs:              {count}")
+    print(f"dict records:      {as_dicts:8.0f} bytes/job")
+    print(f"InvocationRecord:  {as_records:8.0f} bytes/job")
+    print(f"Saved:             {as_dicts - as_records:8.0f} bytes/job ({1 - as_records / as_dicts:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main import start_async_invoke, get_async_invoke, list_async_invokes, get_prompting_guide
 
+# Poll interval when the server gives no estimate (e.g. for a job in an unexpected state)
+DEFAULT_POLL_SECONDS = 30
+
+
+def print_eta(response):
+    """Print the server's completion estimate, if it made one"""
+    if "eta_seconds" in response:
+        print(f"   ETA: about {response['eta_seconds']} seconds")
+
 async def basic_video_generation():
     """
     Example of basic video generation workflow
@@ -38,7 +47,7 @@ async def basic_video_generation():
             prompt=prompt,
             duration_seconds=24,  # 24 second video
             fps=24,
-            dimension="1920x1080"  # Full HD
+            dimension="1280x720"  # HD, the only dimension Nova Reel 1.1 supports
         )
         
         if "error" in result:
@@ -50,12 +59,14 @@ async def basic_video_generation():
         print(f"   Job ID: {job_id}")
         print(f"   Status: {result['status']}")
         print(f"   Estimated URL: {result['estimated_video_url']}")
+        print_eta(result)
         print()
         
-        # Monitor progress
+        # Monitor progress, polling when the server expects the job to have moved on
         print("⏳ Monitoring progress...")
-        max_attempts = 60  # Wait up to 5 minutes (60 * 5 seconds)
+        max_attempts = 30
         attempt = 0
+        await asyncio.sleep(result.get("next_poll_in_seconds", DEFAULT_POLL_SECONDS))
         
         while attempt < max_attempts:
             status_result = await get_async_invoke(job_id)
@@ -79,8 +90,9 @@ async def basic_video_generation():
                     print(f"   Reason: {status_result['failure_message']}")
                 break
             
-            # Wait 5 seconds before checking again
-            await asyncio.sleep(5)
+            # Wait as long as the server recommends before checking again
+            print_eta(status_result)
+            await asyncio.sleep(status_result.get("next_poll_in_seconds", DEFAULT_POLL_SECONDS))
             attempt += 1
         
         if attempt >= max_attempts:
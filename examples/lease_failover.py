@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Lease failover example for Nova Reel MCP Server
+Runs several poller replicas as local processes against one SQLite store and
+shows that every job is polled by exactly one replica, and that polling fails
+over to another replica within the lease TTL when the leader is killed.
+
+No AWS access is needed: replicas use a stand-in refresh that only records
+which replica polled which job.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+# Add src directory to path to import the server modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from novareel_mcp_server.leases import POLLER_LEASE, LeaseManager
+from novareel_mcp_server.poller import BackgroundPoller
+from novareel_mcp_server.records import InvocationRecord
+from novareel_mcp_server.sqlite_store import SQLiteInvocationStore
+
+REPLICAS = 3
+JOBS = 10
+POLL_INTERVAL = 0.5
+LEASE_TTL = 2.0
+
+
+def run_replica(db_path: str, owner: str, events):
+    """One replica: a background poller whose refresh reports (time, owner, job_id)"""
+    store = SQLiteInvocationStore(db_path, owner=owner, lease_seconds=LEASE_TTL)
+
+    async def refresh(record):
+        events.put((time.time(), owner, record.job_id))
+
+    leases = LeaseManager(db_path, owner, LEASE_TTL)
+    poller = BackgroundPoller(store, refresh, POLL_INTERVAL, concurrency=4, leases=leases)
+    asyncio.run(poller.run())
+
+
+def drain(events):
+    polls = []
+    while not events.empty():
+        polls.append(events.get())
+    return polls
+
+
+def main():
+    db_path = os.path.join(tempfile.mkdtemp(), "novareel.db")
+    store = SQLiteInvocationStore(db_path)
+    for index in range(JOBS):
+        store.add(InvocationRecord(
+            job_id=f"job{index:03d}", invocation_arn=f"arn:example/job{index:03d}",
+            prompt="example", duration_seconds=12, fps=24, dimension="1280x720",
+            seed=index, task_type="MULTI_SHOT_AUTOMATED", s3_location=f"s3://example/job{index:03d}"
+        ))
+
+    events = multiprocessing.Queue()
+    replicas = {}
+    for index in range(REPLICAS):
+        owner = f"replica-{index}"
+        process = multiprocessing.Process(target=run_replica, args=(db_path, owner, events), daemon=True)
+        process.start()
+        replicas[owner] = process
+
+    print(f"🔁 {REPLICAS} replicas polling {JOBS} jobs (lease TTL {LEASE_TTL}s)")
+    time.sleep(3)
+    polls = drain(events)
+    pollers = {owner for _, owner, _ in polls}
+    print(f"   {len(polls)} polls, made by: {sorted(pollers)}")
+    assert len(pollers) == 1, "more than one replica polled"
+
+    leader = pollers.pop()
+    print(f"💥 Killing leader {leader}")
+    replicas[leader].kill()
+    killed_at = time.time()
+
+    deadline = killed_at + LEASE_TTL + POLL_INTERVAL + 2
+    new_leader = None
+    while time.time() < deadline and new_leader is None:
+        for polled_at, owner, _ in drain(events):
+            if owner != leader:
+                new_leader, failover = owner, polled_at - killed_at
+                break
+        time.sleep(0.1)
+    assert new_leader, "no replica took over"
+    print(f"✅ {new_leader} took over after {failover:.1f}s (bound: {LEASE_TTL + POLL_INTERVAL:.1f}s)")
+    print(f"   Current poller lease: {LeaseManager(db_path, 'observer', LEASE_TTL).holder(POLLER_LEASE)}")
+
+    time.sleep(2)
+    owners = {owner for _, owner, _ in drain(events)}
+    assert owners == {new_leader}, f"polls after failover came from {owners}"
+    print("✅ Still exactly one polling replica")
+
+    for process in replicas.values():
+        process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Webhook receiver example for Nova Reel MCP Server
+A minimal local HTTP server that verifies and prints job callbacks.
+
+Start it, then run the MCP server with --webhook-url http://localhost:9000/novareel,
+--webhook-allow-private (localhost is refused otherwise) and the same --webhook-secret
+(or pass callback_url to start_async_invoke).
+
+Usage: python examples/webhook_receiver.py [port] [secret]
+"""
+
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Add src directory to path to import the server modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from novareel_mcp_server.webhooks import verify
+
+# Reject requests signed longer ago than this, so captured requests cannot be replayed later
+MAX_AGE_SECONDS = 300
+
+SECRET = sys.argv[2] if len(sys.argv) > 2 else os.getenv("NOVAREEL_WEBHOOK_SECRET")
+seen_deliveries = set()
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        timestamp = self.headers.get("X-NovaReel-Timestamp", "0")
+        signature = self.headers.get("X-NovaReel-Signature", "")
+
+        if SECRET:
+            if not verify(SECRET, timestamp, body, signature):
+                print("❌ Rejected callback with an invalid signature")
+                self.send_response(401)
+                self.end_headers()
+                return
+            if abs(time.time() - int(timestamp)) > MAX_AGE_SECONDS:
+                print("❌ Rejected stale callback")
+                self.send_response(401)
+                self.end_headers()
+                return
+
+        # Retries reuse the delivery id, so duplicates are acknowledged but not processed twice
+        delivery_id = self.headers.get("X-NovaReel-Delivery")
+        if delivery_id not in seen_deliveries:
+            seen_deliveries.add(delivery_id)
+            event = json.loads(body)
+            invocation = event["data"]
+            print(f"📬 {event['event']}: job {invocation['job_id']} is {invocation['status']}")
+            if invocation.get("video_url"):
+                print(f"   🎬 {invocation['video_url']}")
+
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9000
+    print(f"Listening for Nova Reel callbacks on http://localhost:{port}/ (signature check: {'on' if SECRET else 'off'})")
+    HTTPServer(("", port), CallbackHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
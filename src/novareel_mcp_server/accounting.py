@@ -0,0 +1,334 @@
+"""
+Accounting
+Cost units, budgets and rate caps per tenant, API key and group.
+
+Every submitted job is charged its duration in seconds of video, the unit Nova
+Reel is billed in. Charges go into rolling counters per tenant, API key and
+group. Each counter is a short queue of fixed time buckets with running
+totals, so recording a charge, checking a limit and reading usage take
+constant time however long the history is. Limits are checked and the charge
+is reserved in one step before a job is submitted; a submission Bedrock
+rejects is refunded.
+
+Counters live in memory and are rebuilt from the stored invocations on start,
+so lifetime totals cover the jobs still in the store (not the archive). A store
+snapshot saves the counters of its jobs (see Accountant.state), so a start from
+a snapshot only applies the changes made since. Workers sharing a SQLite store
+keep their charges in that database instead (see sqlite_store.SQLiteAccountant),
+so a limit holds across all of them rather than once per process.
+"""
+
+import json
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .records import InvocationRecord
+from .tenancy import Identity, record_tenant
+
+# Nova Reel on-demand price per second of 720p video; override for other prices or regions
+DEFAULT_PRICE_PER_SECOND_USD = 0.08
+
+# Rolling windows: name -> (length in seconds, number of buckets)
+WINDOWS = {
+    "minute": (60, 6),
+    "day": (24 * 60 * 60, 24),
+    "month": (30 * 24 * 60 * 60, 30),
+}
+
+SCOPES = ("tenant", "api_key", "group")
+
+
+class Limits(NamedTuple):
+    """Per-tenant limits; None means unlimited"""
+    jobs_per_minute: Optional[int] = None
+    seconds_per_day: Optional[int] = None
+    seconds_per_month: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Limits":
+        unknown = set(data) - set(cls._fields)
+        if unknown:
+            raise ValueError(f"Unknown limits: {sorted(unknown)}")
+        return cls(**data)
+
+
+class Charge(NamedTuple):
+    """A reserved charge, kept so it can be refunded"""
+    keys: Tuple[Tuple[str, str], ...]
+    cost_units: int
+    at: float
+
+
+class RollingCounter:
+    """Jobs and cost units over a sliding window, in fixed buckets with running totals"""
+
+    __slots__ = ("bucket_seconds", "buckets", "jobs", "units", "_counts")
+
+    def __init__(self, window_seconds: float, buckets: int):
+        self.bucket_seconds = window_seconds / buckets
+        self.buckets = buckets
+        self.jobs = 0
+        self.units = 0
+        self._counts = deque()  # [bucket index, jobs, units], oldest first
+
+    def _expire(self, now: float):
+        oldest = int(now // self.bucket_seconds) - self.buckets + 1
+        while self._counts and self._counts[0][0] < oldest:
+            _, jobs, units = self._counts.popleft()
+            self.jobs -= jobs
+            self.units -= units
+
+    def add(self, jobs: int, units: int, at: float, now: float):
+        """Count (or with negative values, uncount) a charge made at time `at`"""
+        self._expire(now)
+        index = int(at // self.bucket_seconds)
+        if index <= int(now // self.bucket_seconds) - self.buckets:
+            return  # Already outside the window
+        # Charges arrive in time order, so the bucket is almost always the newest one
+        for bucket in reversed(self._counts):
+            if bucket[0] == index:
+                bucket[1] += jobs
+                bucket[2] += units
+                break
+            if bucket[0] < index:
+                self._insert(index, jobs, units)
+                break
+        else:
+            self._insert(index, jobs, units)
+        self.jobs += jobs
+        self.units += units
+
+    def _insert(self, index: int, jobs: int, units: int):
+        position = len(self._counts)
+        while position and self._counts[position - 1][0] > index:
+            position -= 1
+        self._counts.insert(position, [index, jobs, units])
+
+    def state(self, now: float) -> List[List[int]]:
+        """[bucket index, jobs, units] of the buckets within the window ending now"""
+        self._expire(now)
+        return [list(bucket) for bucket in self._counts]
+
+    def restore(self, buckets: List[List[int]]):
+        self._counts = deque(list(bucket) for bucket in buckets)
+        self.jobs = sum(jobs for _, jobs, _ in self._counts)
+        self.units = sum(units for _, _, units in self._counts)
+
+    def totals(self, now: float) -> Tuple[int, int]:
+        """(jobs, units) within the window ending now"""
+        self._expire(now)
+        return self.jobs, self.units
+
+    def retry_after(self, free_jobs: int, free_units: int, now: float) -> Optional[float]:
+        """Seconds until enough old buckets leave the window to free the given amounts, or None if never"""
+        self._expire(now)
+        freed_jobs = freed_units = 0
+        for index, jobs, units in self._counts:
+            freed_jobs += jobs
+            freed_units += units
+            if freed_jobs >= free_jobs and freed_units >= free_units:
+                return max((index + self.buckets) * self.bucket_seconds - now, 0.0)
+        return None
+
+
+class Usage:
+    """Lifetime totals and rolling windows of one tenant, API key or group"""
+
+    __slots__ = ("jobs", "units", "windows")
+
+    def __init__(self):
+        self.jobs = 0
+        self.units = 0
+        self.windows = {name: RollingCounter(*window) for name, window in WINDOWS.items()}
+
+    def add(self, jobs: int, units: int, at: float, now: float):
+        self.jobs += jobs
+        self.units += units
+        for counter in self.windows.values():
+            counter.add(jobs, units, at, now)
+
+
+class Accountant:
+    """
+    Records charges and enforces per-tenant limits at admission.
+
+    Args:
+        limits: Limits of every tenant without its own entry
+        tenant_limits: Limits of specific tenants
+        price_per_second: USD per cost unit, for cost estimates
+    """
+
+    def __init__(self, limits: Limits = Limits(), tenant_limits: Optional[Dict[str, Limits]] = None,
+                 price_per_second: float = DEFAULT_PRICE_PER_SECOND_USD):
+        self.limits = limits
+        self.tenant_limits = tenant_limits or {}
+        self.price_per_second = price_per_second
+        self._usage: Dict[Tuple[str, str], Usage] = {}
+
+    def limits_for(self, tenant: str) -> Limits:
+        return self.tenant_limits.get(tenant, self.limits)
+
+    @staticmethod
+    def _keys(identity: Identity, group_id: Optional[str]) -> Tuple[Tuple[str, str], ...]:
+        keys = [("tenant", identity.tenant)]
+        if identity.api_key:
+            keys.append(("api_key", identity.api_key))
+        if group_id:
+            keys.append(("group", group_id))
+        return tuple(keys)
+
+    def _add(self, keys: Iterable[Tuple[str, str]], jobs: int, units: int, at: float, now: float):
+        for key in keys:
+            usage = self._usage.get(key)
+            if usage is None:
+                usage = self._usage[key] = Usage()
+            usage.add(jobs, units, at, now)
+
+    def _usage_of(self, scope: str, key: str, now: float) -> Usage:
+        """Counters of one tenant, API key or group (empty if it was never charged)"""
+        return self._usage.get((scope, key)) or Usage()
+
+    def _denial(self, tenant: str, cost_units: int, now: float) -> Optional[Dict[str, Any]]:
+        """Error dict if the charge would break one of the tenant's limits"""
+        limits = self.limits_for(tenant)
+        usage = self._usage_of("tenant", tenant, now)
+        checks = (
+            ("minute", "jobs_per_minute", limits.jobs_per_minute, "Rate limit of {} jobs per minute"),
+            ("day", "seconds_per_day", limits.seconds_per_day, "Daily budget of {} video seconds"),
+            ("month", "seconds_per_month", limits.seconds_per_month, "30-day budget of {} video seconds"),
+        )
+        for window, name, limit, description in checks:
+            if limit is None:
+                continue
+            counter = usage.windows[window]
+            jobs, units = counter.totals(now)
+            if name == "jobs_per_minute":
+                excess_jobs, excess_units, used = jobs + 1 - limit, 0, jobs
+            else:
+                excess_jobs, excess_units, used = 0, units + cost_units - limit, units
+            if excess_jobs <= 0 and excess_units <= 0:
+                continue
+            denial = {
+                "error": f"{description.format(limit)} exceeded for tenant {tenant}",
+                "limit": name,
+                "limit_value": limit,
+                "used": used,
+                "requested": 1 if name == "jobs_per_minute" else cost_units,
+            }
+            retry_after = counter.retry_after(excess_jobs, excess_units, now)
+            if retry_after is None:
+                denial["suggestion"] = "The job alone exceeds this limit; request a shorter video"
+            else:
+                denial["retry_after_seconds"] = round(retry_after, 1)
+            return denial
+        return None
+
+    def charge(self, identity: Identity, group_id: Optional[str], cost_units: int,
+               now: Optional[float] = None) -> Tuple[Optional[Charge], Optional[Dict[str, Any]]]:
+        """
+        Check the tenant's limits and reserve the charge if they allow it.
+
+        Returns:
+            (charge, None) when admitted, (None, error dict) when a limit would be exceeded
+        """
+        now = time.time() if now is None else now
+        denial = self._denial(identity.tenant, cost_units, now)
+        if denial:
+            return None, denial
+        keys = self._keys(identity, group_id)
+        self._add(keys, 1, cost_units, now, now)
+        return Charge(keys, cost_units, now), None
+
+    def refund(self, charge: Charge, now: Optional[float] = None):
+        """Take back a reserved charge, e.g. when Bedrock rejected the submission"""
+        self._add(charge.keys, -1, -charge.cost_units, charge.at, time.time() if now is None else now)
+
+    def rebuild(self, records: Iterable[InvocationRecord], now: Optional[float] = None):
+        """Recompute every counter from stored invocations (on start)"""
+        now = time.time() if now is None else now
+        self._usage.clear()
+        for record in sorted(records, key=lambda record: record.created_at):
+            self._add(record_keys(record), 1, record.duration_seconds, record.created_at, now)
+
+    def replace(self, old: Optional[InvocationRecord], new: Optional[InvocationRecord],
+                now: Optional[float] = None):
+        """Move the charge of a stored invocation from its old to its new version (None: added or removed)"""
+        old_charge = (record_keys(old), old.duration_seconds, old.created_at) if old is not None else None
+        new_charge = (record_keys(new), new.duration_seconds, new.created_at) if new is not None else None
+        if old_charge == new_charge:
+            return
+        now = time.time() if now is None else now
+        if old_charge is not None:
+            keys, units, at = old_charge
+            self._add(keys, -1, -units, at, now)
+        if new_charge is not None:
+            keys, units, at = new_charge
+            self._add(keys, 1, units, at, now)
+
+    def state(self, now: Optional[float] = None) -> List[List[Any]]:
+        """Every counter as JSON-compatible lists, to be restored later (e.g. from a store snapshot)"""
+        now = time.time() if now is None else now
+        state = []
+        for (scope, key), usage in self._usage.items():
+            windows = {name: counter.state(now) for name, counter in usage.windows.items()}
+            if usage.jobs or usage.units or any(windows.values()):
+                state.append([scope, key, usage.jobs, usage.units, windows])
+        return state
+
+    def restore(self, state: List[List[Any]]):
+        """Replace every counter with a saved state (see state)"""
+        self._usage.clear()
+        for scope, key, jobs, units, windows in state:
+            usage = self._usage[(scope, key)] = Usage()
+            usage.jobs, usage.units = jobs, units
+            for name, buckets in windows.items():
+                usage.windows[name].restore(buckets)
+
+    def usage(self, scope: str, key: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Usage of one tenant, API key or group, from the counters alone"""
+        now = time.time() if now is None else now
+        usage = self._usage_of(scope, key, now)
+        result = {
+            "scope": scope,
+            "key": key,
+            "jobs": usage.jobs,
+            "cost_units": usage.units,
+            "estimated_cost_usd": round(usage.units * self.price_per_second, 2),
+        }
+        for name, counter in usage.windows.items():
+            jobs, units = counter.totals(now)
+            result[f"last_{name}"] = {"jobs": jobs, "cost_units": units}
+        if scope == "tenant":
+            limits = self.limits_for(key)
+            result["limits"] = limits._asdict()
+            result["remaining"] = {
+                "jobs_this_minute": None if limits.jobs_per_minute is None
+                else max(limits.jobs_per_minute - result["last_minute"]["jobs"], 0),
+                "seconds_today": None if limits.seconds_per_day is None
+                else max(limits.seconds_per_day - result["last_day"]["cost_units"], 0),
+                "seconds_this_month": None if limits.seconds_per_month is None
+                else max(limits.seconds_per_month - result["last_month"]["cost_units"], 0),
+            }
+        return result
+
+
+def record_keys(record: InvocationRecord) -> Tuple[Tuple[str, str], ...]:
+    """Counter keys a stored invocation was charged to"""
+    identity = Identity(record_tenant(record), record.get_extra("api_key"))
+    return Accountant._keys(identity, record.groups[0] if record.groups else None)
+
+
+def load_tenant_limits(path: str) -> Dict[str, Limits]:
+    """
+    Read per-tenant limits from a JSON file such as
+    {"acme": {"jobs_per_minute": 10, "seconds_per_day": 3600}}.
+
+    Raises:
+        ValueError: If the file is not valid JSON or names unknown limits
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Tenant limits must be an object mapping tenant names to limits")
+    return {tenant: Limits.from_dict(limits) for tenant, limits in data.items()}
@@ -0,0 +1,294 @@
+"""
+Admission Control
+Bounds concurrent tool calls per tool and per tenant, and sheds load when the queue is full.
+
+Every tool call needs a slot in each pool that applies to it: the server-wide
+pool, the pool of its tool and the pool of its tenant. A call that cannot get
+all of them right away waits in one bounded FIFO queue; a call blocked on one
+tenant's pool does not hold up calls that fit. Once the queue is full, or a call
+has waited longer than the queue timeout, it is rejected at once with a tool
+error carrying status 503 and a retry-after hint estimated from recent call
+durations, instead of piling onto the event loop and Bedrock. Callers whose
+tenant cannot be derived are rejected before they take any slot.
+
+Counters per tool and per tenant show how often calls were admitted, queued and
+rejected, and how long they waited, for tuning the limits. Counters of idle
+tenants are dropped, least recently used first, once more than
+MAX_TRACKED_TENANTS have been seen.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastmcp.exceptions import ToolError
+
+try:
+    from fastmcp.server.middleware import Middleware
+except ImportError:  # Older fastmcp without middleware: admission control is unavailable
+    Middleware = object
+
+from .tenancy import TenantError, current_identity
+
+MIDDLEWARE_SUPPORTED = Middleware is not object
+DEFAULT_MAX_QUEUED = 64
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 10.0
+# Tools that only read in-memory counters; they must stay reachable while the server is overloaded
+EXEMPT_TOOLS = frozenset({"get_admission_stats"})
+# Tenants whose counters are kept; idle ones beyond this are forgotten, least recently used first
+MAX_TRACKED_TENANTS = 1024
+# Weight of the newest call in the running average of call durations
+_DURATION_SMOOTHING = 0.2
+_INITIAL_DURATION_SECONDS = 1.0
+
+Pool = Tuple[str, str]  # ("server", ""), ("tool", name) or ("tenant", name)
+
+
+def parse_tool_limits(spec: Optional[str]) -> Dict[str, int]:
+    """
+    Parse per-tool limits such as "sweep=2,start_async_invoke=8".
+
+    Raises:
+        ValueError: If an entry is not tool=positive integer
+    """
+    limits = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        tool, _, value = entry.partition("=")
+        if not tool.strip() or not value.strip().isdigit() or int(value) < 1:
+            raise ValueError(f"Invalid tool limit {entry.strip()!r}, expected tool=N with N >= 1")
+        limits[tool.strip()] = int(value)
+    return limits
+
+
+class PoolStats:
+    """Counters of one pool"""
+
+    __slots__ = ("in_flight", "admitted", "queued", "rejected_queue_full", "rejected_timeout",
+                 "wait_seconds_total", "wait_seconds_max")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "average_wait_seconds": round(self.wait_seconds_total / self.queued, 3) if self.queued else 0.0,
+            "max_wait_seconds": round(self.wait_seconds_max, 3),
+        }
+
+
+class AdmissionController:
+    """
+    Admits tool calls within the configured concurrency limits.
+
+    Args:
+        max_in_flight: Tool calls running at once on the whole server (None: unlimited)
+        tool_limits: Calls of a tool running at once, by tool name
+        tenant_limit: Calls of one tenant running at once (None: unlimited)
+        max_queued: Calls allowed to wait for a slot; more are rejected at once
+        queue_timeout: Seconds a call may wait before it is rejected
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None, tool_limits: Optional[Dict[str, int]] = None,
+                 tenant_limit: Optional[int] = None, max_queued: int = DEFAULT_MAX_QUEUED,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT_SECONDS):
+        self.max_in_flight = max_in_flight
+        self.tool_limits = tool_limits or {}
+        self.tenant_limit = tenant_limit
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._stats: Dict[Pool, PoolStats] = {}
+        self._tenant_stats: "OrderedDict[str, PoolStats]" = OrderedDict()
+        self._durations: Dict[str, float] = {}
+        self._waiters: Deque[Tuple[List[Tuple[Pool, int]], asyncio.Future]] = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight is not None or bool(self.tool_limits) or self.tenant_limit is not None
+
+    def _pools(self, tool: str, tenant: str) -> List[Tuple[Pool, int]]:
+        """Pools a call needs a slot in, with their limits (None: unlimited)"""
+        return [
+            (("server", ""), self.max_in_flight),
+            (("tool", tool), self.tool_limits.get(tool)),
+            (("tenant", tenant), self.tenant_limit),
+        ]
+
+    def _fits(self, pools: List[Tuple[Pool, int]]) -> bool:
+        return all(limit is None or self.stats(pool).in_flight < limit for pool, limit in pools)
+
+    def _take(self, pools: List[Tuple[Pool, int]]):
+        for pool, _ in pools:
+            self.stats(pool).in_flight += 1
+
+    def _wake(self):
+        """Hand freed slots to waiting calls, oldest first, skipping calls that still do not fit"""
+        for entry in list(self._waiters):
+            pools, future = entry
+            if future.done():
+                self._waiters.remove(entry)
+            elif self._fits(pools):
+                self._take(pools)
+                future.set_result(None)
+                self._waiters.remove(entry)
+
+    def stats(self, pool: Pool) -> PoolStats:
+        kind, name = pool
+        if kind == "tenant":
+            return self._tenant(name)
+        stats = self._stats.get(pool)
+        if stats is None:
+            stats = self._stats[pool] = PoolStats()
+        return stats
+
+    def _tenant(self, tenant: str) -> PoolStats:
+        """Counters of a tenant, forgetting the least recently used idle tenants beyond MAX_TRACKED_TENANTS"""
+        stats = self._tenant_stats.get(tenant)
+        if stats is not None:
+            self._tenant_stats.move_to_end(tenant)
+            return stats
+        if len(self._tenant_stats) >= MAX_TRACKED_TENANTS:
+            # Tenants with calls running keep their counters: their in_flight count enforces the limit
+            for name, old in list(self._tenant_stats.items()):
+                if len(self._tenant_stats) < MAX_TRACKED_TENANTS:
+                    break
+                if not old.in_flight:
+                    del self._tenant_stats[name]
+        stats = self._tenant_stats[tenant] = PoolStats()
+        return stats
+
+    def _count(self, pools: List[Tuple[Pool, int]], counter: str):
+        for pool, _ in pools:
+            stats = self.stats(pool)
+            setattr(stats, counter, getattr(stats, counter) + 1)
+
+    def _retry_after(self, tool: str, pools: List[Tuple[Pool, int]]) -> float:
+        """Seconds until the queue ahead has likely drained, from the tool's average call duration"""
+        capacity = max(min((limit for _, limit in pools if limit is not None), default=1), 1)
+        duration = self._durations.get(tool, _INITIAL_DURATION_SECONDS)
+        return round(max(duration * (len(self._waiters) + 1) / capacity, 1.0), 1)
+
+    def _denial(self, tool: str, pools: List[Tuple[Pool, int]], reason: str) -> Dict[str, Any]:
+        return {
+            "error": f"Server is busy: {reason}",
+            "status": 503,
+            "tool": tool,
+            "retry_after_seconds": self._retry_after(tool, pools),
+        }
+
+    async def acquire(self, tool: str, tenant: str) -> Optional[Dict[str, Any]]:
+        """
+        Wait for slots for one call.
+
+        Returns:
+            None once the call holds its slots (call release afterwards), or a 503 error dict
+        """
+        pools = self._pools(tool, tenant)
+        # Every release hands slots to all waiters that fit, so a call that fits overtakes no one who could run
+        if self._fits(pools):
+            self._take(pools)
+            self._count(pools, "admitted")
+            return None
+        if len(self._waiters) >= self.max_queued:
+            self._count(pools, "rejected_queue_full")
+            return self._denial(tool, pools, "too many calls are waiting")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (pools, future)
+        self._waiters.append(entry)
+        self._count(pools, "queued")
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._count(pools, "rejected_timeout")
+            return self._denial(tool, pools, f"no slot freed up within {self.queue_timeout:g}s")
+        except asyncio.CancelledError:
+            # The slots may have been handed over just before the caller went away
+            if future.done() and not future.cancelled():
+                self.release(tool, tenant)
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+            waited = time.monotonic() - started
+            for pool, _ in pools:
+                stats = self.stats(pool)
+                stats.wait_seconds_total += waited
+                stats.wait_seconds_max = max(stats.wait_seconds_max, waited)
+        self._count(pools, "admitted")
+        return None
+
+    def release(self, tool: str, tenant: str, duration: Optional[float] = None):
+        """Give back the slots of a finished call and admit waiting calls"""
+        for pool, _ in self._pools(tool, tenant):
+            self.stats(pool).in_flight -= 1
+        if duration is not None:
+            average = self._durations.get(tool, duration)
+            self._durations[tool] = average + _DURATION_SMOOTHING * (duration - average)
+        self._wake()
+
+    def snapshot(self, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """Limits and counters; only the given tenant's pool is included"""
+        result = {
+            "limits": {
+                "max_in_flight": self.max_in_flight,
+                "tool_limits": dict(self.tool_limits),
+                "tenant_limit": self.tenant_limit,
+                "max_queued": self.max_queued,
+                "queue_timeout_seconds": self.queue_timeout,
+            },
+            "waiting": len(self._waiters),
+            "server": self.stats(("server", "")).to_dict(),
+            "tools": {
+                name: stats.to_dict() for (kind, name), stats in sorted(self._stats.items()) if kind == "tool"
+            },
+            "tracked_tenants": len(self._tenant_stats),
+        }
+        if tenant is not None:
+            result["tenant"] = {"name": tenant, **self.stats(("tenant", tenant)).to_dict()}
+        return result
+
+
+class AdmissionMiddleware(Middleware):
+    """
+    Runs every tool call (except EXEMPT_TOOLS) through an AdmissionController.
+
+    Rejected calls raise ToolError, so clients get an error result (isError) whose
+    text is the JSON of the 503 error dict, with its retry_after_seconds.
+    """
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+
+    async def on_call_tool(self, context, call_next):
+        tool = context.message.name
+        if tool in EXEMPT_TOOLS or not self.controller.enabled:
+            return await call_next(context)
+        try:
+            tenant = current_identity().tenant
+        except TenantError as e:
+            raise ToolError(str(e))  # Unidentified callers must not use any tenant's slots
+
+        denial = await self.controller.acquire(tool, tenant)
+        if denial:
+            raise ToolError(json.dumps(denial))
+        started = time.monotonic()
+        try:
+            return await call_next(context)
+        finally:
+            self.controller.release(tool, tenant, time.monotonic() - started)
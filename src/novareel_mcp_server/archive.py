@@ -0,0 +1,118 @@
+"""
+Invocation Archive
+Compressed, append-only storage for invocations moved out of the hot working set.
+
+Records are stored as gzip-compressed JSON lines. Every append writes a new gzip
+member, so archiving never rewrites existing data, and reads stream through the
+file without loading it into memory.
+"""
+
+import gzip
+import json
+import os
+import sys
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+from .tenancy import DEFAULT_TENANT
+
+# Key of the group -> tenant map, stored in the groups file next to the per-group counts
+_GROUP_TENANTS_KEY = "__tenants__"
+
+
+def _tenant(record: Dict[str, Any]) -> str:
+    return record.get("tenant") or DEFAULT_TENANT
+
+
+class InvocationArchive:
+    """Append-only gzip JSON-lines archive of finished invocations"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.groups_path = f"{path}.groups.json"
+        # Per-group status counts of archived jobs, so group totals survive archival
+        self.group_counts: Dict[str, Dict[str, int]] = {}
+        # Tenant owning each archived group, so archived groups stay private too
+        self.group_tenants: Dict[str, str] = {}
+        self._groups_mtime: Optional[int] = None
+        self.reload_group_counts()
+
+    def reload_group_counts(self):
+        """Pick up group counts written by another process sharing this archive"""
+        try:
+            mtime = os.stat(self.groups_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._groups_mtime:
+            return
+        try:
+            with open(self.groups_path, 'r') as f:
+                group_counts = json.load(f)
+            self.group_tenants = group_counts.pop(_GROUP_TENANTS_KEY, {})
+            self.group_counts = group_counts
+            self._groups_mtime = mtime
+        except Exception as e:
+            print(f"Warning: Could not load archive group counts: {e}", file=sys.stderr)
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Append records to the archive as one gzip member"""
+        if not records:
+            return
+        self.reload_group_counts()
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")))
+                f.write("\n")
+
+        for record in records:
+            for group_id in record.get("groups", ()):
+                counts = self.group_counts.setdefault(group_id, {})
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+                self.group_tenants.setdefault(group_id, _tenant(record))
+        tmp_path = f"{self.groups_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({**self.group_counts, _GROUP_TENANTS_KEY: self.group_tenants}, f)
+        os.replace(tmp_path, self.groups_path)
+        self._groups_mtime = os.stat(self.groups_path).st_mtime_ns
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Stream all archived records, oldest first"""
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def find(self, identifier: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Find an archived invocation by job_id or invocation ARN, optionally only among a tenant's"""
+        if not os.path.exists(self.path):
+            return None
+        needle = json.dumps(identifier)
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                # Cheap substring test before paying for json.loads
+                if needle not in line:
+                    continue
+                record = json.loads(line)
+                if identifier in (record.get("job_id"), record.get("invocation_arn")):
+                    return record if tenant is None or _tenant(record) == tenant else None
+        return None
+
+    def search(self, status: Optional[str] = None, group_id: Optional[str] = None,
+               prompt_contains: Optional[str] = None, limit: int = 50,
+               tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return up to `limit` archived records matching all given filters, newest first"""
+        matches: "deque[Dict[str, Any]]" = deque(maxlen=max(limit, 1))
+        needle = prompt_contains.lower() if prompt_contains else None
+        for record in self.iter_records():
+            if tenant is not None and _tenant(record) != tenant:
+                continue
+            if status and record.get("status") != status:
+                continue
+            if group_id and group_id not in record.get("groups", ()):
+                continue
+            if needle and needle not in record.get("prompt", "").lower():
+                continue
+            matches.append(record)
+        return list(reversed(matches))
@@ -0,0 +1,57 @@
+"""
+Concurrency helpers
+Run blocking AWS calls off the event loop and bound how many run at once.
+"""
+
+import asyncio
+import functools
+from typing import Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_MAX_CONCURRENT_SUBMISSIONS = 4
+
+
+async def run_blocking(func: Callable[..., R], *args, **kwargs) -> R:
+    """Run a blocking call (e.g. a boto3 request) on the default thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+class ConcurrencyGovernor:
+    """Caps how many blocking calls of one kind are in flight across all tools"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._semaphore = None
+
+    async def run(self, func: Callable[..., R], *args, **kwargs) -> R:
+        # Created lazily so the semaphore belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        async with self._semaphore:
+            return await run_blocking(func, *args, **kwargs)
+
+
+async def bounded_map(func: Callable[[T], Awaitable[R]], items: Iterable[T], limit: int) -> List[R]:
+    """
+    Await func(item) for every item with at most `limit` calls in flight.
+
+    Items are pulled from the iterable only when a slot frees up, so lazy
+    iterables (e.g. itertools.product) are never fully materialized up front.
+    Results are returned in input order.
+    """
+    iterator = enumerate(items)
+    results = {}
+
+    async def worker():
+        for index, item in iterator:
+            results[index] = await func(item)
+
+    await asyncio.gather(*(worker() for _ in range(max(limit, 1))))
+    return [results[index] for index in range(len(results))]
@@ -0,0 +1,313 @@
+"""
+Invocation Export
+Streams invocation history to CSV or Parquet for offline analysis.
+
+Records are read from the store (and optionally the archive) and written as
+they arrive, in chunks, so memory use depends on the chunk size rather than the
+length of the history. Time-range, tenant and status filters are applied by the
+store; the SQLite store turns them into an indexed query.
+
+Besides the stored fields, every row carries derived columns:
+- queue_seconds: from the tool call to Bedrock accepting the job
+- generation_seconds: from acceptance until the job finished (Bedrock's end time when known)
+- failure_code: the error code of failed jobs, e.g. ValidationException
+
+Parquet output needs pyarrow (`pip install pyarrow`); CSV needs nothing extra.
+
+Usage: novareel-export invocations.parquet --since 2025-01-01 --status Failed
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import re
+import sys
+import uuid
+from datetime import datetime
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .archive import InvocationArchive
+from .predictor import finished_at
+from .records import InvocationRecord, JobStatus, parse_timestamp
+from .sqlite_store import SQLiteInvocationStore
+from .store import InvocationStore
+from .tenancy import record_tenant
+
+FORMATS = ("csv", "parquet")
+DEFAULT_CHUNK_ROWS = 1000
+
+# Output columns and their Parquet types
+COLUMNS = (
+    ("job_id", "string"),
+    ("invocation_arn", "string"),
+    ("tenant", "string"),
+    ("status", "string"),
+    ("task_type", "string"),
+    ("duration_seconds", "int64"),
+    ("fps", "int64"),
+    ("dimension", "string"),
+    ("seed", "int64"),
+    ("prompt", "string"),
+    ("group_id", "string"),
+    ("requested_at", "timestamp"),
+    ("created_at", "timestamp"),
+    ("finished_at", "timestamp"),
+    ("queue_seconds", "float64"),
+    ("generation_seconds", "float64"),
+    ("failure_code", "string"),
+    ("failure_message", "string"),
+)
+
+# "An error occurred (ThrottlingException) when calling ..." (botocore) or "ValidationException: ..."
+_CLIENT_ERROR_CODE = re.compile(r"\(([A-Za-z]+)\)")
+_LEADING_CODE = re.compile(r"^([A-Za-z]+(?:Exception|Error))\b")
+
+
+class ExportError(ValueError):
+    """Invalid export request"""
+    pass
+
+
+def parse_filters(since: Optional[str] = None, until: Optional[str] = None,
+                  statuses: Optional[Iterable[str]] = None
+                  ) -> Tuple[Optional[float], Optional[float], Optional[Collection[JobStatus]]]:
+    """
+    Turn ISO 8601 times and status names into store query arguments.
+
+    Raises:
+        ExportError: If a time or a status is invalid
+    """
+    try:
+        since_ts = parse_timestamp(since)
+        until_ts = parse_timestamp(until)
+    except ValueError as e:
+        raise ExportError(f"Invalid time, expected ISO 8601 (e.g. 2025-01-31T12:00:00): {e}")
+    if statuses is None:
+        return since_ts, until_ts, None
+    valid = {status.value: status for status in JobStatus}
+    unknown = [status for status in statuses if status not in valid]
+    if unknown:
+        raise ExportError(f"Unknown status {unknown}, valid statuses: {sorted(valid)}")
+    return since_ts, until_ts, frozenset(valid[status] for status in statuses)
+
+
+def _iter_archived(archive: InvocationArchive, tenant: Optional[str], since: Optional[float],
+                   until: Optional[float], statuses: Optional[Collection[JobStatus]]) -> Iterator[InvocationRecord]:
+    for data in archive.iter_records():
+        record = InvocationRecord.from_dict(data)
+        if tenant is not None and record_tenant(record) != tenant:
+            continue
+        if since is not None and record.created_at < since:
+            continue
+        if until is not None and record.created_at >= until:
+            continue
+        if statuses is not None and record.status not in statuses:
+            continue
+        yield record
+
+
+def iter_invocations(store: InvocationStore, tenant: Optional[str] = None, since: Optional[float] = None,
+                     until: Optional[float] = None, statuses: Optional[Collection[JobStatus]] = None,
+                     include_archived: bool = False) -> Iterator[InvocationRecord]:
+    """Stream matching invocations: archived ones first (they are older), then the store's"""
+    if include_archived and store.archive is not None:
+        yield from _iter_archived(store.archive, tenant, since, until, statuses)
+    yield from store.query(tenant, since, until, statuses)
+
+
+def thread_safe_invocations(store: InvocationStore, tenant: Optional[str] = None, since: Optional[float] = None,
+                            until: Optional[float] = None, statuses: Optional[Collection[JobStatus]] = None,
+                            include_archived: bool = False) -> Iterator[InvocationRecord]:
+    """
+    The records of iter_invocations, for writing on a worker thread; call it on the event loop.
+
+    The archive and the SQLite store are safe to read from another thread, so they are still
+    streamed. The in-memory store's dicts change under the event loop, so its matching records
+    are read here instead, before the thread starts.
+    """
+    if isinstance(store, SQLiteInvocationStore):
+        return iter_invocations(store, tenant, since, until, statuses, include_archived)
+    records = list(store.query(tenant, since, until, statuses))
+    if include_archived and store.archive is not None:
+        return itertools.chain(_iter_archived(store.archive, tenant, since, until, statuses), records)
+    return iter(records)
+
+
+def failure_code(record: InvocationRecord) -> Optional[str]:
+    """Error code of a job that did not complete, from Bedrock's failure message or the polling error"""
+    if record.status in (JobStatus.COMPLETED, JobStatus.IN_PROGRESS):
+        return None
+    message = record.failure_message or record.error or ""
+    match = _CLIENT_ERROR_CODE.search(message) or _LEADING_CODE.match(message)
+    return match.group(1) if match else record.status.value
+
+
+def _datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+
+
+def _seconds(start: Optional[float], end: Optional[float]) -> Optional[float]:
+    return round(end - start, 3) if start is not None and end is not None else None
+
+
+def invocation_row(record: InvocationRecord) -> Tuple:
+    """One output row, in COLUMNS order"""
+    requested_at = record.get_extra("requested_at")
+    finished = finished_at(record)
+    return (
+        record.job_id,
+        record.invocation_arn,
+        record_tenant(record),
+        record.status.value,
+        record.task_type,
+        record.duration_seconds,
+        record.fps,
+        record.dimension,
+        record.seed,
+        record.prompt,
+        record.groups[0] if record.groups else None,
+        _datetime(requested_at),
+        _datetime(record.created_at),
+        _datetime(finished),
+        _seconds(requested_at, record.created_at),
+        _seconds(record.created_at, finished),
+        failure_code(record),
+        record.failure_message or record.error,
+    )
+
+
+class _CSVWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([name for name, _ in COLUMNS])
+
+    def write(self, rows: List[Tuple]):
+        self._writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Writes every chunk as one row group"""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ExportError("Parquet export needs pyarrow (pip install pyarrow); use format csv instead")
+        types = {
+            "string": pyarrow.string(),
+            "int64": pyarrow.int64(),
+            "float64": pyarrow.float64(),
+            "timestamp": pyarrow.timestamp("ms"),
+        }
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([(name, types[kind]) for name, kind in COLUMNS])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows: List[Tuple]):
+        columns = {name: [row[index] for row in rows] for index, (name, _) in enumerate(COLUMNS)}
+        self._writer.write_table(self._pyarrow.Table.from_pydict(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def write_export(records: Iterable[InvocationRecord], path: str, output_format: str = "csv",
+                 chunk_size: int = DEFAULT_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Write records to a CSV or Parquet file, chunk_size rows at a time.
+
+    The file is written under a temporary name and renamed when complete, so a
+    failed export never leaves a partial file behind.
+
+    Raises:
+        ExportError: If the format is unknown or its writer is not available
+    """
+    if output_format not in FORMATS:
+        raise ExportError(f"Unknown format {output_format!r}, expected one of {list(FORMATS)}")
+    tmp_path = f"{path}.tmp"
+    writer = _ParquetWriter(tmp_path) if output_format == "parquet" else _CSVWriter(tmp_path)
+    rows = 0
+    try:
+        records = iter(records)
+        while True:
+            chunk = [invocation_row(record) for record in itertools.islice(records, chunk_size)]
+            if not chunk:
+                break
+            writer.write(chunk)
+            rows += len(chunk)
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"path": path, "format": output_format, "rows": rows, "size_bytes": os.path.getsize(path)}
+
+
+def export_path(directory: str, tenant: str, output_format: str) -> str:
+    """New file for a tenant's export, in its own subdirectory"""
+    tenant_dir = os.path.join(directory, tenant)
+    os.makedirs(tenant_dir, exist_ok=True)
+    name = f"invocations-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.{output_format}"
+    return os.path.join(tenant_dir, name)
+
+
+def main():
+    """Export invocation history from the command line"""
+    parser = argparse.ArgumentParser(description="Export Nova Reel invocation history to CSV or Parquet")
+    parser.add_argument("output", help="Output file")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="Output format (default: from the output file extension, else csv)")
+    parser.add_argument("--invocations-file",
+                        default=os.getenv("NOVAREEL_INVOCATIONS_FILE", "~/.novareel_invocations.json"),
+                        help="JSON invocations file of the stdio server")
+    parser.add_argument("--snapshot-file", default=os.getenv("NOVAREEL_SNAPSHOT_FILE"),
+                        help="Snapshot of a server started with --snapshot-file; read instead of the JSON file")
+    parser.add_argument("--store-db", default=os.getenv("NOVAREEL_STORE_DB"),
+                        help="SQLite store of the HTTP server; read in chunks instead of the JSON file")
+    parser.add_argument("--archive-file",
+                        default=os.getenv("NOVAREEL_ARCHIVE_FILE", "~/.novareel_invocations.archive.jsonl.gz"),
+                        help="Compressed archive of finished invocations")
+    parser.add_argument("--include-archived", action="store_true", help="Also export archived invocations")
+    parser.add_argument("--tenant", help="Only export this tenant's invocations (default: all tenants)")
+    parser.add_argument("--since", help="Only invocations created at or after this ISO 8601 time")
+    parser.add_argument("--until", help="Only invocations created before this ISO 8601 time")
+    parser.add_argument("--status", action="append", help="Only invocations with this status (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows written at a time")
+    args = parser.parse_args()
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    archive = InvocationArchive(os.path.expanduser(args.archive_file))
+    if args.store_db:
+        store = SQLiteInvocationStore(os.path.expanduser(args.store_db), archive)
+    else:
+        # The snapshot is decoded one record at a time; without one, the JSON file is read whole
+        # (and not converted: the export leaves the server's files alone)
+        snapshot_path = os.path.expanduser(args.snapshot_file) if args.snapshot_file else None
+        if snapshot_path and not os.path.exists(snapshot_path):
+            snapshot_path = None
+        store = InvocationStore(os.path.expanduser(args.invocations_file), archive, snapshot_path=snapshot_path)
+        store.load()
+
+    try:
+        since, until, statuses = parse_filters(args.since, args.until, args.status)
+        records = iter_invocations(store, args.tenant, since, until, statuses, args.include_archived)
+        result = write_export(records, args.output, output_format, args.chunk_size)
+    except ExportError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Exported {result['rows']} invocations to {result['path']} ({result['size_bytes']} bytes)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Amazon Nova Reel Image Input
+Turns local keyframe images into Bedrock image blocks without blocking the event loop.
+
+Files are read and base64-encoded in fixed-size chunks on a worker thread, and the
+encoded payload is cached by content hash, so resubmitting the same keyframe (for
+example with different seeds) does not re-read or re-encode it.
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import stat
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Chunk size is a multiple of 3 so every chunk base64-encodes without padding
+CHUNK_SIZE = 3 * 64 * 1024
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers carry the image size (DHT, JPG and DAC share the range)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ImageInputError(ValueError):
+    """Invalid or unreadable image input"""
+    pass
+
+
+def read_image_info(f) -> Tuple[str, int, int]:
+    """
+    Read the format and size of a PNG or JPEG image from its header only.
+
+    Args:
+        f: Binary file object positioned at the start of the image
+
+    Returns:
+        Tuple of (format, width, height) where format is "png" or "jpeg"
+    """
+    head = f.read(24)
+    if len(head) == 24 and head.startswith(_PNG_SIGNATURE) and head[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", head[16:24])
+        return "png", width, height
+
+    if head[:2] == b"\xff\xd8":
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                break
+            if marker[1] in (0x01, 0xFF) or 0xD0 <= marker[1] <= 0xD7:
+                continue
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                break
+            length = struct.unpack(">H", length_bytes)[0]
+            if length < 2:
+                break
+            if marker[1] in _JPEG_SOF_MARKERS:
+                frame = f.read(5)
+                if len(frame) < 5:
+                    break
+                height, width = struct.unpack(">xHH", frame)
+                return "jpeg", width, height
+            f.seek(length - 2, os.SEEK_CUR)
+        raise ImageInputError("Could not find JPEG frame header")
+
+    raise ImageInputError("Unsupported image format, only PNG and JPEG are accepted")
+
+
+class ImagePayloadCache:
+    """Thread-safe LRU cache of encoded image blocks keyed by content hash, bounded by size"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._payloads: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def digest_for(self, file_key: Tuple[str, int, int]) -> Optional[str]:
+        with self._lock:
+            return self._digests.get(file_key)
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._payloads.get(digest)
+            if entry is not None:
+                self._payloads.move_to_end(digest)
+            return entry
+
+    def put(self, file_key: Tuple[str, int, int], digest: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._digests[file_key] = digest
+            if digest in self._payloads:
+                self._payloads.move_to_end(digest)
+                return
+            self._payloads[digest] = entry
+            self._size += len(entry["block"]["source"]["bytes"])
+            while self._size > self.max_bytes and len(self._payloads) > 1:
+                old_digest, old_entry = self._payloads.popitem(last=False)
+                self._size -= len(old_entry["block"]["source"]["bytes"])
+                self._digests = {key: d for key, d in self._digests.items() if d != old_digest}
+
+
+image_cache = ImagePayloadCache()
+
+
+def resolve_image_path(path: str, input_dir: Optional[str] = None) -> str:
+    """
+    Resolve a caller-supplied image path.
+
+    Args:
+        path: Image path as given by the caller
+        input_dir: Directory the image must be in (None allows any local path).
+            Relative paths are taken relative to it, and symlinks may not lead out of it.
+
+    Returns:
+        Absolute path of the image
+    """
+    if input_dir is None:
+        return os.path.abspath(os.path.expanduser(path))
+    root = os.path.realpath(input_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ImageInputError("Image paths must be inside the image input directory")
+    return resolved
+
+
+def encode_image_file(path: str, dimension: str, input_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Validate and encode an image file into a Bedrock image block (blocking, run in a worker).
+
+    Args:
+        path: Local path of a PNG or JPEG image
+        dimension: Video dimension the image must match, e.g. "1280x720"
+        input_dir: Directory the image must be in, see resolve_image_path
+
+    Returns:
+        Dict with "block" (Bedrock image block), "sha256" and "cached"
+    """
+    resolved = resolve_image_path(path, input_dir)
+    # Errors name the path as given and never the OS error, which would describe the server's files
+    try:
+        file_stat = os.stat(resolved)
+    except OSError:
+        raise ImageInputError(f"Cannot read image {path}")
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise ImageInputError(f"Cannot read image {path}")
+    if file_stat.st_size > MAX_IMAGE_BYTES:
+        raise ImageInputError(f"Image is {file_stat.st_size} bytes, maximum is {MAX_IMAGE_BYTES}")
+
+    file_key = (resolved, file_stat.st_size, file_stat.st_mtime_ns)
+    digest = image_cache.digest_for(file_key)
+    if digest is not None:
+        entry = image_cache.get(digest)
+        if entry is not None:
+            return {**entry, "cached": True}
+
+    try:
+        with open(resolved, "rb") as f:
+            image_format, width, height = read_image_info(f)
+            if f"{width}x{height}" != dimension:
+                raise ImageInputError(f"Image is {width}x{height} but the video dimension is {dimension}")
+
+            f.seek(0)
+            hasher = hashlib.sha256()
+            encoded = []
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                encoded.append(base64.b64encode(chunk).decode("ascii"))
+    except OSError:
+        raise ImageInputError(f"Cannot read image {path}")
+
+    digest = hasher.hexdigest()
+    entry = image_cache.get(digest)
+    if entry is None:
+        entry = {
+            "block": {"format": image_format, "source": {"bytes": "".join(encoded)}},
+            "sha256": digest,
+        }
+    image_cache.put(file_key, digest, entry)
+    return {**entry, "cached": False}
+
+
+async def load_image(path: str, dimension: str, input_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Encode an image file on a worker thread, see encode_image_file."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, encode_image_file, path, dimension, input_dir)
+
+
+async def resolve_shot_images(shots: List[Dict[str, Any]], dimension: str,
+                              input_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Replace "image_path" entries of manual shots with encoded image blocks, concurrently."""
+    paths = [shot.get("image_path") for shot in shots]
+    loaded = await asyncio.gather(*(load_image(path, dimension, input_dir) for path in paths if path))
+    loaded_iter = iter(loaded)
+
+    resolved = []
+    for shot, path in zip(shots, paths):
+        shot = {key: value for key, value in shot.items() if key != "image_path"}
+        if path:
+            shot["image"] = next(loaded_iter)["block"]
+        resolved.append(shot)
+    return resolved
@@ -0,0 +1,77 @@
+"""
+Leases
+Named, expiring leases in a SQLite database shared by several server replicas.
+
+A lease is held by one owner until it expires. The owner keeps it alive by
+renewing it (try_acquire again) more often than the TTL; if the owner dies,
+another replica can take the lease over once the TTL has passed, so failover
+is bounded by the TTL plus the renewal interval. Used for leader election of
+singleton duties such as background polling.
+
+Expiry uses wall-clock time, so replicas on different hosts need synchronized clocks.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+# Lease held by the replica that runs the background poll loop
+POLLER_LEASE = "poller"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class LeaseManager:
+    """
+    Acquire, renew and release named leases for one owner.
+
+    Args:
+        path: SQLite database shared by all replicas
+        owner: Unique id of this replica
+        ttl_seconds: How long a lease stays valid without renewal
+    """
+
+    def __init__(self, path: str, owner: str, ttl_seconds: float):
+        self.owner = owner
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def try_acquire(self, name: str) -> bool:
+        """
+        Take the lease if it is free or expired, or renew it if this owner holds it.
+
+        Returns:
+            True if this owner holds the lease for another `ttl_seconds`
+        """
+        now = time.time()
+        with self._lock:
+            changed = self._conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, self.owner, now + self.ttl_seconds, now)
+            ).rowcount
+        return changed == 1
+
+    def release(self, name: str):
+        """Give the lease up early (e.g. on shutdown) so another replica takes over at once"""
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def holder(self, name: str) -> Optional[Tuple[str, float]]:
+        """Current (owner, expires_at) of an unexpired lease, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT owner, expires_at FROM leases WHERE name = ? AND expires_at >= ?", (name, time.time())
+            ).fetchone()
+        return tuple(row) if row else None
@@ -0,0 +1,165 @@
+"""
+Event-Loop Monitor
+Measures event-loop lag and reports callbacks that block the loop, with their stack.
+
+A sampler task sleeps for a short interval and records how late it wakes up: the
+delay is the time other callbacks held the loop. A watchdog thread follows the
+sampler's heartbeat; once the loop has not come round for longer than the
+threshold, it logs the loop thread's current stack, which is the stack of the
+blocking call, caught while it still blocks. When the loop is back, the length
+of the stall is logged as well.
+
+Lag is kept as running totals and a cumulative histogram, served as JSON or in
+the Prometheus text format, so a change that brings back a blocking call shows up
+in monitoring right away. Meant as a debug mode: the sampler costs one wake-up
+per interval and the watchdog one thread.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional
+
+DEFAULT_THRESHOLD_SECONDS = 0.1
+DEFAULT_INTERVAL_SECONDS = 0.05
+# Upper bounds of the lag histogram buckets, in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_RECENT_STALLS = 20
+
+
+class LoopMonitor:
+    """
+    Samples the lag of the running event loop and reports stalls.
+
+    Args:
+        threshold: Seconds the loop may be held before a stall is reported
+        interval: Seconds between lag samples
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD_SECONDS, interval: float = DEFAULT_INTERVAL_SECONDS):
+        self.enabled = False
+        self.threshold = threshold
+        self.interval = interval
+        self.samples = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_total = 0.0
+        self.stalls = 0
+        self.stall_seconds_total = 0.0
+        self.recent_stalls: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT_STALLS)
+        self._buckets = [0] * len(LAG_BUCKETS)
+        self._heartbeat = time.monotonic()
+        self._stack: Optional[str] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start sampling the running event loop, unless the monitor is disabled or already runs"""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the sampler and the watchdog"""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def watch(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine (the server) with the monitor sampling its loop"""
+        self.start()
+        try:
+            return await coro
+        finally:
+            await self.stop()
+
+    async def _sample(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self._record(max(now - expected, 0.0))
+
+    def _record(self, lag: float):
+        self.samples += 1
+        self.lag_last = lag
+        self.lag_max = max(self.lag_max, lag)
+        self.lag_total += lag
+        for index, bound in enumerate(LAG_BUCKETS):
+            if lag <= bound:
+                self._buckets[index] += 1
+        # The watchdog took the stack while the loop was held, unless the stall was too short to catch
+        stack, self._stack = self._stack, None
+        if lag < self.threshold:
+            return
+        self.stalls += 1
+        self.stall_seconds_total += lag
+        self.recent_stalls.append({"at": time.time(), "duration_seconds": round(lag, 3), "stack": stack})
+        print(f"Warning: Event loop was blocked for {lag:.3f}s", file=sys.stderr)
+
+    def _watch(self):
+        """Watchdog thread: log the loop thread's stack while the loop is held"""
+        while not self._stopping.wait(self.threshold / 4):
+            held = time.monotonic() - self._heartbeat - self.interval
+            if held < self.threshold or self._stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._stack = "".join(traceback.format_stack(frame))
+            print(f"Warning: Event loop blocked for more than {held:.3f}s in:\n{self._stack}", file=sys.stderr)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Lag statistics and the most recent stalls"""
+        return {
+            "enabled": self.enabled,
+            "threshold_seconds": self.threshold,
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "lag_seconds": {
+                "last": round(self.lag_last, 4),
+                "max": round(self.lag_max, 4),
+                "average": round(self.lag_total / self.samples, 4) if self.samples else 0.0,
+            },
+            "histogram": {f"le_{bound:g}": count for bound, count in zip(LAG_BUCKETS, self._buckets)},
+            "stalls": self.stalls,
+            "stall_seconds_total": round(self.stall_seconds_total, 3),
+            "recent_stalls": list(self.recent_stalls),
+        }
+
+    def prometheus(self) -> str:
+        """Lag statistics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP novareel_event_loop_lag_seconds Delay of the event loop in waking up a sleeping task",
+            "# TYPE novareel_event_loop_lag_seconds histogram",
+        ]
+        for bound, count in zip(LAG_BUCKETS, self._buckets):
+            lines.append(f'novareel_event_loop_lag_seconds_bucket{{le="{bound:g}"}} {count}')
+        lines += [
+            f'novareel_event_loop_lag_seconds_bucket{{le="+Inf"}} {self.samples}',
+            f"novareel_event_loop_lag_seconds_sum {self.lag_total:.6f}",
+            f"novareel_event_loop_lag_seconds_count {self.samples}",
+            "# HELP novareel_event_loop_lag_max_seconds Largest event-loop lag since start",
+            "# TYPE novareel_event_loop_lag_max_seconds gauge",
+            f"novareel_event_loop_lag_max_seconds {self.lag_max:.6f}",
+            "# HELP novareel_event_loop_stalls_total Times the event loop was held longer than the threshold",
+            "# TYPE novareel_event_loop_stalls_total counter",
+            f"novareel_event_loop_stalls_total {self.stalls}",
+        ]
+        return "\n".join(lines) + "\n"
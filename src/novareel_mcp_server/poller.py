@@ -0,0 +1,121 @@
+"""
+Background Poller
+Keeps unfinished invocations up to date without waiting for a tool call.
+
+Each cycle claims the poll lease of every unfinished job it can (see
+SQLiteInvocationStore.claim_poll) and refreshes only those, so several workers
+sharing one store never poll the same job twice. With a LeaseManager, replicas
+additionally elect a single leader that runs the poll loop; the others stand by
+and take over once the leader's lease expires.
+
+With a schedule (see CompletionPredictor.next_poll_at), a job is only polled
+once it is due, when it is likely to have made progress, instead of every cycle.
+
+Calls to the shared SQLite store run on the thread pool, as they may wait for
+another worker's write lock; the in-memory store is only touched from the event
+loop, which owns its dicts.
+"""
+
+import asyncio
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from .concurrency import bounded_map, run_blocking
+from .leases import POLLER_LEASE, LeaseManager
+from .sqlite_store import SQLiteInvocationStore
+from .store import TERMINAL_STATUSES
+
+
+class BackgroundPoller:
+    """
+    Periodically refreshes unfinished invocations this process holds the lease for.
+
+    Args:
+        store: Invocation store (in-memory or shared)
+        refresh: Coroutine function refreshing one record from Bedrock and writing it back
+        interval_seconds: Pause between two polling cycles
+        concurrency: Maximum number of status requests in flight at once
+        leases: Elect one polling replica through this lease manager (optional)
+        schedule: Returns when an unfinished record is next due for a poll, given the current
+            time (optional; default: every cycle)
+    """
+
+    def __init__(self, store: Any, refresh: Callable[[Any], Awaitable[Any]],
+                 interval_seconds: float, concurrency: int, leases: Optional[LeaseManager] = None,
+                 schedule: Optional[Callable[[Any, float], float]] = None):
+        if leases and leases.ttl_seconds <= interval_seconds:
+            raise ValueError("Lease TTL must be longer than the poll interval, or leadership lapses between renewals")
+        self.store = store
+        self.refresh = refresh
+        self.interval_seconds = interval_seconds
+        self.concurrency = concurrency
+        self.leases = leases
+        self.is_leader = leases is None
+        self.schedule = schedule
+        # Next poll time by job_id; jobs without an entry are due
+        self._next_poll: Dict[str, float] = {}
+
+    async def _store_call(self, func, *args):
+        if isinstance(self.store, SQLiteInvocationStore):
+            return await run_blocking(func, *args)
+        return func(*args)
+
+    async def _claim_unfinished(self):
+        now = time.time()
+        unfinished = await self._store_call(self.store.unfinished)
+        self._next_poll = {
+            record.job_id: self._next_poll[record.job_id] for record in unfinished if record.job_id in self._next_poll
+        }
+        due = [record for record in unfinished if self._next_poll.get(record.job_id, now) <= now]
+        return [record for record in due if await self._store_call(self.store.claim_poll, record)]
+
+    async def _refresh_one(self, record):
+        try:
+            await self.refresh(record)
+        except ClientError as e:
+            record.error = str(e)
+            await self._store_call(self.store.update, record)
+        if self.schedule is not None and record.status not in TERMINAL_STATUSES:
+            self._next_poll[record.job_id] = self.schedule(record, time.time())
+
+    async def poll_once(self) -> int:
+        """
+        Run one polling cycle.
+
+        Returns:
+            Number of refreshed invocations
+        """
+        claimed = await self._claim_unfinished()
+        await bounded_map(self._refresh_one, claimed, self.concurrency)
+        if claimed:
+            await self._store_call(self.store.save)
+        return len(claimed)
+
+    async def _elect(self) -> bool:
+        """Take or renew the poller lease; renewing every cycle doubles as the leader's heartbeat"""
+        if self.leases is None:
+            return True
+        was_leader = self.is_leader
+        self.is_leader = await run_blocking(self.leases.try_acquire, POLLER_LEASE)
+        if self.is_leader != was_leader:
+            role = "leader" if self.is_leader else "standby"
+            print(f"Background poller of {self.leases.owner} is now {role}", file=sys.stderr)
+        return self.is_leader
+
+    async def run(self):
+        """Poll until cancelled, then hand leases back so another replica takes over immediately"""
+        try:
+            while True:
+                try:
+                    if await self._elect():
+                        await self.poll_once()
+                except Exception as e:
+                    print(f"Warning: Background poll failed: {e}", file=sys.stderr)
+                await asyncio.sleep(self.interval_seconds)
+        finally:
+            if self.leases is not None:
+                self.leases.release(POLLER_LEASE)
+            self.store.release_polls()
@@ -0,0 +1,291 @@
+"""
+Post-processing
+Extracts metadata and a poster frame from finished videos, as small local artifacts.
+
+When a job completes, a worker process reads only the byte ranges of
+output.mp4 it needs from S3: the top-level box headers, then the `moov` box,
+which holds duration, resolution and codec. If ffmpeg is installed, it grabs a
+poster frame and a thumbnail from a presigned URL, seeking with HTTP range
+requests instead of downloading the whole video. Artifacts are written to
+<artifacts_dir>/<job_id>/ and a summary is returned for the invocation record.
+
+Work runs in a bounded pool of worker processes, so parsing and ffmpeg never
+block the server's event loop.
+"""
+
+import asyncio
+import inspect
+import json
+import multiprocessing
+import os
+import shutil
+import struct
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_WORKERS = 2
+# Refuse to read a moov box larger than this; Nova Reel's are a few tens of KB
+MAX_MOOV_BYTES = 16 * 1024 * 1024
+FFMPEG_TIMEOUT_SECONDS = 120
+PRESIGNED_URL_SECONDS = 600
+THUMBNAIL_WIDTH = 320
+
+# Boxes on the path moov -> trak -> mdia -> minf -> stbl that contain other boxes
+_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class MP4Error(ValueError):
+    """The file is not an MP4 this parser understands"""
+    pass
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, payload_start, box_end) for the boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size, = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise MP4Error(f"Truncated {box_type!r} box at offset {offset}")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _parse_moov(moov: bytes) -> Dict[str, Any]:
+    """Duration, resolution, codec and frame rate from the payload of a moov box"""
+    metadata: Dict[str, Any] = {}
+    tracks = []
+
+    def walk(start, end, track):
+        for box_type, payload, box_end in _iter_boxes(moov, start, end):
+            version = moov[payload] if payload < box_end else 0
+            if box_type == b"trak":
+                track = {}
+                tracks.append(track)
+                walk(payload, box_end, track)
+            elif box_type in _CONTAINER_BOXES:
+                walk(payload, box_end, track)
+            elif box_type == b"mvhd":
+                if version == 1:
+                    timescale, duration = struct.unpack_from(">IQ", moov, payload + 20)
+                else:
+                    timescale, duration = struct.unpack_from(">II", moov, payload + 12)
+                if timescale:
+                    metadata["duration_seconds"] = round(duration / timescale, 3)
+            elif box_type == b"tkhd":
+                # Width and height are 16.16 fixed point, after the version-dependent times and the matrix
+                offset = payload + (88 if version == 1 else 76)
+                width, height = struct.unpack_from(">II", moov, offset)
+                track["width"], track["height"] = width >> 16, height >> 16
+            elif box_type == b"mdhd":
+                if version == 1:
+                    track["timescale"], track["duration"] = struct.unpack_from(">IQ", moov, payload + 20)
+                else:
+                    track["timescale"], track["duration"] = struct.unpack_from(">II", moov, payload + 12)
+            elif box_type == b"hdlr":
+                track["handler"] = moov[payload + 8:payload + 12]
+            elif box_type == b"stsd":
+                # The first sample entry's type is the codec's four-character code
+                track["codec"] = moov[payload + 12:payload + 16].decode("ascii", "replace")
+            elif box_type == b"stts":
+                count, = struct.unpack_from(">I", moov, payload + 4)
+                track["frame_count"] = sum(
+                    struct.unpack_from(">I", moov, payload + 8 + index * 8)[0] for index in range(count)
+                )
+
+    try:
+        walk(0, len(moov), None)
+    except struct.error:
+        # A box shorter than the fields it must hold
+        raise MP4Error("Truncated box inside the moov box") from None
+
+    video = next((track for track in tracks if track.get("handler") == b"vide"), None)
+    if video is None:
+        raise MP4Error("No video track found")
+    metadata["width"] = video.get("width")
+    metadata["height"] = video.get("height")
+    metadata["codec"] = video.get("codec")
+    if "frame_count" in video:
+        metadata["frame_count"] = video["frame_count"]
+        if video.get("timescale") and video.get("duration"):
+            metadata["fps"] = round(video["frame_count"] * video["timescale"] / video["duration"], 3)
+    return metadata
+
+
+def parse_mp4(read_range: Callable[[int, int], bytes], size: int) -> Dict[str, Any]:
+    """
+    Read MP4 metadata by fetching only box headers and the moov box.
+
+    Args:
+        read_range: Function returning `length` bytes of the file at `offset`
+        size: File size in bytes
+
+    Returns:
+        Dict with duration_seconds, width, height, codec, and frame_count/fps when known
+    """
+    offset = 0
+    while offset + 8 <= size:
+        header = read_range(offset, min(16, size - offset))
+        box_size, box_type = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if box_size == 1:
+            box_size, = struct.unpack_from(">Q", header, 8)
+            header_size = 16
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < header_size:
+            raise MP4Error(f"Invalid {box_type!r} box size at offset {offset}")
+        if box_type == b"moov":
+            if box_size > MAX_MOOV_BYTES:
+                raise MP4Error(f"moov box of {box_size} bytes is too large")
+            metadata = _parse_moov(read_range(offset + header_size, box_size - header_size))
+            metadata["size_bytes"] = size
+            return metadata
+        offset += box_size
+    raise MP4Error("No moov box found")
+
+
+def _s3_client(aws_settings: Dict[str, Any]):
+    import boto3
+    return boto3.Session(**aws_settings).client("s3")
+
+
+def _extract_frames(url: str, at_seconds: float, job_dir: str) -> Dict[str, Any]:
+    """Poster frame and thumbnail via ffmpeg, which fetches only the ranges around `at_seconds`"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return {"frames_skipped": "ffmpeg is not installed"}
+    poster = os.path.join(job_dir, "poster.jpg")
+    thumbnail = os.path.join(job_dir, "thumbnail.jpg")
+    command = [
+        ffmpeg, "-v", "error", "-y", "-ss", f"{at_seconds:.3f}", "-i", url,
+        "-map", "0:v:0", "-frames:v", "1", "-q:v", "3", poster,
+        "-map", "0:v:0", "-frames:v", "1", "-vf", f"scale={THUMBNAIL_WIDTH}:-2", "-q:v", "5", thumbnail,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS)
+    except subprocess.CalledProcessError as e:
+        return {"frames_error": e.stderr.decode("utf-8", "replace").strip() or str(e)}
+    except subprocess.TimeoutExpired:
+        return {"frames_error": f"ffmpeg timed out after {FFMPEG_TIMEOUT_SECONDS}s"}
+    return {"poster": poster, "thumbnail": thumbnail}
+
+
+def process_video(job_id: str, bucket: str, key: str, artifacts_dir: str,
+                  aws_settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Produce the artifacts of one video (runs in a worker process).
+
+    Returns:
+        Artifact summary for the invocation record, or a dict with "error"
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    try:
+        s3 = _s3_client(aws_settings)
+        size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+
+        def read_range(offset, length):
+            response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+            return response["Body"].read()
+
+        metadata = parse_mp4(read_range, size)
+        job_dir = os.path.join(artifacts_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        artifacts: Dict[str, Any] = {"metadata": metadata}
+
+        url = s3.generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=PRESIGNED_URL_SECONDS
+        )
+        at_seconds = min(1.0, metadata.get("duration_seconds", 0) / 2)
+        artifacts.update(_extract_frames(url, at_seconds, job_dir))
+
+        metadata_path = os.path.join(job_dir, "metadata.json")
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        artifacts["metadata_file"] = metadata_path
+        artifacts["processed_at"] = time.time()
+        return artifacts
+    except (ClientError, BotoCoreError, MP4Error, struct.error, IndexError, OSError) as e:
+        return {"error": f"Post-processing failed: {e}", "processed_at": time.time()}
+
+
+class PostProcessor:
+    """
+    Runs post-processing work in a bounded pool of worker processes.
+
+    Args:
+        artifacts_dir: Directory receiving one subdirectory of artifacts per job
+        max_workers: Maximum number of videos processed at once
+        aws_settings: boto3.Session arguments for the workers' S3 client
+    """
+
+    def __init__(self, artifacts_dir: str, max_workers: int = DEFAULT_WORKERS,
+                 aws_settings: Optional[Dict[str, Any]] = None):
+        self.artifacts_dir = artifacts_dir
+        self.max_workers = max_workers
+        self.aws_settings = aws_settings or {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = set()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Workers are spawned rather than forked: the server process runs threads and an event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Dict[str, Any]], *args) -> Dict[str, Any]:
+        """Call a module-level function in the pool and return its result dict"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool(), fn, *args)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory); the next call gets a fresh pool
+            self._executor = None
+            return {"error": f"Post-processing worker crashed: {e}"}
+
+    async def process(self, job_id: str, bucket: str, key: str) -> Dict[str, Any]:
+        """Process one video in the pool and return its artifact summary"""
+        return await self.run(process_video, job_id, bucket, key, self.artifacts_dir, self.aws_settings)
+
+    def schedule(self, on_done: Callable[[Dict[str, Any]], Any], fn: Callable[..., Dict[str, Any]], *args):
+        """
+        Call fn(*args) in the pool in the background and pass its result to on_done (which may be async).
+
+        on_done is called whatever happens, with a dict with "error" if the call raised.
+        """
+        async def run():
+            try:
+                result = await self.run(fn, *args)
+            except Exception as e:
+                # on_done always hears back, or e.g. a storyboard would stay "stitching" forever
+                result = {"error": f"Post-processing failed: {e}"}
+            done = on_done(result)
+            if inspect.isawaitable(done):
+                await done
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def schedule_video(self, job_id: str, bucket: str, key: str, on_done: Callable[[str, Dict[str, Any]], Any]):
+        """Process a video in the background and pass its artifacts to on_done(job_id, artifacts)"""
+        self.schedule(lambda artifacts: on_done(job_id, artifacts),
+                      process_video, job_id, bucket, key, self.artifacts_dir, self.aws_settings)
+
+    def shutdown(self):
+        """Stop the worker processes once their current work is done"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,176 @@
+"""
+Completion-Time Predictor
+Estimates when a job will finish from the generation times of completed jobs.
+
+Generation times (Bedrock accepting a job until it finished) are kept per
+duration_seconds and dimension, in a bounded window of the most recent jobs.
+They are learnt from the completed history in the store on start (restored
+from the store snapshot, if there is one) and from every job that completes
+afterwards. A prediction is a set of quantiles of that
+window. A combination with too little history borrows the time per video second
+of all recent jobs, and without any history a rule of thumb from the Nova Reel
+documentation is used.
+
+The ETA is the median. Polls are scheduled at the predicted quantiles: there is
+no point asking before the fastest jobs are done, and after that each poll
+falls where the next share of jobs finish. Past the slowest prediction, polls
+back off. Compared with a fixed 5-second loop, a two-minute video is checked a
+handful of times instead of about two hundred.
+"""
+
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from .records import InvocationRecord, JobStatus, format_timestamp
+
+# Quantiles predicted (and polled at); the middle one is the ETA
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+_MEDIAN = QUANTILES.index(0.5)
+# Completed jobs remembered per duration and dimension
+DEFAULT_WINDOW = 200
+# Jobs a duration/dimension needs before its own history is used
+MIN_SAMPLES = 5
+# Without history: a 6-second video takes about 90 seconds, a 2-minute video 14-17 minutes
+DEFAULT_SECONDS_PER_VIDEO_SECOND = 7.5
+_DEFAULT_SPREAD = (0.7, 0.85, 1.0, 1.2, 1.5)
+DEFAULT_MIN_POLL_SECONDS = 5.0
+DEFAULT_MAX_POLL_SECONDS = 60.0
+
+Key = Tuple[int, str]  # (duration_seconds, dimension)
+
+
+def finished_at(record: InvocationRecord) -> Optional[float]:
+    """When the job finished: Bedrock's end time if known, else when it was seen finished"""
+    return record.get_extra("bedrock_end_time") or record.completed_at or record.failed_at
+
+
+def _quantiles(ordered: List[float]) -> Tuple[float, ...]:
+    last = len(ordered) - 1
+    return tuple(ordered[round(q * last)] for q in QUANTILES)
+
+
+class _Window:
+    """Recent samples, with their quantiles computed once per change"""
+
+    __slots__ = ("samples", "_quantiles")
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self._quantiles: Optional[Tuple[float, ...]] = None
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self._quantiles = None
+
+    def quantiles(self) -> Tuple[float, ...]:
+        if self._quantiles is None:
+            self._quantiles = _quantiles(sorted(self.samples))
+        return self._quantiles
+
+
+class CompletionPredictor:
+    """
+    Predicts completion times and poll times of unfinished jobs.
+
+    Args:
+        window: Completed jobs remembered per duration and dimension
+        min_poll_seconds: Shortest time between two polls of a job
+        max_poll_seconds: Longest time between two polls of a job
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, min_poll_seconds: float = DEFAULT_MIN_POLL_SECONDS,
+                 max_poll_seconds: float = DEFAULT_MAX_POLL_SECONDS):
+        self.window = window
+        self.min_poll_seconds = min_poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self._windows: Dict[Key, _Window] = {}
+        # Seconds of generation per second of video, over all durations and dimensions
+        self._rates = _Window(window)
+
+    def observe(self, record: InvocationRecord):
+        """Learn from a job; only completed jobs with known times count"""
+        end = finished_at(record)
+        if record.status != JobStatus.COMPLETED or end is None or end <= record.created_at:
+            return
+        seconds = end - record.created_at
+        key = (record.duration_seconds, record.dimension)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window(self.window)
+        window.add(seconds)
+        self._rates.add(seconds / record.duration_seconds)
+
+    def rebuild(self, records: Iterable[InvocationRecord]):
+        """Learn from stored history, oldest first (on start)"""
+        self._windows.clear()
+        self._rates = _Window(self.window)
+        for record in records:
+            self.observe(record)
+
+    def replace(self, old: Optional[InvocationRecord], new: Optional[InvocationRecord]):
+        """Learn from a stored job that completed since a saved state; removed jobs stay learnt"""
+        if new is not None and (old is None or old.status != JobStatus.COMPLETED):
+            self.observe(new)
+
+    def state(self) -> Dict[str, Any]:
+        """Every window as JSON-compatible lists, to be restored later (e.g. from a store snapshot)"""
+        return {
+            "windows": [[duration, dimension, list(window.samples)]
+                        for (duration, dimension), window in self._windows.items()],
+            "rates": list(self._rates.samples),
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """Replace every window with a saved state (see state), keeping the newest samples that fit"""
+        self._windows.clear()
+        for duration, dimension, samples in state["windows"]:
+            window = self._windows[(duration, dimension)] = _Window(self.window)
+            window.samples.extend(samples)
+        self._rates = _Window(self.window)
+        self._rates.samples.extend(state["rates"])
+
+    def estimate(self, duration_seconds: int, dimension: str) -> Tuple[Tuple[float, ...], str, int]:
+        """
+        Predicted generation-time quantiles of a job.
+
+        Returns:
+            (quantiles in seconds, basis: "history", "scaled" or "default", samples used)
+        """
+        window = self._windows.get((duration_seconds, dimension))
+        if window is not None and len(window.samples) >= MIN_SAMPLES:
+            return window.quantiles(), "history", len(window.samples)
+        if len(self._rates.samples) >= MIN_SAMPLES:
+            rates = self._rates.quantiles()
+            return tuple(rate * duration_seconds for rate in rates), "scaled", len(self._rates.samples)
+        median = DEFAULT_SECONDS_PER_VIDEO_SECOND * duration_seconds
+        return tuple(factor * median for factor in _DEFAULT_SPREAD), "default", 0
+
+    def next_poll_at(self, record: InvocationRecord, now: Optional[float] = None) -> float:
+        """When an unfinished job is next worth a status request"""
+        now = time.time() if now is None else now
+        quantiles, _, _ = self.estimate(record.duration_seconds, record.dimension)
+        age = now - record.created_at
+        # The next predicted quantile not yet reached; past the last one, back off
+        index = bisect_right(quantiles, age + self.min_poll_seconds)
+        if index < len(quantiles):
+            wait = quantiles[index] - age
+        else:
+            wait = (age - quantiles[_MEDIAN]) / 2
+        return now + min(max(wait, self.min_poll_seconds), self.max_poll_seconds)
+
+    def predict(self, record: InvocationRecord, now: Optional[float] = None) -> Dict[str, Any]:
+        """ETA and recommended next poll of an unfinished job, for tool responses"""
+        now = time.time() if now is None else now
+        quantiles, basis, samples = self.estimate(record.duration_seconds, record.dimension)
+        age = now - record.created_at
+        next_poll = self.next_poll_at(record, now)
+        return {
+            "eta_seconds": round(max(quantiles[_MEDIAN] - age, 0.0)),
+            "expected_completion_at": format_timestamp(record.created_at + max(quantiles[_MEDIAN], age)),
+            "next_poll_in_seconds": round(next_poll - now),
+            "next_poll_at": format_timestamp(next_poll),
+            "eta_basis": basis,
+            "eta_samples": samples,
+        }
@@ -0,0 +1,197 @@
+"""
+Amazon Nova Reel Prompt Linter
+Fast, fully local scoring of prompts against the rules in the prompting guide.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from .prompting_guide import get_prompting_guidelines
+
+MAX_SCORE = 100
+MIN_WORDS = 8
+
+# Penalties subtracted from MAX_SCORE for each rule a prompt breaks
+PENALTIES = {
+    "too_short": 30,
+    "vague_terms": 15,
+    "no_camera_terminology": 15,
+    "no_lighting": 10,
+    "passive_language": 10,
+    "too_many_actions": 15,
+    "too_few_actions": 10,
+}
+
+# Inflected forms of the guide's camera movement keys ("pan" -> "pans", "panning", ...)
+_MOVEMENT_FORMS = {
+    "pan": ["pans", "panning", "panned"],
+    "tilt": ["tilts", "tilting", "tilted"],
+    "zoom": ["zooms", "zooming", "zoomed"],
+    "dolly": ["dollies", "dollying", "dollied"],
+    "tracking": ["track", "tracks", "tracked"],
+    "crane": ["cranes", "craning", "craned"],
+}
+
+_GENERIC_CAMERA_TERMS = [
+    "camera", "pov", "aerial", "drone shot", "handheld", "time-lapse", "timelapse",
+    "slow motion", "slow-motion", "lens", "orbit", "orbits", "orbiting", "pulls back",
+    "push in", "pushes in",
+]
+
+_GENERIC_LIGHTING_TERMS = [
+    "light", "lights", "lighting", "lit", "sunlight", "moonlight", "sunrise", "sunset",
+    "dawn", "dusk", "twilight", "shadow", "shadows", "glow", "glowing", "silhouette",
+    "silhouettes",
+]
+
+_VAGUE_TERMS = [
+    "something", "someone", "somewhere", "stuff", "thing", "things", "nice", "good",
+    "cool", "interesting", "various", "etc",
+]
+
+# Maximum number of distinct actions/beats that fit each duration range (pacing rule)
+_MAX_ACTIONS_BY_DURATION = [(24, 3), (60, 5), (120, 10)]
+_MIN_ACTIONS_LONG_VIDEO = 2
+_LONG_VIDEO_SECONDS = 60
+
+
+def _key_phrases(keys) -> List[str]:
+    """Turn guide keys such as "close_up" into the phrases a prompt would use."""
+    phrases = []
+    for key in keys:
+        phrase = key.replace("_", " ")
+        phrases.append(phrase)
+        if " " in phrase:
+            phrases.append(phrase.replace(" ", "-"))
+            phrases.append(phrase.replace(" ", ""))
+    return phrases
+
+
+def _compile(terms: List[str]) -> "re.Pattern[str]":
+    """Compile terms into one alternation, longest first so phrases beat single words."""
+    ordered = sorted(set(terms), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(term) for term in ordered) + r")\b")
+
+
+def _build_vocabularies() -> Dict[str, "re.Pattern[str]"]:
+    """Build the matchers once from the prompting guide vocabularies."""
+    guide = get_prompting_guidelines()
+    camera = guide["camera_control"]
+    lighting = guide["lighting_and_atmosphere"]
+
+    movements = list(camera["camera_movements"])
+    for key in camera["camera_movements"]:
+        movements.extend(_MOVEMENT_FORMS.get(key, []))
+
+    shot_terms = _key_phrases(camera["shot_types"]) + _key_phrases(camera["angles"])
+    shot_terms += ["bird's eye", "birds eye", "worm's eye", "worms eye", "shot"]
+    shot_terms += _key_phrases(camera["depth_of_field"]) + ["depth of field", "deep focus"]
+
+    lighting_terms = _key_phrases(lighting["natural_lighting"])
+    lighting_terms += _key_phrases(lighting["artificial_lighting"])
+    lighting_terms += _GENERIC_LIGHTING_TERMS
+
+    return {
+        "camera_movements": _compile(movements + _GENERIC_CAMERA_TERMS),
+        "shot_types": _compile(shot_terms),
+        "lighting": _compile(lighting_terms),
+        "atmosphere": _compile(_key_phrases(lighting["weather_atmosphere"])),
+        "vague": _compile(_VAGUE_TERMS),
+    }
+
+
+_VOCABULARIES = _build_vocabularies()
+_PASSIVE = re.compile(r"\b(?:was|were)\s+\w+ing\b|\b(?:was|were|been)\s+\w+ed\b")
+_ACTION_SPLIT = re.compile(r"[,;:.]|\bthen\b|\bwhile\b|\bbefore\b|\bafter\b|\bfinally\b")
+
+
+def _max_actions(duration_seconds: int) -> int:
+    for limit, max_actions in _MAX_ACTIONS_BY_DURATION:
+        if duration_seconds <= limit:
+            return max_actions
+    return _MAX_ACTIONS_BY_DURATION[-1][1]
+
+
+def analyze_prompt(prompt: str, duration_seconds: int = 12) -> Dict[str, Any]:
+    """
+    Score a prompt against the prompting guide rules.
+
+    Args:
+        prompt: Text prompt to analyze
+        duration_seconds: Planned video duration, used for the pacing rule
+
+    Returns:
+        Dict with a 0-100 score, the list of issues found and the matched vocabulary
+    """
+    text = prompt.lower()
+    words = text.split()
+    issues = []
+
+    def flag(code: str, message: str, suggestion: str):
+        issues.append({"code": code, "message": message, "suggestion": suggestion})
+
+    matched = {
+        name: sorted(set(_VOCABULARIES[name].findall(text)))
+        for name in ("camera_movements", "shot_types", "lighting", "atmosphere")
+    }
+
+    if len(words) < MIN_WORDS:
+        flag("too_short", f"Prompt has only {len(words)} words",
+             "Be specific about who, what, where, when, and how")
+
+    vague = sorted(set(_VOCABULARIES["vague"].findall(text)))
+    if vague:
+        flag("vague_terms", f"Vague terms: {', '.join(vague)}",
+             "Replace vague words with concrete subjects, actions and details")
+
+    if not matched["camera_movements"] and not matched["shot_types"]:
+        flag("no_camera_terminology", "No shot type or camera movement specified",
+             "Add a shot type (close-up, wide shot) or movement (pan, dolly, tracking)")
+
+    if not matched["lighting"] and not matched["atmosphere"]:
+        flag("no_lighting", "No lighting or atmosphere described",
+             "Describe the lighting (golden hour, neon, backlighting) or weather")
+
+    if _PASSIVE.search(text):
+        flag("passive_language", "Prompt uses passive voice or past tense",
+             "Use active voice and present tense for dynamic scenes")
+
+    actions = sum(1 for part in _ACTION_SPLIT.split(text) if len(part.split()) >= 2)
+    max_actions = _max_actions(duration_seconds)
+    if actions > max_actions:
+        flag("too_many_actions",
+             f"About {actions} actions described for a {duration_seconds}s video (suggested max {max_actions})",
+             "Match action complexity to video duration or increase duration_seconds")
+    elif duration_seconds >= _LONG_VIDEO_SECONDS and actions < _MIN_ACTIONS_LONG_VIDEO:
+        flag("too_few_actions",
+             f"Only {actions} action described for a {duration_seconds}s video",
+             "Develop a narrative with multiple scenes for long videos")
+
+    score = MAX_SCORE - sum(PENALTIES[issue["code"]] for issue in issues)
+    return {
+        "score": max(score, 0),
+        "issues": issues,
+        "matched": matched,
+        "word_count": len(words),
+        "action_count": actions,
+    }
+
+
+def check_prompt(prompt: str, duration_seconds: int,
+                 min_score: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Gate a prompt on its score.
+
+    Returns:
+        None when the prompt may be submitted, otherwise an error dict with the analysis
+    """
+    if min_score is None:
+        return None
+    analysis = analyze_prompt(prompt, duration_seconds)
+    if analysis["score"] >= min_score:
+        return None
+    return {
+        "error": f"Prompt scored {analysis['score']}, below the minimum score of {min_score}",
+        "prompt_analysis": analysis,
+        "suggestion": "Use analyze_prompt and get_prompting_guide to improve the prompt"
+    }
@@ -3,9 +3,23 @@ Amazon Nova Reel Prompting Guidelines
 Based on AWS documentation for video generation and camera control.
 """
 
-def get_prompting_guidelines():
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+try:
+    from mcp.types import TextContent
+    try:
+        from fastmcp.tools import FunctionTool, ToolResult
+    except ImportError:
+        from fastmcp.tools.tool import FunctionTool, ToolResult
+except ImportError:  # Older fastmcp: the tool is registered as usual and its dicts are converted per call
+    FunctionTool = ToolResult = None
+
+
+def _build_prompting_guidelines() -> Dict[str, Any]:
     """
-    Returns comprehensive prompting guidelines for Amazon Nova Reel video generation.
+    Builds comprehensive prompting guidelines for Amazon Nova Reel video generation.
     Based on AWS documentation:
     - https://docs.aws.amazon.com/nova/latest/userguide/prompting-video-generation.html
     - https://docs.aws.amazon.com/nova/latest/userguide/prompting-video-camera-control.html
@@ -227,3 +241,117 @@ def get_prompting_guidelines():
             "technical_template": "[Shot type] of [subject] [action] in [environment], [lighting], [camera movement], [style]"
         }
     }
+
+
+
+# The guide is static, so it is built, serialized and hashed exactly once at import.
+_GUIDELINES = _build_prompting_guidelines()
+_SERIALIZED_SECTIONS = {
+    name: json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+    for name, content in _GUIDELINES.items()
+}
+_SERIALIZED_GUIDE = json.dumps(_GUIDELINES, ensure_ascii=False, separators=(",", ":"))
+GUIDE_VERSION = hashlib.sha256(_SERIALIZED_GUIDE.encode("utf-8")).hexdigest()[:16]
+_FULL_RESPONSE = {"version": GUIDE_VERSION, **_GUIDELINES}
+_SECTION_RESPONSES = {
+    name: {"version": GUIDE_VERSION, "section": name, "content": content}
+    for name, content in _GUIDELINES.items()
+}
+
+
+def _tool_result(response: Dict[str, Any]):
+    text = json.dumps(response, ensure_ascii=False, separators=(",", ":"))
+    return ToolResult(content=[TextContent(type="text", text=text)], structured_content=response)
+
+
+# Complete tool results for the whole guide and for each section, keyed by the identity of
+# the shared response dict they carry, so a call neither re-serializes the guide nor copies
+# it into content blocks.
+_TOOL_RESULTS = {} if ToolResult is None else {
+    id(response): _tool_result(response)
+    for response in (_FULL_RESPONSE, *_SECTION_RESPONSES.values())
+}
+
+
+if FunctionTool is not None:
+    class PreparedGuideTool(FunctionTool):
+        """A FunctionTool that answers with the tool results prepared for the guide and its sections"""
+
+        def convert_result(self, raw_value: Any):
+            # The shared responses live as long as the module, so their ids are never reused
+            prepared = _TOOL_RESULTS.get(id(raw_value))
+            if prepared is not None:
+                return prepared
+            return super().convert_result(raw_value)
+
+
+def guide_tool(mcp):
+    """
+    Decorator registering the get_prompting_guide tool on a FastMCP server.
+
+    The tool function keeps returning plain response dicts; only the conversion to the
+    MCP result is replaced by the prepared results. With older fastmcp the tool is
+    registered like any other.
+    """
+    def register(fn):
+        if FunctionTool is None:
+            return mcp.tool()(fn)
+        mcp.add_tool(PreparedGuideTool.from_function(fn))
+        return fn
+    return register
+
+
+def get_prompting_guidelines() -> Dict[str, Any]:
+    """
+    Returns comprehensive prompting guidelines for Amazon Nova Reel video generation.
+    The returned dict is shared between callers and must not be mutated.
+    """
+    return _GUIDELINES
+
+
+def get_guide_sections() -> List[str]:
+    """Returns the names of the top-level guide sections."""
+    return list(_GUIDELINES)
+
+
+def get_serialized_guide(section: Optional[str] = None) -> Optional[str]:
+    """
+    Returns the pre-serialized JSON of the whole guide or of a single section.
+    Returns None for an unknown section.
+    """
+    if section is None:
+        return _SERIALIZED_GUIDE
+    return _SERIALIZED_SECTIONS.get(section)
+
+
+def get_prompting_guide_response(section: Optional[str] = None,
+                                 known_version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Builds the get_prompting_guide tool response.
+    
+    Args:
+        section: Return only this top-level section (e.g. "camera_control")
+        known_version: Guide version the client already holds; if it matches,
+            a small "not modified" response is returned instead of the content
+    
+    Returns:
+        Dict with the guide (or section) and its version. The guide and section
+        responses are shared between callers and must not be mutated.
+    """
+    if section is not None and section not in _GUIDELINES:
+        return {
+            "error": f"Unknown guide section: {section}",
+            "available_sections": get_guide_sections()
+        }
+    
+    if known_version is not None and known_version.strip('"') == GUIDE_VERSION:
+        return {
+            "not_modified": True,
+            "version": GUIDE_VERSION,
+            "section": section
+        }
+    
+    if section is None:
+        return _FULL_RESPONSE
+    
+    return _SECTION_RESPONSES[section]
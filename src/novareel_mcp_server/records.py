@@ -0,0 +1,152 @@
+"""
+Invocation Records
+Compact in-memory representation of tracked video generation jobs.
+
+Records use __slots__ instead of per-instance dicts, statuses are shared enum
+members and timestamps are floats (seconds since the epoch). Records are only
+converted to dicts at the boundaries: tool responses and persistence.
+"""
+
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JobStatus(str, Enum):
+    """Invocation status as reported by Bedrock (plus Unknown when polling fails)"""
+    IN_PROGRESS = "InProgress"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+    UNKNOWN = "Unknown"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+_STATUS_BY_VALUE = {status.value: status for status in JobStatus}
+
+
+def parse_status(value: str) -> JobStatus:
+    """Map a Bedrock status string to its shared enum member"""
+    return _STATUS_BY_VALUE.get(value, JobStatus.UNKNOWN)
+
+
+def format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """Render a stored timestamp the way invocation dicts always have (local ISO 8601)"""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Accept ISO strings from older files as well as numeric timestamps"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+class InvocationRecord:
+    """One tracked invocation; see to_dict for the response/persistence shape"""
+
+    __slots__ = (
+        "job_id", "invocation_arn", "prompt", "duration_seconds", "fps", "dimension",
+        "seed", "task_type", "s3_location", "status", "created_at", "completed_at",
+        "failed_at", "video_url", "failure_message", "error", "groups", "shots", "extra",
+    )
+
+    # Field names with a slot; anything else in an invocation dict goes to `extra`
+    _FIELDS = frozenset(__slots__) - {"extra"}
+
+    def __init__(self, job_id: str, invocation_arn: str, prompt: str, duration_seconds: int,
+                 fps: int, dimension: str, seed: Optional[int], task_type: str, s3_location: str,
+                 status: JobStatus = JobStatus.IN_PROGRESS, created_at: Optional[float] = None,
+                 groups: Tuple[str, ...] = (), shots: Optional[List[str]] = None,
+                 extra: Optional[Dict[str, Any]] = None):
+        self.job_id = job_id
+        self.invocation_arn = invocation_arn
+        self.prompt = prompt
+        self.duration_seconds = duration_seconds
+        self.fps = fps
+        self.dimension = dimension
+        self.seed = seed
+        self.task_type = task_type
+        self.s3_location = s3_location
+        self.status = status
+        self.created_at = created_at if created_at is not None else datetime.now().timestamp()
+        self.completed_at: Optional[float] = None
+        self.failed_at: Optional[float] = None
+        self.video_url: Optional[str] = None
+        self.failure_message: Optional[str] = None
+        self.error: Optional[str] = None
+        self.groups = groups
+        self.shots = shots
+        # Rarely used fields (image inputs, ...) live here so every record doesn't pay for them
+        self.extra = extra
+
+    def get_extra(self, key: str, default: Any = None) -> Any:
+        return self.extra.get(key, default) if self.extra else default
+
+    def set_extra(self, key: str, value: Any):
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the invocation dict used in responses and the JSON file"""
+        data = {
+            "invocation_arn": self.invocation_arn,
+            "job_id": self.job_id,
+            "prompt": self.prompt,
+            "duration_seconds": self.duration_seconds,
+            "fps": self.fps,
+            "dimension": self.dimension,
+            "seed": self.seed,
+            "task_type": self.task_type,
+            "s3_location": self.s3_location,
+            "status": self.status.value,
+            "created_at": format_timestamp(self.created_at),
+            "video_url": self.video_url,
+        }
+        if self.extra:
+            data.update(self.extra)
+        if self.completed_at is not None:
+            data["completed_at"] = format_timestamp(self.completed_at)
+        if self.failed_at is not None:
+            data["failed_at"] = format_timestamp(self.failed_at)
+        if self.failure_message is not None:
+            data["failure_message"] = self.failure_message
+        if self.error is not None:
+            data["error"] = self.error
+        if self.groups:
+            data["groups"] = list(self.groups)
+        if self.shots is not None:
+            data["shots"] = list(self.shots)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InvocationRecord":
+        """Build a record from an invocation dict (e.g. loaded from the JSON file)"""
+        extra = {key: value for key, value in data.items() if key not in cls._FIELDS}
+        record = cls(
+            job_id=data["job_id"],
+            invocation_arn=data["invocation_arn"],
+            prompt=data["prompt"],
+            duration_seconds=data["duration_seconds"],
+            fps=data["fps"],
+            dimension=data["dimension"],
+            seed=data.get("seed"),
+            task_type=data["task_type"],
+            s3_location=data.get("s3_location", ""),
+            status=parse_status(data.get("status", "Unknown")),
+            created_at=parse_timestamp(data.get("created_at")),
+            groups=tuple(data.get("groups", ())),
+            shots=data.get("shots"),
+            extra=extra or None,
+        )
+        record.completed_at = parse_timestamp(data.get("completed_at"))
+        record.failed_at = parse_timestamp(data.get("failed_at"))
+        record.video_url = data.get("video_url")
+        record.failure_message = data.get("failure_message")
+        record.error = data.get("error")
+        return record
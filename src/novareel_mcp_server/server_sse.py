@@ -6,18 +6,50 @@ Provides tools for video generation using AWS Bedrock Nova Reel model via Server
 
 import argparse
 import asyncio
+import itertools
 import json
 import os
 import sys
 import random
 import time
+import uuid
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 import boto3
+from botocore import xform_name
 from botocore.exceptions import ClientError, NoCredentialsError
 
-from fastmcp import FastMCP
-from .prompting_guide import get_prompting_guidelines
+from fastmcp import Context, FastMCP
+from starlette.requests import Request
+from starlette.responses import Response
+from .concurrency import DEFAULT_MAX_CONCURRENT_SUBMISSIONS, ConcurrencyGovernor, bounded_map, run_blocking
+from .image_input import ImageInputError, load_image, resolve_shot_images
+from .prompt_linter import analyze_prompt as analyze_prompt_text, check_prompt
+from .prompting_guide import GUIDE_VERSION, get_prompting_guide_response, get_serialized_guide, guide_tool
+from .accounting import DEFAULT_PRICE_PER_SECOND_USD, SCOPES, Accountant, Limits, load_tenant_limits
+from .admission import (
+    DEFAULT_MAX_QUEUED, DEFAULT_QUEUE_TIMEOUT_SECONDS, MIDDLEWARE_SUPPORTED, AdmissionController,
+    AdmissionMiddleware, parse_tool_limits,
+)
+from .archive import InvocationArchive
+from .export import (
+    FORMATS as EXPORT_FORMATS, ExportError, export_path, parse_filters, thread_safe_invocations, write_export,
+)
+from .loopmonitor import DEFAULT_THRESHOLD_SECONDS as DEFAULT_BLOCKING_THRESHOLD_SECONDS, LoopMonitor
+from .poller import BackgroundPoller
+from .postprocess import DEFAULT_WORKERS as DEFAULT_POSTPROCESS_WORKERS, PostProcessor
+from .predictor import CompletionPredictor
+from .records import InvocationRecord, JobStatus, format_timestamp
+from .storyboard import (
+    STORYBOARD_ID_PATTERN, StoryboardStatus, claim_stitch, load_manifest, plan_segments,
+    release_stitch, save_manifest, stitch_held, stitch_segments, storyboard_dir,
+)
+from .store import TERMINAL_STATUSES, InvocationStore, RetentionPolicy, client_request_token
+from .tenancy import DEFAULT_TENANT, TenantError, configure_tenancy, current_identity, load_api_keys, record_tenant
+from .webhooks import CallbackURLError, WebhookDispatcher, check_callback_url, invocation_event
+from .validation import (
+    SHOT_DURATION_SECONDS, build_shot_params, validate_generation, validate_shots,
+)
 
 # Create MCP server with SSE transport
 mcp = FastMCP("Amazon Nova Reel 1.1 SSE")
@@ -31,12 +63,58 @@ aws_region: Optional[str] = None
 s3_bucket: Optional[str] = None
 bedrock_client = None
 
+# Prompts scoring below this threshold are rejected before submission (None disables the gate)
+min_prompt_score: Optional[int] = None
+
+# Callers' image paths must be inside this directory; None disables image input for remote callers
+image_input_dir: Optional[str] = None
+
 # Model configuration
 MODEL_ID = "amazon.nova-reel-v1:1"
 SLEEP_SECONDS = 5  # Interval for checking video generation progress
 
 # In-memory storage for tracking invocations (in production, use persistent storage)
-active_invocations = {}
+store = InvocationStore()
+# Finished jobs removed from memory by the retention policy are kept here
+ARCHIVE_FILE = os.path.expanduser("~/.novareel_invocations_sse.archive.jsonl.gz")
+
+# All Bedrock submissions share this cap, whichever tool issues them
+submission_governor = ConcurrencyGovernor(DEFAULT_MAX_CONCURRENT_SUBMISSIONS)
+MAX_SWEEP_VARIANTS = 100
+MAX_IDEMPOTENCY_KEY_LENGTH = 256
+
+# Cost units (seconds of video) per tenant, API key and group; limits are checked at admission
+accountant = Accountant()
+
+# Generation times learnt from completed jobs, for ETAs and poll scheduling
+predictor = CompletionPredictor()
+
+# Concurrent tool calls per tool and per tenant, with a bounded wait queue (no limits until configured)
+admission = AdmissionController()
+if MIDDLEWARE_SUPPORTED:
+    mcp.add_middleware(AdmissionMiddleware(admission))
+
+# Event-loop lag sampler and blocking-call detector, enabled with --debug-blocking
+loop_monitor = LoopMonitor()
+
+# Callbacks for finished jobs go to the job's callback_url, or else to this global URL
+webhook_url: Optional[str] = None
+WEBHOOK_OUTBOX_FILE = os.path.expanduser("~/.novareel_webhooks_sse.db")
+webhook_dispatcher = WebhookDispatcher(WEBHOOK_OUTBOX_FILE)
+# Background poller, started once there are callbacks to deliver
+poller_task: Optional[asyncio.Task] = None
+
+# Worker processes for post-processing and storyboard stitching; artifacts go to one
+# subdirectory per job (or storyboard)
+ARTIFACTS_DIR = os.path.expanduser("~/.novareel_artifacts_sse")
+postprocessor = PostProcessor(ARTIFACTS_DIR)
+# Post-process every completed video (metadata, poster frame), not only on request
+postprocess_videos = False
+
+
+def save_invocations():
+    """Save invocations to persistent storage (no-op for the in-memory store)"""
+    store.save()
 
 
 class NovaReelError(Exception):
@@ -102,6 +180,319 @@ def initialize_aws_client():
         raise AWSConfigError(f"Failed to initialize AWS client: {e}")
 
 
+def _aws_session_settings() -> Dict[str, Any]:
+    """boto3.Session arguments matching initialize_aws_client, for clients created in worker processes"""
+    if aws_profile:
+        return {"profile_name": aws_profile, "region_name": aws_region}
+    if aws_access_key_id and aws_secret_access_key:
+        return {
+            "region_name": aws_region,
+            "aws_access_key_id": aws_access_key_id,
+            "aws_secret_access_key": aws_secret_access_key,
+            "aws_session_token": aws_session_token
+        }
+    return {"region_name": aws_region}
+
+
+async def _start_invocation(
+    prompt: str,
+    duration_seconds: int,
+    fps: int,
+    dimension: str,
+    seed: Optional[int],
+    task_type: str,
+    shots: Optional[List[Dict[str, Any]]] = None,
+    image_path: Optional[str] = None,
+    group_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    callback_url: Optional[str] = None,
+    persist: bool = True
+) -> Dict[str, Any]:
+    """Validate, submit and track one generation job (shared by all submitting tools)"""
+    requested_at = time.time()  # Exports report the time from here to Bedrock accepting the job
+    
+    # The job belongs to the calling tenant; keys and groups only match the tenant's own
+    try:
+        identity = current_identity()
+    except TenantError as e:
+        return {"error": str(e)}
+    
+    # A retry with a known idempotency key gets the original job back without touching Bedrock
+    if idempotency_key is not None:
+        if not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+            return {"error": f"idempotency_key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters"}
+        existing = store.find_idempotent(idempotency_key, tenant=identity.tenant)
+        if existing:
+            return _replay_invocation(existing, prompt, duration_seconds, fps, dimension, seed, task_type)
+    
+    if group_id is not None and store.group_tenant(group_id) not in (None, identity.tenant):
+        return {"error": f"group_id is already used by another tenant: {group_id}"}
+    
+    # Check every parameter against the model's capabilities before anything reaches Bedrock
+    validation_error = validate_generation(prompt, duration_seconds, fps, dimension, task_type, MODEL_ID)
+    if validation_error:
+        return validation_error
+    
+    # Validate per-shot input for manual multi-shot jobs
+    if shots is not None and task_type != "MULTI_SHOT_MANUAL":
+        return {"error": "shots can only be used with task_type MULTI_SHOT_MANUAL"}
+    
+    if task_type == "MULTI_SHOT_MANUAL":
+        shot_errors = validate_shots(shots, duration_seconds)
+        if shot_errors:
+            return {
+                "error": "Invalid shots for MULTI_SHOT_MANUAL",
+                "shot_errors": shot_errors,
+                "expected_shots": duration_seconds // SHOT_DURATION_SECONDS
+            }
+    
+    # The server will POST to this URL, so it must not point into the server's own network
+    if callback_url is not None:
+        try:
+            await run_blocking(check_callback_url, callback_url, webhook_dispatcher.allow_private)
+        except CallbackURLError as e:
+            return {"error": str(e)}
+    
+    if image_path is not None and task_type != "TEXT_VIDEO":
+        return {"error": "image_path can only be used with task_type TEXT_VIDEO (use per-shot image_path for MULTI_SHOT_MANUAL)"}
+    
+    # Without an input directory a remote caller could make the server read any local image
+    if image_input_dir is None and (image_path or any(shot.get("image_path") for shot in shots or ())):
+        return {"error": "Image input is disabled on this server (start it with --image-input-dir)"}
+    
+    # Reject weak prompts locally before paying for generation
+    rejection = check_prompt(prompt, duration_seconds, min_prompt_score)
+    if rejection:
+        return rejection
+    
+    # Generate seed if not provided
+    if seed is None:
+        seed = random.randint(0, 2147483648)
+    
+    # Encode starting images off the event loop (cached by content hash)
+    image = None
+    if image_path:
+        image = await load_image(image_path, dimension, image_input_dir)
+    if task_type == "MULTI_SHOT_MANUAL":
+        shots = await resolve_shot_images(shots, dimension, image_input_dir)
+    
+    # Prepare model input
+    if task_type == "MULTI_SHOT_MANUAL":
+        # Manual shots are 6 seconds each, so the duration is implied by the shot count
+        model_input = {
+            "taskType": task_type,
+            "multiShotManualParams": {"shots": build_shot_params(shots)},
+            "videoGenerationConfig": {
+                "fps": fps,
+                "dimension": dimension,
+                "seed": seed,
+            },
+        }
+    elif task_type == "TEXT_VIDEO":
+        text_params = {"text": prompt}
+        if image:
+            text_params["images"] = [image["block"]]
+        model_input = {
+            "taskType": task_type,
+            "textToVideoParams": text_params,
+            "videoGenerationConfig": {
+                "durationSeconds": duration_seconds,
+                "fps": fps,
+                "dimension": dimension,
+                "seed": seed,
+            },
+        }
+    else:
+        model_input = {
+            "taskType": task_type,
+            "multiShotAutomatedParams": {"text": prompt},
+            "videoGenerationConfig": {
+                "durationSeconds": duration_seconds,
+                "fps": fps,
+                "dimension": dimension,
+                "seed": seed,
+            },
+        }
+    
+    request = {
+        "modelId": MODEL_ID,
+        "modelInput": model_input,
+        "outputDataConfig": {"s3OutputDataConfig": {"s3Uri": f"s3://{s3_bucket}"}},
+    }
+    if idempotency_key is not None:
+        # Bedrock also deduplicates by token, which covers retries racing the first call
+        request["clientRequestToken"] = client_request_token(idempotency_key, identity.tenant)
+    
+    # Check budgets and rate caps, reserving the cost before Bedrock commits real spend
+    charge, denial = accountant.charge(identity, group_id, duration_seconds)
+    if denial:
+        return denial
+    
+    # Start async invocation (off the event loop, within the shared submission cap)
+    try:
+        invocation = await submission_governor.run(bedrock_client.start_async_invoke, **request)
+    except Exception:
+        accountant.refund(charge)
+        raise
+    
+    invocation_arn = invocation["invocationArn"]
+    job_id = invocation_arn.split("/")[-1]
+    s3_location = f"s3://{s3_bucket}/{job_id}"
+    
+    # Store invocation details
+    invocation_data = InvocationRecord(
+        job_id=job_id,
+        invocation_arn=invocation_arn,
+        prompt=prompt,
+        duration_seconds=duration_seconds,
+        fps=fps,
+        dimension=dimension,
+        seed=seed,
+        task_type=task_type,
+        s3_location=s3_location,
+        groups=(group_id,) if group_id else (),
+        shots=[shot["text"] for shot in shots] if shots else None
+    )
+    if image:
+        invocation_data.set_extra("image_path", image_path)
+        invocation_data.set_extra("image_sha256", image["sha256"])
+    if idempotency_key is not None:
+        invocation_data.set_extra("idempotency_key", idempotency_key)
+    if callback_url is not None:
+        invocation_data.set_extra("callback_url", callback_url)
+    invocation_data.set_extra("tenant", identity.tenant)
+    invocation_data.set_extra("requested_at", requested_at)
+    if identity.api_key:
+        invocation_data.set_extra("api_key", identity.api_key)
+    
+    if not store.add(invocation_data):
+        # Bedrock deduplicated the token into a job already tracked: keep its state and drop the new charge
+        accountant.refund(charge)
+        return _started_response(store.get(job_id))
+    if persist:
+        save_invocations()  # Save to persistent storage
+    if callback_url or webhook_url:
+        _start_callback_delivery()
+    
+    return _started_response(invocation_data)
+
+
+def _started_response(invocation_data: InvocationRecord) -> Dict[str, Any]:
+    """Response of a submitted job, as returned by start_async_invoke"""
+    job_id = invocation_data.job_id
+    response = {
+        "success": True,
+        "invocation_arn": invocation_data.invocation_arn,
+        "job_id": job_id,
+        "status": invocation_data.status.value,
+        "s3_location": invocation_data.s3_location,
+        "estimated_video_url": f"https://{s3_bucket}.s3.{aws_region}.amazonaws.com/{job_id}/output.mp4",
+        "prompt": invocation_data.prompt,
+        "config": {
+            "duration_seconds": invocation_data.duration_seconds,
+            "fps": invocation_data.fps,
+            "dimension": invocation_data.dimension,
+            "seed": invocation_data.seed
+        },
+        "message": "Video generation started. Use get_async_invoke to check progress after next_poll_in_seconds."
+    }
+    if invocation_data.groups:
+        response["group_id"] = invocation_data.groups[0]
+    if invocation_data.status not in TERMINAL_STATUSES:
+        response.update(predictor.predict(invocation_data))
+    return response
+
+
+def _replay_invocation(invocation_data: InvocationRecord, prompt: str, duration_seconds: int, fps: int,
+                       dimension: str, seed: Optional[int], task_type: str) -> Dict[str, Any]:
+    """Answer a repeated start with the job its idempotency key started first"""
+    original = (invocation_data.prompt, invocation_data.duration_seconds, invocation_data.fps,
+                invocation_data.dimension, invocation_data.task_type)
+    if original != (prompt, duration_seconds, fps, dimension, task_type) or (seed is not None and seed != invocation_data.seed):
+        return {
+            "error": "idempotency_key was already used for a different request",
+            "job_id": invocation_data.job_id
+        }
+    response = _started_response(invocation_data)
+    response["idempotent_replay"] = True
+    response["message"] = "Job was already started with this idempotency_key; returning the original job."
+    return response
+
+
+async def _notify_finished(invocation_data: InvocationRecord):
+    """Queue the callback of a job that just reached a terminal state"""
+    url = invocation_data.get_extra("callback_url") or webhook_url
+    if url:
+        event = f"invocation.{invocation_data.status.value.lower()}"
+        await webhook_dispatcher.enqueue(url, event, invocation_event(invocation_data))
+        webhook_dispatcher.ensure_running()
+
+
+def _start_callback_delivery():
+    """Deliver callbacks, polling unfinished jobs in the background so completions are noticed without tool calls"""
+    webhook_dispatcher.ensure_running()
+    _start_background_polling()
+
+
+def _start_background_polling():
+    """Poll unfinished jobs in the background, unless the poller already runs"""
+    global poller_task
+    if poller_task is None or poller_task.done():
+        poller = BackgroundPoller(store, _refresh_invocation, SLEEP_SECONDS, submission_governor.limit,
+                                  schedule=predictor.next_poll_at)
+        poller_task = asyncio.get_running_loop().create_task(poller.run())
+
+
+def _store_artifacts(job_id: str, artifacts: Dict[str, Any]):
+    """Attach the post-processing results of a job to its record"""
+    invocation_data = store.get(job_id)
+    if invocation_data:
+        invocation_data.set_extra("artifacts", artifacts)
+        store.update(invocation_data)
+        save_invocations()
+
+
+async def _refresh_invocation(invocation_data: InvocationRecord) -> Dict[str, Any]:
+    """Fetch the current status of an invocation from AWS and update its record"""
+    response = await run_blocking(
+        bedrock_client.get_async_invoke,
+        invocationArn=invocation_data.invocation_arn
+    )
+    
+    job_id = invocation_data.job_id
+    current_status = response["status"]
+    # A job cancelled here keeps running on Bedrock; once it ends there it is recorded as Cancelled
+    cancel_requested = invocation_data.get_extra("cancel_requested_at") is not None
+    if cancel_requested and current_status in ("Completed", "Failed"):
+        current_status = "Cancelled"
+    was_finished = invocation_data.status in TERMINAL_STATUSES
+    store.set_status(invocation_data, current_status)
+    
+    if current_status == "Completed":
+        invocation_data.video_url = f"https://{s3_bucket}.s3.{aws_region}.amazonaws.com/{job_id}/output.mp4"
+        invocation_data.completed_at = datetime.now().timestamp()
+    elif current_status in ["Failed", "Cancelled"]:
+        invocation_data.failed_at = datetime.now().timestamp()
+        if cancel_requested:
+            invocation_data.failure_message = "Cancelled by user"
+        elif "failureMessage" in response:
+            invocation_data.failure_message = response["failureMessage"]
+    # Bedrock's own end time keeps generation times in exports exact, whatever the polling interval
+    if invocation_data.status in TERMINAL_STATUSES and isinstance(response.get("endTime"), datetime):
+        invocation_data.set_extra("bedrock_end_time", response["endTime"].timestamp())
+    store.update(invocation_data)
+    if not was_finished and invocation_data.status in TERMINAL_STATUSES:
+        predictor.observe(invocation_data)
+        await _notify_finished(invocation_data)
+        if postprocess_videos and invocation_data.status == JobStatus.COMPLETED:
+            postprocessor.schedule_video(job_id, s3_bucket, f"{job_id}/output.mp4", _store_artifacts)
+        storyboard_id = invocation_data.get_extra("storyboard_id")
+        if storyboard_id:
+            await _advance_storyboard(storyboard_id)
+    
+    return response
+
+
 @mcp.tool()
 async def start_async_invoke(
     prompt: str,
@@ -109,18 +500,35 @@ async def start_async_invoke(
     fps: int = 24,
     dimension: str = "1280x720",
     seed: Optional[int] = None,
-    task_type: str = "MULTI_SHOT_AUTOMATED"
+    task_type: str = "MULTI_SHOT_AUTOMATED",
+    shots: Optional[List[Dict[str, Any]]] = None,
+    image_path: Optional[str] = None,
+    group_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+    callback_url: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Start asynchronous video generation with Amazon Nova Reel.
     
     Args:
         prompt: Text description for video generation. See prompting guidelines for best practices.
-        duration_seconds: Video duration in seconds (must be multiple of 6, range 12-120)
+        duration_seconds: Video duration in seconds (must be multiple of 6, range 12-120; 6 for TEXT_VIDEO)
         fps: Frames per second (24 recommended)
-        dimension: Video dimensions (1280x720, 1920x1080, etc.)
+        dimension: Video dimensions (Nova Reel 1.1 supports 1280x720)
         seed: Random seed for reproducible results (optional)
-        task_type: Task type (MULTI_SHOT_AUTOMATED recommended)
+        task_type: Task type (MULTI_SHOT_AUTOMATED recommended, MULTI_SHOT_MANUAL for per-shot prompts,
+            TEXT_VIDEO for a single 6-second shot that may start from an image)
+        shots: Per-shot input for MULTI_SHOT_MANUAL, one 6-second shot per entry:
+            [{"text": "...", "image_path": "..."}]; the number of shots must equal
+            duration_seconds / 6 and each text is limited to 512 characters (optional)
+        image_path: Local path of a PNG/JPEG starting image for TEXT_VIDEO; it must match
+            dimension exactly (optional)
+        group_id: Group/tag for the job, so a whole batch can be tracked with
+            get_group_status (optional)
+        idempotency_key: Unique key for this request; retrying with the same key within
+            24 hours returns the original job instead of starting another one (optional)
+        callback_url: URL that receives a signed POST when the job completes, fails or is
+            cancelled; overrides the server's global webhook URL (optional)
     
     Returns:
         Dict containing invocation details and job information
@@ -129,77 +537,16 @@ async def start_async_invoke(
         if not bedrock_client:
             initialize_aws_client()
         
-        # Validate duration
-        if duration_seconds < 12 or duration_seconds > 120 or duration_seconds % 6 != 0:
-            return {
-                "error": "Duration must be a multiple of 6 in range [12, 120]",
-                "valid_durations": [12, 18, 24, 30, 36, 42, 48, 54, 60, 66, 72, 78, 84, 90, 96, 102, 108, 114, 120]
-            }
-        
-        # Generate seed if not provided
-        if seed is None:
-            seed = random.randint(0, 2147483648)
-        
-        # Prepare model input
-        model_input = {
-            "taskType": task_type,
-            "multiShotAutomatedParams": {"text": prompt},
-            "videoGenerationConfig": {
-                "durationSeconds": duration_seconds,
-                "fps": fps,
-                "dimension": dimension,
-                "seed": seed,
-            },
-        }
-        
-        # Start async invocation
-        invocation = bedrock_client.start_async_invoke(
-            modelId=MODEL_ID,
-            modelInput=model_input,
-            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{s3_bucket}"}},
+        return await _start_invocation(
+            prompt, duration_seconds, fps, dimension, seed, task_type,
+            shots=shots, image_path=image_path, group_id=group_id,
+            idempotency_key=idempotency_key, callback_url=callback_url
         )
         
-        invocation_arn = invocation["invocationArn"]
-        job_id = invocation_arn.split("/")[-1]
-        s3_location = f"s3://{s3_bucket}/{job_id}"
-        
-        # Store invocation details
-        invocation_data = {
-            "invocation_arn": invocation_arn,
-            "job_id": job_id,
-            "prompt": prompt,
-            "duration_seconds": duration_seconds,
-            "fps": fps,
-            "dimension": dimension,
-            "seed": seed,
-            "task_type": task_type,
-            "s3_location": s3_location,
-            "status": "InProgress",
-            "created_at": datetime.now().isoformat(),
-            "video_url": None
-        }
-        
-        active_invocations[job_id] = invocation_data
-        
-        return {
-            "success": True,
-            "invocation_arn": invocation_arn,
-            "job_id": job_id,
-            "status": "InProgress",
-            "s3_location": s3_location,
-            "estimated_video_url": f"https://{s3_bucket}.s3.{aws_region}.amazonaws.com/{job_id}/output.mp4",
-            "prompt": prompt,
-            "config": {
-                "duration_seconds": duration_seconds,
-                "fps": fps,
-                "dimension": dimension,
-                "seed": seed
-            },
-            "message": "Video generation started. Use get_async_invoke to check progress."
-        }
-        
     except AWSConfigError as e:
         return {"error": f"AWS configuration error: {e}"}
+    except ImageInputError as e:
+        return {"error": f"Invalid image input: {e}"}
     except ClientError as e:
         return {"error": f"AWS API error: {e}"}
     except Exception as e:
@@ -209,58 +556,51 @@ async def start_async_invoke(
 @mcp.tool()
 async def list_async_invokes() -> Dict[str, Any]:
     """
-    List all tracked async video generation invocations.
+    List the caller's tracked async video generation invocations.
     
     Returns:
-        Dict containing list of all invocations with their current status
+        Dict containing list of the tenant's invocations with their current status
     """
     try:
         if not bedrock_client:
             initialize_aws_client()
         
-        # Update status for all active invocations
+        # Update status for the tenant's active invocations; other tenants' jobs are never read
+        tenant = current_identity().tenant
         updated_invocations = []
         
-        for job_id, invocation_data in active_invocations.items():
+        for job_id, invocation_data in store.tenant_items(tenant):
             try:
-                # Get current status from AWS
-                response = bedrock_client.get_async_invoke(
-                    invocationArn=invocation_data["invocation_arn"]
-                )
-                
-                # Update status
-                current_status = response["status"]
-                invocation_data["status"] = current_status
-                
-                if current_status == "Completed":
-                    invocation_data["video_url"] = f"https://{s3_bucket}.s3.{aws_region}.amazonaws.com/{job_id}/output.mp4"
-                    invocation_data["completed_at"] = datetime.now().isoformat()
-                elif current_status in ["Failed", "Cancelled"]:
-                    invocation_data["failed_at"] = datetime.now().isoformat()
-                    if "failureMessage" in response:
-                        invocation_data["failure_message"] = response["failureMessage"]
+                # Finished jobs cannot change any more, so only unfinished ones are polled,
+                # and only if no other worker sharing the store holds their poll lease
+                if invocation_data.status not in TERMINAL_STATUSES and store.claim_poll(invocation_data):
+                    await _refresh_invocation(invocation_data)
+                current_status = invocation_data.status.value
                 
                 updated_invocations.append({
                     "job_id": job_id,
                     "status": current_status,
-                    "prompt": invocation_data["prompt"][:100] + "..." if len(invocation_data["prompt"]) > 100 else invocation_data["prompt"],
-                    "created_at": invocation_data["created_at"],
-                    "video_url": invocation_data.get("video_url"),
-                    "duration_seconds": invocation_data["duration_seconds"]
+                    "prompt": invocation_data.prompt[:100] + "..." if len(invocation_data.prompt) > 100 else invocation_data.prompt,
+                    "created_at": format_timestamp(invocation_data.created_at),
+                    "video_url": invocation_data.video_url,
+                    "duration_seconds": invocation_data.duration_seconds
                 })
                 
             except ClientError as e:
                 # If we can't get status, mark as unknown
-                invocation_data["status"] = "Unknown"
-                invocation_data["error"] = str(e)
+                store.set_status(invocation_data, "Unknown")
+                invocation_data.error = str(e)
+                store.update(invocation_data)
                 updated_invocations.append({
                     "job_id": job_id,
                     "status": "Unknown",
-                    "prompt": invocation_data["prompt"][:100] + "..." if len(invocation_data["prompt"]) > 100 else invocation_data["prompt"],
-                    "created_at": invocation_data["created_at"],
+                    "prompt": invocation_data.prompt[:100] + "..." if len(invocation_data.prompt) > 100 else invocation_data.prompt,
+                    "created_at": format_timestamp(invocation_data.created_at),
                     "error": str(e)
                 })
         
+        save_invocations()
+        
         return {
             "success": True,
             "total_invocations": len(updated_invocations),
@@ -273,6 +613,8 @@ async def list_async_invokes() -> Dict[str, Any]:
             }
         }
         
+    except TenantError as e:
+        return {"error": str(e)}
     except AWSConfigError as e:
         return {"error": f"AWS configuration error: {e}"}
     except Exception as e:
@@ -294,75 +636,71 @@ async def get_async_invoke(identifier: str) -> Dict[str, Any]:
         if not bedrock_client:
             initialize_aws_client()
         
-        # Find invocation by job_id or invocation_arn
-        invocation_data = None
-        job_id = None
-        
-        if identifier in active_invocations:
-            # Direct job_id lookup
-            job_id = identifier
-            invocation_data = active_invocations[identifier]
-        else:
-            # Search by invocation_arn
-            for jid, data in active_invocations.items():
-                if data["invocation_arn"] == identifier:
-                    job_id = jid
-                    invocation_data = data
-                    break
+        # Find the caller's invocation by job_id or invocation_arn (both indexed)
+        tenant = current_identity().tenant
+        invocation_data = store.find(identifier, tenant)
         
         if not invocation_data:
+            # Finished jobs may have been moved to the archive by the retention policy
+            archived = await run_blocking(store.find_archived, identifier, tenant)
+            if archived:
+                return {
+                    "success": True,
+                    "archived": True,
+                    **archived,
+                    "message": "Invocation was moved to the archive; its status is final."
+                }
             return {
                 "error": f"Invocation not found: {identifier}",
                 "suggestion": "Use list_async_invokes to see all tracked invocations"
             }
+        job_id = invocation_data.job_id
         
-        # Get current status from AWS
+        # Get current status from AWS; finished (or cancelled) jobs cannot change any more,
+        # and jobs another worker sharing the store is polling are reported as stored
         try:
-            response = bedrock_client.get_async_invoke(
-                invocationArn=invocation_data["invocation_arn"]
-            )
-            
-            current_status = response["status"]
-            invocation_data["status"] = current_status
+            if invocation_data.status not in TERMINAL_STATUSES and store.claim_poll(invocation_data):
+                await _refresh_invocation(invocation_data)
+            current_status = invocation_data.status.value
             
             # Prepare detailed response
             result = {
                 "success": True,
                 "job_id": job_id,
-                "invocation_arn": invocation_data["invocation_arn"],
+                "invocation_arn": invocation_data.invocation_arn,
                 "status": current_status,
-                "prompt": invocation_data["prompt"],
+                "prompt": invocation_data.prompt,
                 "config": {
-                    "duration_seconds": invocation_data["duration_seconds"],
-                    "fps": invocation_data["fps"],
-                    "dimension": invocation_data["dimension"],
-                    "seed": invocation_data["seed"],
-                    "task_type": invocation_data["task_type"]
+                    "duration_seconds": invocation_data.duration_seconds,
+                    "fps": invocation_data.fps,
+                    "dimension": invocation_data.dimension,
+                    "seed": invocation_data.seed,
+                    "task_type": invocation_data.task_type
                 },
-                "s3_location": invocation_data["s3_location"],
-                "created_at": invocation_data["created_at"]
+                "s3_location": invocation_data.s3_location,
+                "created_at": format_timestamp(invocation_data.created_at)
             }
+            if invocation_data.shots is not None:
+                result["config"]["shots"] = invocation_data.shots
             
             if current_status == "Completed":
-                video_url = f"https://{s3_bucket}.s3.{aws_region}.amazonaws.com/{job_id}/output.mp4"
-                invocation_data["video_url"] = video_url
-                invocation_data["completed_at"] = datetime.now().isoformat()
-                
-                result["video_url"] = video_url
-                result["completed_at"] = invocation_data["completed_at"]
+                result["video_url"] = invocation_data.video_url
+                result["completed_at"] = format_timestamp(invocation_data.completed_at)
                 result["message"] = "Video generation completed successfully!"
+                artifacts = invocation_data.get_extra("artifacts")
+                if artifacts:
+                    result["artifacts"] = artifacts
                 
             elif current_status == "InProgress":
-                result["message"] = "Video generation is still in progress. Check again in a few moments."
+                result.update(predictor.predict(invocation_data))
+                result["message"] = "Video generation is still in progress. Check again after next_poll_in_seconds."
                 
             elif current_status in ["Failed", "Cancelled"]:
-                invocation_data["failed_at"] = datetime.now().isoformat()
-                result["failed_at"] = invocation_data["failed_at"]
+                result["failed_at"] = format_timestamp(invocation_data.failed_at)
                 result["message"] = f"Video generation {current_status.lower()}"
                 
-                if "failureMessage" in response:
-                    result["failure_message"] = response["failureMessage"]
-                    invocation_data["failure_message"] = response["failureMessage"]
+                if invocation_data.failure_message is not None:
+                    result["failure_message"] = invocation_data.failure_message
             
             return result
             
@@ -370,9 +708,11 @@ async def get_async_invoke(identifier: str) -> Dict[str, Any]:
             return {
                 "error": f"Failed to get invocation status: {e}",
                 "job_id": job_id,
-                "last_known_status": invocation_data.get("status", "Unknown")
+                "last_known_status": invocation_data.status.value
             }
         
+    except TenantError as e:
+        return {"error": str(e)}
     except AWSConfigError as e:
         return {"error": f"AWS configuration error: {e}"}
     except Exception as e:
@@ -380,14 +720,910 @@ async def get_async_invoke(identifier: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
-async def get_prompting_guide() -> Dict[str, Any]:
+async def get_video_metadata(identifier: str, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Get the post-processing artifacts of a completed video: duration, resolution and
+    codec read from the MP4 header, and the local poster frame and thumbnail.
+    
+    Args:
+        identifier: Either job_id or invocation_arn
+        refresh: Process the video again even if artifacts exist (default: False)
+    
+    Returns:
+        Dict containing the video metadata and artifact file paths
+    """
+    try:
+        invocation_data = store.find(identifier, current_identity().tenant)
+        if not invocation_data:
+            return {
+                "error": f"Invocation not found: {identifier}",
+                "suggestion": "Use list_async_invokes to see all tracked invocations"
+            }
+        job_id = invocation_data.job_id
+        
+        if invocation_data.status != JobStatus.COMPLETED:
+            return {
+                "error": f"Video is not available; job status is {invocation_data.status.value}",
+                "job_id": job_id
+            }
+        
+        artifacts = invocation_data.get_extra("artifacts")
+        if artifacts is None or refresh:
+            artifacts = await postprocessor.process(job_id, s3_bucket, f"{job_id}/output.mp4")
+            _store_artifacts(job_id, artifacts)
+        
+        if "error" in artifacts:
+            return {"job_id": job_id, **artifacts}
+        return {"success": True, "job_id": job_id, **artifacts}
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+# Bedrock operations that would stop an async invocation; none exists in bedrock-runtime today
+CANCEL_OPERATIONS = ("CancelAsyncInvoke", "StopAsyncInvoke")
+LOCAL_CANCEL_NOTE = (
+    "Bedrock has no API to stop an async invocation: the job keeps running (and is billed) on Bedrock, "
+    "so it stays InProgress here, keeping its charge, until Bedrock reports it finished. It is then "
+    "recorded as Cancelled and its output is ignored."
+)
+
+
+def _remote_cancel_method() -> Optional[str]:
+    """Name of the client method that cancels an async invocation, if the service offers one"""
+    operations = bedrock_client.meta.service_model.operation_names
+    for operation in CANCEL_OPERATIONS:
+        if operation in operations:
+            return xform_name(operation)
+    return None
+
+
+async def _cancel_invocation(invocation_data: InvocationRecord, cancel_method: Optional[str]) -> Dict[str, Any]:
+    """Cancel one unfinished job and reflect it in the store right away"""
+    job_id = invocation_data.job_id
+    if invocation_data.status in TERMINAL_STATUSES:
+        return {"job_id": job_id, "status": invocation_data.status.value, "cancelled": False,
+                "reason": "Job already finished"}
+    if invocation_data.get_extra("cancel_requested_at") is not None:
+        return {"job_id": job_id, "status": invocation_data.status.value, "cancelled": False,
+                "reason": "Cancellation already requested"}
+    
+    if not cancel_method:
+        # Bedrock keeps running the job, so it stays unfinished and charged until Bedrock reports it ended
+        invocation_data.set_extra("cancel_mode", "local")
+        invocation_data.set_extra("cancel_requested_at", datetime.now().timestamp())
+        store.update(invocation_data)
+        return {"job_id": job_id, "status": invocation_data.status.value, "cancelled": True, "cancel_pending": True}
+    
+    await submission_governor.run(getattr(bedrock_client, cancel_method),
+                                  invocationArn=invocation_data.invocation_arn)
+    store.set_status(invocation_data, "Cancelled")
+    invocation_data.failed_at = datetime.now().timestamp()
+    invocation_data.failure_message = "Cancelled by user"
+    invocation_data.set_extra("cancel_mode", "remote")
+    store.update(invocation_data)
+    await _notify_finished(invocation_data)
+    return {"job_id": job_id, "status": "Cancelled", "cancelled": True}
+
+
+@mcp.tool()
+async def cancel_async_invoke(identifier: str) -> Dict[str, Any]:
+    """
+    Cancel an unfinished video generation job.
+    
+    Args:
+        identifier: Either job_id or invocation_arn
+    
+    Returns:
+        Dict with the job's new status and whether Bedrock itself stopped the job
+    """
+    try:
+        if not bedrock_client:
+            initialize_aws_client()
+        
+        invocation_data = store.find(identifier, current_identity().tenant)
+        if not invocation_data:
+            return {
+                "error": f"Invocation not found: {identifier}",
+                "suggestion": "Use list_async_invokes to see all tracked invocations"
+            }
+        
+        cancel_method = _remote_cancel_method()
+        result = await _cancel_invocation(invocation_data, cancel_method)
+        save_invocations()
+        
+        response = {"success": True, **result, "remote_cancel": bool(cancel_method)}
+        if result["cancelled"] and not cancel_method:
+            response["note"] = LOCAL_CANCEL_NOTE
+        return response
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except ClientError as e:
+        return {"error": f"AWS API error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def bulk_cancel(
+    group_id: Optional[str] = None,
+    status: Optional[str] = None,
+    older_than_minutes: Optional[float] = None,
+    prompt_contains: Optional[str] = None,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Cancel every unfinished job matching all given filters, e.g. a mistaken batch.
+    
+    At least one filter is required; use status="InProgress" to cancel all running jobs.
+    
+    Args:
+        group_id: Only jobs of this group (optional)
+        status: Only jobs with this status, "InProgress" or "Unknown" (optional)
+        older_than_minutes: Only jobs started more than this many minutes ago (optional)
+        prompt_contains: Only jobs whose prompt contains this text, case-insensitive (optional)
+        dry_run: Only report which jobs would be cancelled (default: False)
+    
+    Returns:
+        Dict with the matched jobs and the result of each cancellation
+    """
+    try:
+        if group_id is None and status is None and older_than_minutes is None and prompt_contains is None:
+            return {"error": "At least one filter is required (group_id, status, older_than_minutes or prompt_contains)"}
+        
+        tenant = current_identity().tenant
+        if group_id is not None:
+            candidates = [inv for inv in store.group_members(group_id) if record_tenant(inv) == tenant]
+        else:
+            candidates = [invocation_data for _, invocation_data in store.tenant_items(tenant)]
+        
+        cutoff = time.time() - older_than_minutes * 60 if older_than_minutes is not None else None
+        needle = prompt_contains.lower() if prompt_contains else None
+        matched = [
+            invocation_data for invocation_data in candidates
+            if invocation_data.status not in TERMINAL_STATUSES
+            and invocation_data.get_extra("cancel_requested_at") is None
+            and (status is None or invocation_data.status == status)
+            and (cutoff is None or invocation_data.created_at < cutoff)
+            and (needle is None or needle in invocation_data.prompt.lower())
+        ]
+        
+        if dry_run:
+            return {
+                "success": True,
+                "dry_run": True,
+                "matched": len(matched),
+                "jobs": [{"job_id": inv.job_id, "status": inv.status.value, "prompt": inv.prompt[:100]} for inv in matched]
+            }
+        
+        if not bedrock_client:
+            initialize_aws_client()
+        cancel_method = _remote_cancel_method()
+        
+        async def cancel(invocation_data):
+            try:
+                return await _cancel_invocation(invocation_data, cancel_method)
+            except ClientError as e:
+                return {"job_id": invocation_data.job_id, "cancelled": False, "error": str(e)}
+        
+        # Remote cancellations go through the shared submission cap
+        results = await bounded_map(cancel, matched, submission_governor.limit)
+        save_invocations()
+        
+        response = {
+            "success": True,
+            "matched": len(matched),
+            "cancelled": len([result for result in results if result["cancelled"]]),
+            "failed": len([result for result in results if "error" in result]),
+            "remote_cancel": bool(cancel_method),
+            "jobs": results
+        }
+        if not cancel_method and matched:
+            response["note"] = LOCAL_CANCEL_NOTE
+        return response
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def sweep(
+    prompt: str,
+    seeds: Optional[List[int]] = None,
+    seed_range: Optional[List[int]] = None,
+    dimensions: Optional[List[str]] = None,
+    durations: Optional[List[int]] = None,
+    fps: int = 24,
+    task_type: str = "MULTI_SHOT_AUTOMATED",
+    group_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Render one prompt across every combination of seeds, dimensions and durations.
+    
+    Combinations that are already in progress or completed are reused instead of
+    being rendered again. All new jobs are submitted through a bounded pipeline and
+    tagged with one group id.
+    
+    Args:
+        prompt: Text description for video generation
+        seeds: Explicit list of seeds (optional)
+        seed_range: [start, stop] or [start, stop, step] seed range, stop exclusive (optional)
+        dimensions: List of video dimensions (default: ["1280x720"])
+        durations: List of durations in seconds (default: [12])
+        fps: Frames per second (24 recommended)
+        task_type: Task type (MULTI_SHOT_AUTOMATED or TEXT_VIDEO)
+        group_id: Group id to tag the jobs with (generated if not provided)
+    
+    Returns:
+        Dict with the group id and the job for every combination
+    """
+    try:
+        if not bedrock_client:
+            initialize_aws_client()
+        
+        if task_type == "MULTI_SHOT_MANUAL":
+            return {"error": "sweep does not support MULTI_SHOT_MANUAL, use start_async_invoke with shots"}
+        
+        if seeds is None and seed_range is None:
+            return {"error": "Provide seeds and/or seed_range"}
+        if seed_range is not None and (
+            not isinstance(seed_range, (list, tuple)) or not 2 <= len(seed_range) <= 3
+            or not all(isinstance(value, int) and not isinstance(value, bool) for value in seed_range)
+            or len(seed_range) == 3 and seed_range[2] == 0
+        ):
+            return {"error": "seed_range must be [start, stop] or [start, stop, step] integers, with a non-zero step"}
+        
+        dimensions = dimensions or ["1280x720"]
+        durations = durations or [12]
+        
+        # Validate each distinct duration and dimension once instead of once per seed
+        for duration in set(durations):
+            for dimension in set(dimensions):
+                validation_error = validate_generation(prompt, duration, fps, dimension, task_type, MODEL_ID)
+                if validation_error:
+                    return validation_error
+        
+        # Each combination is rendered once: repeated values and explicit seeds inside the range are
+        # dropped, and the range stays lazy (it is never expanded into a list)
+        ranged_seeds = range(*seed_range) if seed_range is not None else range(0)
+        listed_seeds = [seed for seed in dict.fromkeys(seeds or ()) if seed not in ranged_seeds]
+        dimensions, durations = list(dict.fromkeys(dimensions)), list(dict.fromkeys(durations))
+        seed_count = len(listed_seeds) + len(ranged_seeds)
+        total_variants = seed_count * len(dimensions) * len(durations)
+        if total_variants == 0:
+            return {"error": "The sweep is empty"}
+        if total_variants > MAX_SWEEP_VARIANTS:
+            return {
+                "error": f"Sweep expands to {total_variants} variants, maximum is {MAX_SWEEP_VARIANTS}",
+                "suggestion": "Narrow the seed range or split the sweep into several groups"
+            }
+        
+        tenant = current_identity().tenant
+        group_id = group_id or f"sweep-{uuid.uuid4().hex[:12]}"
+        if store.group_tenant(group_id) not in (None, tenant):
+            return {"error": f"group_id is already used by another tenant: {group_id}"}
+        combinations = itertools.product(itertools.chain(listed_seeds, ranged_seeds), dimensions, durations)
+        
+        async def submit(combination):
+            seed, dimension, duration = combination
+            variant = {"seed": seed, "dimension": dimension, "duration_seconds": duration}
+            existing = store.find_variant(prompt, duration, fps, dimension, seed, task_type, tenant)
+            if existing:
+                store.add_to_group(group_id, existing.job_id)
+                return {**variant, "job_id": existing.job_id, "status": existing.status.value, "reused": True}
+            try:
+                result = await _start_invocation(
+                    prompt, duration, fps, dimension, seed, task_type,
+                    group_id=group_id, persist=False
+                )
+            except (ClientError, ImageInputError) as e:
+                result = {"error": str(e)}
+            if "error" in result:
+                return {**variant, "error": result["error"]}
+            return {**variant, "job_id": result["job_id"], "status": result["status"], "reused": False}
+        
+        jobs = await bounded_map(submit, combinations, submission_governor.limit)
+        save_invocations()
+        
+        return {
+            "success": True,
+            "group_id": group_id,
+            "total_variants": total_variants,
+            "submitted": len([job for job in jobs if job.get("reused") is False]),
+            "reused": len([job for job in jobs if job.get("reused")]),
+            "failed": len([job for job in jobs if "error" in job]),
+            "jobs": jobs,
+            "message": "Sweep submitted. Use get_group_status to check progress of the whole group."
+        }
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+async def _group_status(group_id: str, refresh: bool, tenant: str) -> Dict[str, Any]:
+    """Aggregate status of a tenant's group from the store's incrementally maintained counts"""
+    if store.group_tenant(group_id) not in (None, tenant):
+        return {"error": f"Group not found: {group_id}"}
+    
+    if refresh and store.group_counts(group_id):
+        # Only unfinished members can change, so only they are refreshed
+        async def refresh_member(invocation_data):
+            try:
+                await _refresh_invocation(invocation_data)
+            except ClientError as e:
+                invocation_data.error = str(e)
+                store.update(invocation_data)
+        
+        if not bedrock_client:
+            initialize_aws_client()
+        in_progress = [inv for inv in store.group_members(group_id) if inv.status is JobStatus.IN_PROGRESS and store.claim_poll(inv)]
+        await bounded_map(refresh_member, in_progress, submission_governor.limit)
+        save_invocations()
+    
+    counts = store.group_counts(group_id)
+    if counts is None:
+        return {"error": f"Group not found: {group_id}"}
+    
+    total = sum(counts.values())
+    completed = counts.get("Completed", 0)
+    failed = counts.get("Failed", 0) + counts.get("Cancelled", 0)
+    in_progress = counts.get("InProgress", 0)
+    unknown = counts.get("Unknown", 0)
+    return {
+        "success": True,
+        "group_id": group_id,
+        "total": total,
+        "completed": completed,
+        "failed": failed,
+        "in_progress": in_progress,
+        "unknown": unknown,
+        "counts": counts,
+        "done": in_progress + unknown == 0,
+        "message": f"{completed} of {total} complete, {failed} failed"
+    }
+
+
+@mcp.tool()
+async def get_group_status(
+    group_id: str,
+    refresh: bool = True,
+    include_jobs: bool = False
+) -> Dict[str, Any]:
+    """
+    Get aggregate progress of a group of jobs (e.g. a sweep) in one call.
+    
+    Args:
+        group_id: Group id given to start_async_invoke or returned by sweep
+        refresh: Refresh unfinished jobs of the group from AWS first (default: True)
+        include_jobs: Also list every job of the group (default: False)
+    
+    Returns:
+        Dict with "N of M complete, K failed" counts, a done flag and optionally the jobs
+    """
+    try:
+        result = await _group_status(group_id, refresh, current_identity().tenant)
+        if include_jobs and "error" not in result:
+            result["jobs"] = [
+                {"job_id": inv.job_id, "status": inv.status.value, "video_url": inv.video_url}
+                for inv in store.group_members(group_id)
+            ]
+        return result
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def wait_for_group(
+    group_id: str,
+    ctx: Context,
+    timeout_seconds: int = 900,
+    poll_interval_seconds: int = SLEEP_SECONDS
+) -> Dict[str, Any]:
+    """
+    Wait until every job of a group has finished, streaming progress notifications.
+    
+    Args:
+        group_id: Group id given to start_async_invoke or returned by sweep
+        timeout_seconds: Maximum time to wait (default: 900)
+        poll_interval_seconds: Seconds between status refreshes (default: 5)
+    
+    Returns:
+        Final aggregate group status, with "timed_out" set if the group did not finish in time
+    """
+    try:
+        tenant = current_identity().tenant
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_seconds
+        while True:
+            result = await _group_status(group_id, True, tenant)
+            if "error" in result:
+                return result
+            
+            finished = result["total"] - result["in_progress"] - result["unknown"]
+            await ctx.report_progress(progress=finished, total=result["total"], message=result["message"])
+            
+            if result["done"]:
+                return result
+            if loop.time() + poll_interval_seconds > deadline:
+                result["timed_out"] = True
+                return result
+            await asyncio.sleep(poll_interval_seconds)
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def start_storyboard(
+    scenes: List[Dict[str, Any]],
+    fps: int = 24,
+    dimension: str = "1280x720",
+    seed: Optional[int] = None,
+    storyboard_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Render a long-form video from an ordered list of scenes.
+    
+    Scenes longer than 120 seconds are split into several segments. All segments are
+    submitted at once and render in parallel; when every segment has completed, they
+    are joined locally into one video without re-encoding (requires ffmpeg).
+    
+    Args:
+        scenes: Ordered scenes, each {"prompt": str, "duration_seconds": int}; durations are
+            multiples of 6, at least 12 (default: 12)
+        fps: Frames per second (24 recommended)
+        dimension: Video dimension of every segment
+        seed: Seed of every segment, for a consistent look (random per segment if not provided)
+        storyboard_id: Id for the storyboard (generated if not provided)
+    
+    Returns:
+        Dict with the storyboard id and the job of every segment
+    """
+    try:
+        if not bedrock_client:
+            initialize_aws_client()
+        
+        segments, scene_errors = plan_segments(scenes)
+        if scene_errors:
+            return {"error": "Invalid storyboard", "scene_errors": scene_errors}
+        
+        # Reject a bad fps or dimension once instead of failing every segment
+        for segment in segments:
+            validation_error = validate_generation(
+                segment["prompt"], segment["duration_seconds"], fps, dimension, "MULTI_SHOT_AUTOMATED", MODEL_ID
+            )
+            if validation_error:
+                return validation_error
+        
+        tenant = current_identity().tenant
+        storyboard_id = storyboard_id or f"storyboard-{uuid.uuid4().hex[:12]}"
+        if not STORYBOARD_ID_PATTERN.fullmatch(storyboard_id):
+            return {"error": "storyboard_id must be 1-64 letters, digits, '-' or '_'"}
+        if load_manifest(postprocessor.artifacts_dir, storyboard_id) or store.group_counts(storyboard_id):
+            return {"error": f"Storyboard already exists: {storyboard_id}"}
+        
+        async def submit(segment):
+            try:
+                result = await _start_invocation(
+                    segment["prompt"], segment["duration_seconds"], fps, dimension, seed,
+                    "MULTI_SHOT_AUTOMATED", group_id=storyboard_id, persist=False
+                )
+            except (ClientError, ImageInputError) as e:
+                result = {"error": str(e)}
+            if "error" in result:
+                return {**segment, "error": result["error"]}
+            invocation_data = store.get(result["job_id"])
+            invocation_data.set_extra("storyboard_id", storyboard_id)
+            store.update(invocation_data)
+            return {**segment, "job_id": result["job_id"]}
+        
+        # Segments render in parallel; submissions share the global cap like any other job
+        planned = await bounded_map(submit, segments, submission_governor.limit)
+        save_invocations()
+        
+        failed = len([segment for segment in planned if "error" in segment])
+        manifest = {
+            "storyboard_id": storyboard_id,
+            "tenant": tenant,
+            "created_at": time.time(),
+            "fps": fps,
+            "dimension": dimension,
+            "status": StoryboardStatus.FAILED if failed else StoryboardStatus.RENDERING,
+            "segments": [{"index": index, **segment} for index, segment in enumerate(planned)]
+        }
+        if failed:
+            manifest["failure_message"] = f"{failed} of {len(planned)} segments could not be submitted"
+        await run_blocking(save_manifest, postprocessor.artifacts_dir, manifest)
+        # Completions are noticed in the background, so stitching starts without a tool call
+        _start_background_polling()
+        
+        return {
+            "success": True,
+            "storyboard_id": storyboard_id,
+            "status": manifest["status"].value,
+            "total_duration_seconds": sum(segment["duration_seconds"] for segment in segments),
+            "submitted": len(planned) - failed,
+            "failed": failed,
+            "segments": manifest["segments"],
+            "message": manifest.get("failure_message",
+                                    "Storyboard submitted. Use get_storyboard to check progress and get the stitched video.")
+        }
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+async def _segment_statuses(manifest: Dict[str, Any]) -> List[str]:
+    """Current status of every segment of a storyboard, looking in the archive too"""
+    statuses = []
+    for segment in manifest["segments"]:
+        job_id = segment.get("job_id")
+        if job_id is None:
+            statuses.append(JobStatus.FAILED.value)  # Never submitted
+            continue
+        invocation_data = store.get(job_id)
+        if invocation_data:
+            statuses.append(invocation_data.status.value)
+        else:
+            archived = await run_blocking(store.find_archived, job_id)
+            statuses.append(archived["status"] if archived else JobStatus.UNKNOWN.value)
+    return statuses
+
+
+def _finish_stitch(storyboard_id: str, result: Dict[str, Any]):
+    """Record the outcome of stitching in the manifest"""
+    manifest = load_manifest(postprocessor.artifacts_dir, storyboard_id)
+    if "error" in result:
+        manifest["status"] = StoryboardStatus.STITCH_FAILED
+        manifest["failure_message"] = result["error"]
+    else:
+        manifest["status"] = StoryboardStatus.COMPLETED
+        manifest["output"] = result
+    save_manifest(postprocessor.artifacts_dir, manifest)
+    release_stitch(postprocessor.artifacts_dir, storyboard_id)
+
+
+async def _advance_storyboard(storyboard_id: str, restitch: bool = False):
+    """
+    Stitch a storyboard once all its segments have completed, or mark it failed once one cannot.
+    
+    Returns:
+        (manifest, segment statuses), or (None, []) for an unknown storyboard
+    """
+    manifest = load_manifest(postprocessor.artifacts_dir, storyboard_id)
+    if manifest is None:
+        return None, []
+    statuses = await _segment_statuses(manifest)
+    
+    # Stitch again on request, or when the worker stitching it died; never under a live stitch
+    if ((restitch or manifest["status"] == StoryboardStatus.STITCHING)
+            and manifest["status"] in (StoryboardStatus.STITCHING, StoryboardStatus.STITCH_FAILED,
+                                       StoryboardStatus.COMPLETED)
+            and not stitch_held(postprocessor.artifacts_dir, storyboard_id)):
+        release_stitch(postprocessor.artifacts_dir, storyboard_id)
+        manifest["status"] = StoryboardStatus.RENDERING
+    if manifest["status"] != StoryboardStatus.RENDERING:
+        return manifest, statuses
+    
+    if any(status in ("Failed", "Cancelled") for status in statuses):
+        manifest["status"] = StoryboardStatus.FAILED
+        manifest["failure_message"] = "A segment failed or was cancelled"
+        save_manifest(postprocessor.artifacts_dir, manifest)
+    elif all(status == "Completed" for status in statuses) and claim_stitch(postprocessor.artifacts_dir, storyboard_id):
+        manifest["status"] = StoryboardStatus.STITCHING
+        manifest.pop("failure_message", None)
+        save_manifest(postprocessor.artifacts_dir, manifest)
+        keys = [f"{segment['job_id']}/output.mp4" for segment in manifest["segments"]]
+        postprocessor.schedule(
+            lambda result: _finish_stitch(storyboard_id, result),
+            stitch_segments, storyboard_dir(postprocessor.artifacts_dir, storyboard_id), s3_bucket, keys,
+            postprocessor.aws_settings
+        )
+    return manifest, statuses
+
+
+@mcp.tool()
+async def get_storyboard(
+    storyboard_id: str,
+    refresh: bool = True,
+    restitch: bool = False
+) -> Dict[str, Any]:
+    """
+    Get progress of a storyboard, and the stitched video once it is ready.
+    
+    Args:
+        storyboard_id: Id returned by start_storyboard
+        refresh: Refresh unfinished segments from AWS first (default: True)
+        restitch: Stitch again, e.g. after installing ffmpeg (default: False); stitching a dead worker left unfinished restarts by itself
+    
+    Returns:
+        Dict with the storyboard status, the status of every segment and the stitched output
+    """
+    try:
+        tenant = current_identity().tenant
+        manifest = load_manifest(postprocessor.artifacts_dir, storyboard_id)
+        if manifest is None or manifest.get("tenant", DEFAULT_TENANT) != tenant:
+            return {"error": f"Storyboard not found: {storyboard_id}"}
+        if refresh:
+            await _group_status(storyboard_id, True, tenant)
+        manifest, statuses = await _advance_storyboard(storyboard_id, restitch)
+        
+        segments = []
+        for segment, status in zip(manifest["segments"], statuses):
+            entry = {key: segment[key] for key in ("index", "scene", "duration_seconds") if key in segment}
+            entry["job_id"] = segment.get("job_id")
+            entry["status"] = status
+            if "error" in segment:
+                entry["submit_error"] = segment["error"]
+            segments.append(entry)
+        
+        status = StoryboardStatus(manifest["status"])
+        result = {
+            "success": True,
+            "storyboard_id": storyboard_id,
+            "status": status.value,
+            "total": len(segments),
+            "completed": statuses.count("Completed"),
+            "total_duration_seconds": sum(segment["duration_seconds"] for segment in manifest["segments"]),
+            "segments": segments
+        }
+        if manifest.get("output"):
+            result["output"] = manifest["output"]
+        if manifest.get("failure_message"):
+            result["failure_message"] = manifest["failure_message"]
+        result["message"] = {
+            StoryboardStatus.RENDERING: f"{result['completed']} of {result['total']} segments complete",
+            StoryboardStatus.STITCHING: "All segments complete; stitching the video",
+            StoryboardStatus.COMPLETED: "Storyboard video is ready",
+            StoryboardStatus.FAILED: "Storyboard cannot be stitched because a segment did not complete",
+            StoryboardStatus.STITCH_FAILED: "Stitching failed; fix the cause and call again with restitch=true",
+        }[status]
+        return result
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except AWSConfigError as e:
+        return {"error": f"AWS configuration error: {e}"}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def analyze_prompt(prompt: str, duration_seconds: int = 12) -> Dict[str, Any]:
+    """
+    Score a prompt locally against the prompting guidelines without starting a job.
+    
+    Args:
+        prompt: Text description to analyze
+        duration_seconds: Planned video duration, used to check pacing
+    
+    Returns:
+        Dict with a 0-100 score, detected issues with suggestions and matched terminology
+    """
+    analysis = analyze_prompt_text(prompt, duration_seconds)
+    analysis["min_score"] = min_prompt_score
+    analysis["would_submit"] = min_prompt_score is None or analysis["score"] >= min_prompt_score
+    return analysis
+
+
+@mcp.tool()
+async def search_archive(
+    job_id: Optional[str] = None,
+    status: Optional[str] = None,
+    group_id: Optional[str] = None,
+    prompt_contains: Optional[str] = None,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """
+    Search the caller's finished invocations that the retention policy moved to the compressed archive.
+    
+    Args:
+        job_id: Return only this job (job_id or invocation_arn) (optional)
+        status: Filter by final status, e.g. "Completed" or "Failed" (optional)
+        group_id: Filter by group (optional)
+        prompt_contains: Case-insensitive prompt substring (optional)
+        limit: Maximum number of results, newest first (default: 50)
+    
+    Returns:
+        Dict containing the matching archived invocations
+    """
+    try:
+        tenant = current_identity().tenant
+        if job_id:
+            archived = await run_blocking(store.find_archived, job_id, tenant)
+            invocations = [archived] if archived else []
+        elif store.archive:
+            invocations = await run_blocking(store.archive.search, status, group_id, prompt_contains, limit, tenant)
+        else:
+            invocations = []
+        
+        return {
+            "success": True,
+            "total": len(invocations),
+            "invocations": invocations
+        }
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def export_invocations(
+    output_format: str = "csv",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    include_archived: bool = False
+) -> Dict[str, Any]:
+    """
+    Export the caller's invocation history to a CSV or Parquet file for offline analysis.
+    
+    Besides the job parameters, each row has the queue time (tool call to Bedrock
+    accepting the job), the generation time and, for failed jobs, the failure code.
+    The history is streamed in chunks, however long it is.
+    
+    Args:
+        output_format: "csv" or "parquet" (Parquet needs pyarrow on the server) (default: "csv")
+        since: Only invocations created at or after this ISO 8601 time (optional)
+        until: Only invocations created before this ISO 8601 time (optional)
+        statuses: Only invocations with these statuses, e.g. ["Failed"] (optional)
+        include_archived: Also export invocations moved to the archive (default: False)
+    
+    Returns:
+        Dict with the path of the export file on the server, its row count and size
+    """
+    try:
+        tenant = current_identity().tenant
+        since_ts, until_ts, status_filter = parse_filters(since, until, statuses)
+        if output_format not in EXPORT_FORMATS:
+            return {"error": f"Unknown output_format {output_format!r}, expected one of {list(EXPORT_FORMATS)}"}
+        
+        # Writing runs on a worker thread; the archive and a shared store are read chunk by chunk
+        # as rows are written, the in-memory store's records here on the event loop
+        path = export_path(os.path.join(postprocessor.artifacts_dir, "exports"), tenant, output_format)
+        records = thread_safe_invocations(store, tenant, since_ts, until_ts, status_filter, include_archived)
+        result = await run_blocking(write_export, records, path, output_format)
+        
+        return {"success": True, **result}
+        
+    except (TenantError, ExportError) as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def get_usage(scope: str = "tenant", key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get spend in cost units (seconds of video), with rolling totals and remaining budget.
+    
+    Answers from precomputed counters, without scanning job history.
+    
+    Args:
+        scope: "tenant", "api_key" or "group" (default: "tenant")
+        key: Tenant name, API key id or group id (default: the caller's own tenant or API key);
+            only the caller's own tenant, API key and groups are visible
+    
+    Returns:
+        Dict with lifetime, last-minute, last-day and last-30-days usage, plus limits for tenants
+    """
+    try:
+        if scope not in SCOPES:
+            return {"error": f"scope must be one of {list(SCOPES)}"}
+        identity = current_identity()
+        if key is None and scope != "group":
+            key = identity.tenant if scope == "tenant" else identity.api_key
+        if key is None:
+            return {"error": f"key is required for scope {scope}" if scope == "group" else "No API key in this request"}
+        if scope == "group":
+            own = store.group_tenant(key) == identity.tenant
+        else:
+            own = key == (identity.tenant if scope == "tenant" else identity.api_key)
+        if not own:
+            return {"error": f"No usage found for {scope} {key}"}
+        
+        return {"success": True, **accountant.usage(scope, key)}
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@mcp.tool()
+async def get_admission_stats() -> Dict[str, Any]:
+    """
+    Get admission control limits and counters: calls in flight, admitted, queued and
+    rejected per tool, and for the caller's tenant. Never queued or rejected itself.
+    
+    Returns:
+        Dict with the configured limits, the current wait queue length and the counters
+    """
+    try:
+        return {"success": True, "enabled": admission.enabled, **admission.snapshot(current_identity().tenant)}
+        
+    except TenantError as e:
+        return {"error": str(e)}
+    except Exception as e:
+        return {"error": f"Unexpected error: {e}"}
+
+
+@guide_tool(mcp)
+async def get_prompting_guide(
+    section: Optional[str] = None,
+    known_version: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Get comprehensive prompting guidelines for Amazon Nova Reel video generation.
     
+    Args:
+        section: Return only one top-level section (e.g. "camera_control") (optional)
+        known_version: Guide version from a previous response; if unchanged, only a
+            "not_modified" marker is returned instead of the full guide (optional)
+    
     Returns:
-        Dict containing prompting best practices and examples
+        Dict containing prompting best practices and examples, plus the guide version
     """
-    return get_prompting_guidelines()
+    return get_prompting_guide_response(section, known_version)
+
+
+@mcp.custom_route("/prompting-guide", methods=["GET"])
+async def prompting_guide_route(request: Request) -> Response:
+    """Serve the pre-serialized prompting guide with ETag revalidation"""
+    section = request.query_params.get("section")
+    body = get_serialized_guide(section)
+    if body is None:
+        return Response(status_code=404)
+    
+    etag = f'"{GUIDE_VERSION}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@mcp.custom_route("/debug/loop-lag", methods=["GET"])
+async def loop_lag_route(request: Request) -> Response:
+    """Serve event-loop lag as JSON, or in the Prometheus text format with ?format=prometheus"""
+    if not loop_monitor.enabled:
+        return Response(status_code=404)
+    if request.query_params.get("format") == "prometheus":
+        return Response(content=loop_monitor.prometheus(), media_type="text/plain; version=0.0.4")
+    return Response(content=json.dumps(loop_monitor.snapshot()), media_type="application/json")
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health_route(request: Request) -> Response:
+    """Liveness for container health checks; served once the invocation history is loaded"""
+    return Response(content=json.dumps({"status": "ok"}), media_type="application/json")
 
 
 def main():
@@ -399,6 +1635,72 @@ def main():
     parser.add_argument("--aws-profile", help="AWS Profile name (alternative to explicit credentials)")
     parser.add_argument("--aws-region", default="us-east-1", help="AWS Region")
     parser.add_argument("--s3-bucket", help="S3 bucket name for video output")
+    parser.add_argument("--min-prompt-score", type=int, help="Reject prompts scoring below this value (0-100)")
+    parser.add_argument("--image-input-dir", default=os.getenv("NOVAREEL_IMAGE_INPUT_DIR"),
+                        help="Directory that image_path arguments must point into (image input is disabled without it)")
+    parser.add_argument("--max-concurrent-submissions", type=int,
+                        default=int(os.getenv("NOVAREEL_MAX_CONCURRENT_SUBMISSIONS", DEFAULT_MAX_CONCURRENT_SUBMISSIONS)),
+                        help="Maximum number of Bedrock job submissions in flight at once")
+    parser.add_argument("--archive-file", default=os.getenv("NOVAREEL_ARCHIVE_FILE", ARCHIVE_FILE),
+                        help="Compressed archive for invocations removed by the retention policy")
+    parser.add_argument("--retention-max-age-days", type=float, default=os.getenv("NOVAREEL_RETENTION_MAX_AGE_DAYS"),
+                        help="Archive finished jobs older than this many days")
+    parser.add_argument("--retention-max-count", type=int, default=os.getenv("NOVAREEL_RETENTION_MAX_COUNT"),
+                        help="Keep at most this many jobs in memory, archiving the oldest finished ones")
+    parser.add_argument("--retention-archive-finished", action="store_true",
+                        default=os.getenv("NOVAREEL_RETENTION_ARCHIVE_FINISHED", "").lower() in ("1", "true", "yes"),
+                        help="Archive every finished job, keeping only in-flight jobs in memory")
+    parser.add_argument("--webhook-url", default=os.getenv("NOVAREEL_WEBHOOK_URL"),
+                        help="URL that receives a POST whenever a job finishes (jobs may set their own callback_url)")
+    parser.add_argument("--webhook-secret", default=os.getenv("NOVAREEL_WEBHOOK_SECRET"),
+                        help="Secret for the HMAC-SHA256 signature of webhook requests")
+    parser.add_argument("--webhook-outbox", default=os.getenv("NOVAREEL_WEBHOOK_OUTBOX", WEBHOOK_OUTBOX_FILE),
+                        help="SQLite outbox holding webhook events until they are delivered")
+    parser.add_argument("--webhook-allow-private", action="store_true",
+                        default=os.getenv("NOVAREEL_WEBHOOK_ALLOW_PRIVATE", "").lower() in ("1", "true", "yes"),
+                        help="Also send callbacks to private, loopback and link-local addresses")
+    parser.add_argument("--postprocess", action="store_true",
+                        default=os.getenv("NOVAREEL_POSTPROCESS", "").lower() in ("1", "true", "yes"),
+                        help="Extract metadata and a poster frame from every completed video")
+    parser.add_argument("--artifacts-dir", default=os.getenv("NOVAREEL_ARTIFACTS_DIR", ARTIFACTS_DIR),
+                        help="Directory for post-processing artifacts, one subdirectory per job")
+    parser.add_argument("--postprocess-workers", type=int,
+                        default=int(os.getenv("NOVAREEL_POSTPROCESS_WORKERS", DEFAULT_POSTPROCESS_WORKERS)),
+                        help="Number of worker processes for post-processing and storyboard stitching")
+    parser.add_argument("--jobs-per-minute", type=int, default=os.getenv("NOVAREEL_JOBS_PER_MINUTE"),
+                        help="Maximum number of jobs each tenant may submit per minute")
+    parser.add_argument("--daily-budget-seconds", type=int, default=os.getenv("NOVAREEL_DAILY_BUDGET_SECONDS"),
+                        help="Seconds of video each tenant may request per rolling 24 hours")
+    parser.add_argument("--monthly-budget-seconds", type=int, default=os.getenv("NOVAREEL_MONTHLY_BUDGET_SECONDS"),
+                        help="Seconds of video each tenant may request per rolling 30 days")
+    parser.add_argument("--tenant-limits", default=os.getenv("NOVAREEL_TENANT_LIMITS"),
+                        help="JSON file with limits for individual tenants, overriding the limits above")
+    parser.add_argument("--api-keys", default=os.getenv("NOVAREEL_API_KEYS"),
+                        help="JSON file mapping API keys to tenants; callers without a listed key are rejected")
+    parser.add_argument("--trust-tenant-header", action="store_true",
+                        default=os.getenv("NOVAREEL_TRUST_TENANT_HEADER", "").lower() in ("1", "true", "yes"),
+                        help="Take the tenant from the X-NovaReel-Tenant header, set by an authenticating gateway")
+    parser.add_argument("--price-per-second", type=float,
+                        default=float(os.getenv("NOVAREEL_PRICE_PER_SECOND", DEFAULT_PRICE_PER_SECOND_USD)),
+                        help="USD per second of video, for cost estimates in get_usage")
+    parser.add_argument("--max-concurrent-calls", type=int, default=os.getenv("NOVAREEL_MAX_CONCURRENT_CALLS"),
+                        help="Maximum number of tool calls running at once (default: unlimited)")
+    parser.add_argument("--tool-concurrency", default=os.getenv("NOVAREEL_TOOL_CONCURRENCY"),
+                        help='Maximum concurrent calls per tool, e.g. "sweep=2,start_async_invoke=8"')
+    parser.add_argument("--tenant-concurrency", type=int, default=os.getenv("NOVAREEL_TENANT_CONCURRENCY"),
+                        help="Maximum number of tool calls each tenant may run at once (default: unlimited)")
+    parser.add_argument("--admission-queue", type=int,
+                        default=int(os.getenv("NOVAREEL_ADMISSION_QUEUE", DEFAULT_MAX_QUEUED)),
+                        help=f"Tool calls that may wait for a slot before new ones are rejected (default: {DEFAULT_MAX_QUEUED})")
+    parser.add_argument("--admission-timeout", type=float,
+                        default=float(os.getenv("NOVAREEL_ADMISSION_TIMEOUT", DEFAULT_QUEUE_TIMEOUT_SECONDS)),
+                        help=f"Seconds a tool call may wait for a slot (default: {DEFAULT_QUEUE_TIMEOUT_SECONDS:g})")
+    parser.add_argument("--debug-blocking", action="store_true",
+                        default=os.getenv("NOVAREEL_DEBUG_BLOCKING", "").lower() in ("1", "true", "yes"),
+                        help="Sample event-loop lag and log calls that block the loop, with their stack")
+    parser.add_argument("--blocking-threshold", type=float,
+                        default=float(os.getenv("NOVAREEL_BLOCKING_THRESHOLD", DEFAULT_BLOCKING_THRESHOLD_SECONDS)),
+                        help=f"Seconds the event loop may be held before it is reported (default: {DEFAULT_BLOCKING_THRESHOLD_SECONDS:g})")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind to")
     
@@ -406,6 +1708,7 @@ def main():
     
     # Set global configuration from args or environment variables
     global aws_access_key_id, aws_secret_access_key, aws_session_token, aws_profile, aws_region, s3_bucket
+    global min_prompt_score, webhook_url, postprocess_videos, image_input_dir
     
     aws_access_key_id = args.aws_access_key_id or os.getenv("AWS_ACCESS_KEY_ID")
     aws_secret_access_key = args.aws_secret_access_key or os.getenv("AWS_SECRET_ACCESS_KEY")
@@ -414,6 +1717,25 @@ def main():
     aws_region = args.aws_region or os.getenv("AWS_REGION", "us-east-1")
     s3_bucket = args.s3_bucket or os.getenv("S3_BUCKET")
     
+    min_score = args.min_prompt_score if args.min_prompt_score is not None else os.getenv("NOVAREEL_MIN_PROMPT_SCORE")
+    min_prompt_score = int(min_score) if min_score is not None else None
+    image_input_dir = os.path.expanduser(args.image_input_dir) if args.image_input_dir else None
+    submission_governor.set_limit(args.max_concurrent_submissions)
+    
+    # Callbacks for finished jobs
+    webhook_url = args.webhook_url
+    webhook_dispatcher.path = os.path.expanduser(args.webhook_outbox)
+    webhook_dispatcher.secret = args.webhook_secret
+    webhook_dispatcher.allow_private = args.webhook_allow_private
+    
+    # Retention: finished jobs beyond the policy move to the compressed archive
+    store.archive = InvocationArchive(os.path.expanduser(args.archive_file))
+    store.retention = RetentionPolicy(
+        max_age_days=args.retention_max_age_days,
+        max_count=args.retention_max_count,
+        archive_finished=args.retention_archive_finished
+    )
+    
     # Validate configuration - need either profile OR explicit credentials + S3 bucket
     if not s3_bucket:
         print("Error: Missing required S3_BUCKET configuration.", file=sys.stderr)
@@ -441,6 +1763,50 @@ def main():
     if s3_bucket.startswith("s3://"):
         s3_bucket = s3_bucket[5:]
     
+    # Post-processing and storyboard stitching run in worker processes with their own S3 client
+    postprocess_videos = args.postprocess
+    postprocessor.artifacts_dir = os.path.expanduser(args.artifacts_dir)
+    postprocessor.max_workers = args.postprocess_workers
+    postprocessor.aws_settings = _aws_session_settings()
+    
+    # Budgets and rate caps per tenant
+    accountant.limits = Limits(args.jobs_per_minute, args.daily_budget_seconds, args.monthly_budget_seconds)
+    accountant.price_per_second = args.price_per_second
+    if args.tenant_limits:
+        try:
+            accountant.tenant_limits = load_tenant_limits(os.path.expanduser(args.tenant_limits))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error: Cannot read tenant limits: {e}", file=sys.stderr)
+            sys.exit(1)
+    
+    # Tenants come from the API key map or a trusted gateway, never from the caller alone
+    api_key_tenants = None
+    if args.api_keys:
+        try:
+            api_key_tenants = load_api_keys(os.path.expanduser(args.api_keys))
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot read API keys: {e}", file=sys.stderr)
+            sys.exit(1)
+    configure_tenancy(api_key_tenants, args.trust_tenant_header)
+    
+    # Admission control: concurrent tool calls per tool and per tenant
+    try:
+        admission.tool_limits = parse_tool_limits(args.tool_concurrency)
+    except ValueError as e:
+        print(f"Error: --tool-concurrency: {e}", file=sys.stderr)
+        sys.exit(1)
+    admission.max_in_flight = args.max_concurrent_calls
+    admission.tenant_limit = args.tenant_concurrency
+    admission.max_queued = args.admission_queue
+    admission.queue_timeout = args.admission_timeout
+    if admission.enabled and not MIDDLEWARE_SUPPORTED:
+        print("Warning: this fastmcp version has no middleware support; concurrency limits are not enforced",
+              file=sys.stderr)
+    
+    # Debug mode: event-loop lag sampling and blocking-call reports
+    loop_monitor.enabled = args.debug_blocking
+    loop_monitor.threshold = args.blocking_threshold
+    
     # Initialize AWS client
     try:
         initialize_aws_client()
@@ -450,8 +1816,11 @@ def main():
         print(f"AWS configuration error: {e}", file=sys.stderr)
         sys.exit(1)
     
-    # Run MCP server with SSE transport
-    mcp.run(transport="sse", host=args.host, port=args.port)
+    # Run MCP server with SSE transport, under the event-loop monitor when debugging blocking calls
+    if loop_monitor.enabled:
+        asyncio.run(loop_monitor.watch(mcp.run_async(transport="sse", host=args.host, port=args.port)))
+    else:
+        mcp.run(transport="sse", host=args.host, port=args.port)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+"""
+Invocation Snapshot
+Memory-mapped binary snapshot of the invocation history, decoded one record at a time.
+
+Loading the JSON file parses every record before the server can accept a
+connection, so startup grows with the history. A snapshot is opened instead:
+the file is memory-mapped and only its header and a small metadata block are
+read. Records stay encoded until they are accessed, and lookups by job ID,
+invocation ARN, variant, idempotency key, tenant and group go through index
+sections built when the snapshot is written.
+
+Layout (little-endian), in this order:
+- header: magic, version, record count and the offset of every section
+- blobs: every record as compact JSON (InvocationRecord.to_dict), oldest first
+- entries: per record the blob offset and length, created_at, tenant, status and key hashes
+- key tables: sorted hashes followed by their record numbers, one table per lookup key
+- group table: (hash, start, count) sorted by hash, pointing into the postings
+- postings: record numbers of every group and every tenant, ascending
+- meta: JSON with the status and tenant names, tenant postings and caller data
+
+Keys are stored as 64-bit BLAKE2b hashes. Callers check the decoded record
+against the key, so a hash collision costs one extra decode, never a wrong answer.
+"""
+
+import hashlib
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .records import InvocationRecord, JobStatus
+
+MAGIC = b"NRSNAP\r\n"
+VERSION = 1
+
+# Lookup keys, in the order of the entry hashes and the key tables
+JOB_ID, ARN, VARIANT, IDEMPOTENCY_KEY = range(4)
+# Keys naming one record each; the others map to the latest record with the key
+_UNIQUE_KEYS = (JOB_ID, ARN)
+
+# magic, version, record count, offsets of entries, 4 key tables, groups, postings, meta and end of file
+_HEADER = struct.Struct("<8sII9Q")
+# blob offset, blob length, created_at, tenant, status, padding, 4 key hashes
+_ENTRY = struct.Struct("<QIdIB3x4Q")
+_HASH = struct.Struct("<Q")
+_GROUP = struct.Struct("<QII")
+_RECNO_SIZE = 4
+
+
+class SnapshotError(ValueError):
+    """Not a readable snapshot file"""
+    pass
+
+
+def key_hash(key: str) -> int:
+    """Index hash of a lookup key (never 0, which marks a record without the key)"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class SnapshotRow(NamedTuple):
+    """One record as written to a snapshot"""
+    blob: bytes
+    created_at: float
+    status: JobStatus
+    tenant: str
+    finished: bool
+    keys: Tuple[int, int, int, int]  # key_hash per lookup key, 0 without the key
+    groups: Tuple[int, ...]  # key_hash of every group
+
+
+class SnapshotEntry(NamedTuple):
+    """Fixed-size description of one record, readable without decoding it"""
+    offset: int
+    length: int
+    created_at: float
+    tenant: str
+    status: JobStatus
+    keys: Tuple[int, int, int, int]
+
+
+def _pack(fmt: str, values: List[int]) -> bytes:
+    return struct.pack(f"<{len(values)}{fmt}", *values)
+
+
+def write_snapshot(path: str, rows: Iterable[SnapshotRow], meta: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Write rows, which must be sorted by created_at, as a snapshot file.
+
+    Blobs are streamed to the file; the entries and indexes are kept in memory
+    until the end (a few dozen bytes per record). meta is stored alongside and
+    returned by Snapshot.meta.
+
+    Returns:
+        Number of records written
+    """
+    statuses = list(JobStatus)
+    status_codes = {status: code for code, status in enumerate(statuses)}
+    tenant_codes: Dict[str, int] = {}
+    tenants: List[int] = []
+    keys: List[Tuple[int, int, int, int]] = []
+    group_postings: Dict[int, List[int]] = {}
+    unfinished = []
+    entries = bytearray()
+
+    with open(path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        offset = _HEADER.size
+        for recno, row in enumerate(rows):
+            tenant = tenant_codes.setdefault(row.tenant, len(tenant_codes))
+            entries += _ENTRY.pack(offset, len(row.blob), row.created_at, tenant, status_codes[row.status], *row.keys)
+            f.write(row.blob)
+            offset += len(row.blob)
+            tenants.append(tenant)
+            keys.append(row.keys)
+            for group in row.groups:
+                group_postings.setdefault(group, []).append(recno)
+            if not row.finished:
+                unfinished.append(recno)
+
+        offsets = [offset]
+        f.write(entries)
+        for index in range(4):
+            table = [(key[index], recno) for recno, key in enumerate(keys) if key[index]]
+            if index not in _UNIQUE_KEYS:
+                table = list(dict(table).items())  # Later records replace earlier ones
+            table.sort()
+            offsets.append(f.tell())
+            f.write(_pack("Q", [key for key, _ in table]))
+            f.write(_pack("I", [recno for _, recno in table]))
+
+        postings: List[int] = []
+        group_table = []
+        for group in sorted(group_postings):
+            group_table.append(_GROUP.pack(group, len(postings), len(group_postings[group])))
+            postings += group_postings[group]
+        tenant_postings: List[List[int]] = [[] for _ in tenant_codes]
+        for recno, tenant in enumerate(tenants):
+            tenant_postings[tenant].append(recno)
+        tenant_ranges = []
+        for name, code in tenant_codes.items():
+            tenant_ranges.append([name, len(postings), len(tenant_postings[code])])
+            postings += tenant_postings[code]
+        offsets.append(f.tell())
+        f.write(b"".join(group_table))
+        offsets.append(f.tell())
+        f.write(_pack("I", postings))
+        offsets.append(f.tell())
+        f.write(json.dumps({
+            "statuses": [status.value for status in statuses],
+            "tenants": tenant_ranges,
+            "unfinished": unfinished,
+            **(meta or {}),
+        }, separators=(",", ":")).encode("utf-8"))
+        offsets.append(f.tell())
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, len(tenants), *offsets))
+    return len(tenants)
+
+
+class Snapshot:
+    """
+    Read-only view of a snapshot file.
+
+    Opening maps the file and reads the header and meta; everything else is read
+    from the mapping on demand.
+
+    Raises:
+        SnapshotError: If the file is not a snapshot of a supported version
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise SnapshotError(f"{path} is too short for a snapshot")
+        magic, version, self.count, *offsets = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION or offsets[-1] != len(self._map):
+            raise SnapshotError(f"{path} is not a version {VERSION} snapshot")
+        self._entries = offsets[0]
+        # (start, length) of every key table
+        self._keys = [(offsets[index], (offsets[index + 1] - offsets[index]) // (_HASH.size + _RECNO_SIZE))
+                      for index in range(1, 5)]
+        self._groups, self._group_count = offsets[5], (offsets[6] - offsets[5]) // _GROUP.size
+        self._postings = offsets[6]
+        self.meta: Dict[str, Any] = json.loads(self._map[offsets[7]:offsets[8]])
+        self._statuses = [JobStatus(status) for status in self.meta.pop("statuses")]
+        tenants = self.meta.pop("tenants")
+        self._tenant_names = [name for name, _, _ in tenants]
+        self._tenants = {name: (start, count) for name, start, count in tenants}
+        self.unfinished: List[int] = self.meta.pop("unfinished")
+
+    def close(self):
+        self._map.close()
+
+    def _entry(self, values: Tuple) -> SnapshotEntry:
+        return SnapshotEntry(values[0], values[1], values[2], self._tenant_names[values[3]],
+                             self._statuses[values[4]], values[5:])
+
+    def entry(self, recno: int) -> SnapshotEntry:
+        if not 0 <= recno < self.count:
+            raise IndexError(recno)
+        return self._entry(_ENTRY.unpack_from(self._map, self._entries + recno * _ENTRY.size))
+
+    def entries(self) -> Iterator[SnapshotEntry]:
+        """Every record's entry, by record number"""
+        section = self._map[self._entries:self._entries + self.count * _ENTRY.size]
+        return map(self._entry, _ENTRY.iter_unpack(section))
+
+    def created_at(self, recno: int) -> float:
+        return self.entry(recno).created_at
+
+    def blob(self, entry: SnapshotEntry) -> bytes:
+        """A record's encoded form, e.g. to copy it into a new snapshot without decoding it"""
+        return self._map[entry.offset:entry.offset + entry.length]
+
+    def record(self, recno: int) -> InvocationRecord:
+        """Decode one record"""
+        return InvocationRecord.from_dict(json.loads(self.blob(self.entry(recno))))
+
+    def _search(self, start: int, count: int, stride: int, key: int) -> int:
+        """Position of the first hash not below key in a sorted table"""
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if _HASH.unpack_from(self._map, start + middle * stride)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, index: int, key: str) -> List[int]:
+        """Record numbers whose key (JOB_ID, ARN, VARIANT or IDEMPOTENCY_KEY) hashes like this one"""
+        start, count = self._keys[index]
+        hashed = key_hash(key)
+        recnos = []
+        position = self._search(start, count, _HASH.size, hashed)
+        while position < count and _HASH.unpack_from(self._map, start + position * _HASH.size)[0] == hashed:
+            recnos.append(struct.unpack_from(
+                "<I", self._map, start + count * _HASH.size + position * _RECNO_SIZE)[0])
+            position += 1
+        return recnos
+
+    def _read_postings(self, start: int, count: int) -> Tuple[int, ...]:
+        return struct.unpack_from(f"<{count}I", self._map, self._postings + start * _RECNO_SIZE)
+
+    def group(self, group_id: str) -> Tuple[int, ...]:
+        """Record numbers of a group's members (and of any group with the same hash), ascending"""
+        hashed = key_hash(group_id)
+        recnos: Tuple[int, ...] = ()
+        position = self._search(self._groups, self._group_count, _GROUP.size, hashed)
+        while position < self._group_count:
+            found, start, count = _GROUP.unpack_from(self._map, self._groups + position * _GROUP.size)
+            if found != hashed:
+                break
+            recnos += self._read_postings(start, count)
+            position += 1
+        return tuple(sorted(recnos))
+
+    def memberships(self) -> Dict[int, List[int]]:
+        """Group hashes of every record in a group, by record number"""
+        groups: Dict[int, List[int]] = {}
+        for position in range(self._group_count):
+            key, start, count = _GROUP.unpack_from(self._map, self._groups + position * _GROUP.size)
+            for recno in self._read_postings(start, count):
+                groups.setdefault(recno, []).append(key)
+        return groups
+
+    def tenant(self, tenant: str) -> Tuple[int, ...]:
+        """Record numbers of a tenant's records, ascending (oldest first)"""
+        start, count = self._tenants.get(tenant, (0, 0))
+        return self._read_postings(start, count)
+
+    def first_since(self, timestamp: float) -> int:
+        """Record number of the first record created at or after timestamp"""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.created_at(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
@@ -0,0 +1,688 @@
+"""
+Shared Invocation Store
+SQLite-backed invocation store for running several server processes against one job state.
+
+Every worker (uvicorn worker or container sharing a volume) opens the same
+database file, so a job started by one worker is visible to all of them. Each
+unfinished job carries a poll lease: only the worker holding the lease refreshes
+it from Bedrock, and a lease left behind by a dead worker expires after
+`lease_seconds` so another worker takes over.
+
+Each row carries its tenant in an indexed column, so a tenant's listing reads
+only its own rows.
+
+Per-group status counts live in their own table, kept current by triggers in
+the same transaction as every membership or status change, so reading a
+group's progress never scans its jobs.
+
+Workers also share their budgets: every charge is a row of the same database,
+checked against the tenant's limits and inserted in one write transaction (see
+SQLiteAccountant), so N workers admit what one would.
+
+Each row also carries a version, bumped by every write. Records read from the
+store remember it, and writing one back only succeeds if the row is still at
+that version, so a worker holding a stale copy (e.g. from a poll that was in
+flight) never overwrites a newer change such as a cancellation.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .accounting import (
+    DEFAULT_PRICE_PER_SECOND_USD, WINDOWS, Accountant, Charge, Limits, Usage, record_keys,
+)
+from .archive import InvocationArchive
+from .predictor import CompletionPredictor
+from .records import InvocationRecord, JobStatus, parse_status
+from .store import (
+    COMPACT_INTERVAL_SECONDS, DEFAULT_LEASE_SECONDS, IDEMPOTENCY_WINDOW_SECONDS, QUERY_CHUNK_ROWS,
+    RENDERED_STATUSES, TERMINAL_STATUSES, RetentionPolicy, tenant_key, variant_key,
+)
+from .tenancy import DEFAULT_TENANT, Identity, record_tenant
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invocations (
+    job_id TEXT PRIMARY KEY,
+    invocation_arn TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    variant_key TEXT,
+    data TEXT NOT NULL,
+    poll_owner TEXT,
+    poll_lease_until REAL,
+    tenant TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS invocations_status ON invocations (status);
+CREATE INDEX IF NOT EXISTS invocations_variant ON invocations (variant_key);
+CREATE TABLE IF NOT EXISTS invocation_groups (
+    group_id TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (group_id, job_id)
+);
+CREATE INDEX IF NOT EXISTS invocation_groups_job ON invocation_groups (job_id);
+CREATE TABLE IF NOT EXISTS group_status_counts (
+    group_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (group_id, status)
+);
+CREATE TRIGGER IF NOT EXISTS group_member_added AFTER INSERT ON invocation_groups BEGIN
+    INSERT OR IGNORE INTO group_status_counts (group_id, status, count)
+        SELECT NEW.group_id, status, 0 FROM invocations WHERE job_id = NEW.job_id;
+    UPDATE group_status_counts SET count = count + 1
+        WHERE group_id = NEW.group_id AND status = (SELECT status FROM invocations WHERE job_id = NEW.job_id);
+END;
+CREATE TRIGGER IF NOT EXISTS group_member_removed AFTER DELETE ON invocation_groups BEGIN
+    UPDATE group_status_counts SET count = count - 1
+        WHERE group_id = OLD.group_id AND status = (SELECT status FROM invocations WHERE job_id = OLD.job_id);
+END;
+CREATE TRIGGER IF NOT EXISTS group_member_status AFTER UPDATE OF status ON invocations
+WHEN OLD.status != NEW.status BEGIN
+    UPDATE group_status_counts SET count = count - 1
+        WHERE status = OLD.status AND group_id IN (SELECT group_id FROM invocation_groups WHERE job_id = NEW.job_id);
+    INSERT OR IGNORE INTO group_status_counts (group_id, status, count)
+        SELECT group_id, NEW.status, 0 FROM invocation_groups WHERE job_id = NEW.job_id;
+    UPDATE group_status_counts SET count = count + 1
+        WHERE status = NEW.status AND group_id IN (SELECT group_id FROM invocation_groups WHERE job_id = NEW.job_id);
+END;
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_expiry ON idempotency_keys (expires_at);
+CREATE INDEX IF NOT EXISTS idempotency_keys_job ON idempotency_keys (job_id);
+CREATE TABLE IF NOT EXISTS charges (
+    id INTEGER PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    api_key TEXT,
+    group_id TEXT,
+    at REAL NOT NULL,
+    cost_units INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS charges_tenant ON charges (tenant, at);
+CREATE INDEX IF NOT EXISTS charges_api_key ON charges (api_key, at);
+CREATE INDEX IF NOT EXISTS charges_group ON charges (group_id, at);
+CREATE INDEX IF NOT EXISTS charges_at ON charges (at);
+CREATE TABLE IF NOT EXISTS usage_totals (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    jobs INTEGER NOT NULL,
+    cost_units INTEGER NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+"""
+
+# Charge rows older than the longest rolling window no longer count towards any limit
+_CHARGE_RETENTION_SECONDS = max(length for length, _ in WINDOWS.values())
+_CHARGE_COLUMNS = {"tenant": "tenant", "api_key": "api_key", "group": "group_id"}
+
+_TERMINAL_VALUES = tuple(status.value for status in TERMINAL_STATUSES)
+_TERMINAL_PLACEHOLDERS = ", ".join("?" * len(_TERMINAL_VALUES))
+
+
+class StoredRecord(InvocationRecord):
+    """A record read from the shared store, with the version of its row at the time"""
+
+    __slots__ = ("version",)
+
+
+def add_charge(conn: sqlite3.Connection, keys: Tuple[Tuple[str, str], ...], cost_units: int, at: float,
+               ledger: bool = True):
+    """Record a charge (within an open transaction): a ledger row for the limits and the lifetime totals"""
+    if ledger:
+        columns = dict(keys)
+        conn.execute(
+            "INSERT INTO charges (tenant, api_key, group_id, at, cost_units) VALUES (?, ?, ?, ?, ?)",
+            (columns["tenant"], columns.get("api_key"), columns.get("group"), at, cost_units)
+        )
+    conn.executemany(
+        "INSERT INTO usage_totals (scope, key, jobs, cost_units) VALUES (?, ?, 1, ?)"
+        " ON CONFLICT (scope, key) DO UPDATE SET jobs = jobs + 1, cost_units = cost_units + excluded.cost_units",
+        [(scope, key, cost_units) for scope, key in keys]
+    )
+
+
+def default_owner_id() -> str:
+    """Identify this process as a lease owner"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class SQLiteInvocationStore:
+    """
+    Invocation store shared between processes through a SQLite database.
+
+    Offers the same interface as InvocationStore. Records handed out are
+    snapshots: changes are written back with set_status/update, and every
+    lookup reads the current state from the database. Writing back a record
+    another process changed since it was read fails (see update).
+    """
+
+    def __init__(self, path: str, archive: Optional[InvocationArchive] = None,
+                 retention: Optional[RetentionPolicy] = None, owner: Optional[str] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.archive = archive
+        self.retention = retention or RetentionPolicy()
+        self.owner = owner or default_owner_id()
+        self.lease_seconds = lease_seconds
+        self._last_compact = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS invocations_tenant ON invocations (tenant, created_at)")
+
+    def _migrate(self):
+        """
+        Bring an older database up to date (once, even with several workers starting): add the
+        tenant and version columns, fill the group counts from the jobs already grouped and
+        charge the stored jobs to the shared budgets
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                columns = [row[1] for row in self._conn.execute("PRAGMA table_info(invocations)")]
+                if "tenant" not in columns:
+                    self._conn.execute("ALTER TABLE invocations ADD COLUMN tenant TEXT")
+                    self._conn.execute("UPDATE invocations SET tenant = COALESCE(json_extract(data, '$.tenant'), ?)",
+                                       (DEFAULT_TENANT,))
+                if "version" not in columns:
+                    self._conn.execute("ALTER TABLE invocations ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                if not self._conn.execute("SELECT 1 FROM group_status_counts LIMIT 1").fetchone():
+                    # Every grouped job has a count row, so none at all means the table is new
+                    self._conn.execute(
+                        "INSERT INTO group_status_counts (group_id, status, count)"
+                        " SELECT g.group_id, i.status, COUNT(*) FROM invocation_groups g"
+                        " JOIN invocations i ON i.job_id = g.job_id GROUP BY g.group_id, i.status"
+                    )
+                if not self._conn.execute("SELECT 1 FROM usage_totals LIMIT 1").fetchone():
+                    # Totals are never deleted, so none at all means the ledger is new
+                    cutoff = time.time() - _CHARGE_RETENTION_SECONDS
+                    for data, in self._conn.execute("SELECT data FROM invocations ORDER BY created_at").fetchall():
+                        record = InvocationRecord.from_dict(json.loads(data))
+                        add_charge(self._conn, record_keys(record), record.duration_seconds, record.created_at,
+                                   ledger=record.created_at >= cutoff)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _execute(self, sql: str, params: Tuple = ()) -> int:
+        """Run one statement, returning the number of changed rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _record(data: str, version: int) -> StoredRecord:
+        record = StoredRecord.from_dict(json.loads(data))
+        record.version = version
+        return record
+
+    def _records(self, sql: str, params: Tuple = ()) -> List[StoredRecord]:
+        """Records of a query selecting (data, version)"""
+        return [self._record(data, version) for data, version in self._query(sql, params)]
+
+    @staticmethod
+    def _variant_column(record: InvocationRecord) -> Optional[str]:
+        if record.seed is None or record.shots is not None:
+            return None
+        return json.dumps(variant_key(record.prompt, record.duration_seconds, record.fps,
+                                      record.dimension, record.seed, record.task_type))
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM invocations")[0][0]
+
+    def __contains__(self, job_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM invocations WHERE job_id = ?", (job_id,)))
+
+    def items(self) -> Iterator[Tuple[str, InvocationRecord]]:
+        records = self._records("SELECT data, version FROM invocations ORDER BY created_at")
+        return iter([(record.job_id, record) for record in records])
+
+    def tenant_items(self, tenant: str) -> Iterator[Tuple[str, InvocationRecord]]:
+        """Invocations of one tenant, oldest first"""
+        records = self._records("SELECT data, version FROM invocations WHERE tenant = ? ORDER BY created_at", (tenant,))
+        return iter([(record.job_id, record) for record in records])
+
+    def unfinished(self) -> List[InvocationRecord]:
+        """Invocations that still need polling"""
+        return self._records(
+            f"SELECT data, version FROM invocations WHERE status NOT IN ({_TERMINAL_PLACEHOLDERS})", _TERMINAL_VALUES
+        )
+
+    def query(self, tenant: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              statuses: Optional[Collection[JobStatus]] = None,
+              chunk_size: int = QUERY_CHUNK_ROWS) -> Iterator[InvocationRecord]:
+        """
+        Stream invocations created in [since, until) with one of the statuses, oldest first.
+
+        The filters become the WHERE clause, so the (tenant, created_at) index selects the
+        rows. Rows are fetched chunk_size at a time, continuing after the last row of the
+        previous chunk, so neither this process nor the lock is held for the whole history.
+        """
+        conditions = []
+        params: List[Any] = []
+        if tenant is not None:
+            conditions.append("tenant = ?")
+            params.append(tenant)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        if statuses is not None:
+            values = [status.value for status in statuses]
+            conditions.append(f"status IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        last: Optional[Tuple[float, str]] = None
+        while True:
+            where = conditions + ["(created_at, job_id) > (?, ?)"] if last else conditions
+            rows = self._query(
+                "SELECT data, version, created_at, job_id FROM invocations"
+                f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+                " ORDER BY created_at, job_id LIMIT ?",
+                tuple(params) + (last or ()) + (chunk_size,)
+            )
+            for row in rows:
+                yield self._record(row[0], row[1])
+            if len(rows) < chunk_size:
+                return
+            last = (rows[-1][2], rows[-1][3])
+
+    def summarize(self, accountant: Accountant, predictor: CompletionPredictor):
+        """Rebuild usage counters and completion-time history from every row (on start)"""
+        accountant.rebuild(record for _, record in self.items())
+        predictor.rebuild(self.query(statuses=[JobStatus.COMPLETED]))
+
+    def load(self):
+        """Nothing to load: state lives in the database. Runs a retention pass."""
+        self.compact()
+
+    def save(self):
+        """Writes are immediate; only runs retention compaction when it is due"""
+        if self.retention.enabled and time.monotonic() - self._last_compact >= COMPACT_INTERVAL_SECONDS:
+            self.compact()
+
+    def add(self, record: InvocationRecord) -> bool:
+        """
+        Track a new invocation.
+
+        Returns:
+            False if the job is already tracked (e.g. Bedrock returned the job of a reused
+            clientRequestToken); the stored row, with its lease and version, is left as it is
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = self._conn.execute(
+                    "INSERT INTO invocations"
+                    " (job_id, invocation_arn, status, created_at, variant_key, data, tenant)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                    (record.job_id, record.invocation_arn, record.status.value, record.created_at,
+                     self._variant_column(record), json.dumps(record.to_dict()), record_tenant(record))
+                ).rowcount == 1
+                if not added:
+                    self._conn.execute("COMMIT")
+                    return False
+                for group_id in record.groups:
+                    self._insert_group_member(group_id, record.job_id)
+                idempotency_key = record.get_extra("idempotency_key")
+                if idempotency_key is not None:
+                    self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (time.time(),))
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO idempotency_keys (idempotency_key, job_id, expires_at) VALUES (?, ?, ?)",
+                        (tenant_key(record_tenant(record), idempotency_key), record.job_id,
+                         record.created_at + IDEMPOTENCY_WINDOW_SECONDS)
+                    )
+                self._conn.execute("COMMIT")
+                return True
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _insert_group_member(self, group_id: str, job_id: str):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO invocation_groups (group_id, job_id, position)"
+            " SELECT ?, ?, COALESCE(MAX(position), 0) + 1 FROM invocation_groups WHERE group_id = ?",
+            (group_id, job_id, group_id)
+        )
+
+    def update(self, record: InvocationRecord) -> bool:
+        """
+        Write back changes made to a record, unless its row changed since the record was read.
+
+        A record that was not read from the store (e.g. the one just added) is written as it is.
+
+        Returns:
+            False if another process changed the row first: the change is dropped and the
+            record reloaded with the stored state, so the caller sees what won
+        """
+        version = getattr(record, "version", None)
+        sql = "UPDATE invocations SET status = ?, data = ?, version = version + 1 WHERE job_id = ?"
+        params = (record.status.value, json.dumps(record.to_dict()), record.job_id)
+        if version is not None:
+            sql, params = sql + " AND version = ?", params + (version,)
+        changed = self._execute(sql, params)
+        if changed:
+            if version is not None:
+                record.version = version + 1
+            return True
+        self._reload(record)
+        return False
+
+    def _reload(self, record: InvocationRecord):
+        """Replace a record's fields with the stored ones (if it is still stored)"""
+        stored = self.get(record.job_id)
+        if stored is None:
+            return
+        for field in InvocationRecord.__slots__:
+            setattr(record, field, getattr(stored, field))
+        if isinstance(record, StoredRecord):
+            record.version = stored.version
+
+    def set_status(self, record: InvocationRecord, status: str) -> bool:
+        """
+        Change the status of a tracked invocation.
+
+        Returns:
+            False if another process changed the invocation first (see update)
+        """
+        new_status = parse_status(status)
+        if record.status is new_status:
+            return True
+        record.status = new_status
+        return self.update(record)
+
+    def claim_poll(self, record: InvocationRecord) -> bool:
+        """
+        Take or renew the poll lease of an invocation.
+
+        Returns:
+            True if this process now owns the lease and should refresh the job
+        """
+        now = time.time()
+        changed = self._execute(
+            "UPDATE invocations SET poll_owner = ?, poll_lease_until = ?"
+            " WHERE job_id = ? AND (poll_owner IS NULL OR poll_owner = ? OR poll_lease_until < ?)",
+            (self.owner, now + self.lease_seconds, record.job_id, self.owner, now)
+        )
+        return changed == 1
+
+    def release_polls(self):
+        """Drop all poll leases of this process, e.g. on shutdown, so other workers take over at once"""
+        self._execute("UPDATE invocations SET poll_owner = NULL, poll_lease_until = NULL WHERE poll_owner = ?",
+                      (self.owner,))
+
+    def get(self, job_id: str) -> Optional[InvocationRecord]:
+        records = self._records("SELECT data, version FROM invocations WHERE job_id = ?", (job_id,))
+        return records[0] if records else None
+
+    def find(self, identifier: str, tenant: Optional[str] = None) -> Optional[InvocationRecord]:
+        """Find an invocation by job_id or invocation ARN, optionally only among a tenant's"""
+        records = self._records(
+            "SELECT data, version FROM invocations"
+            " WHERE (job_id = ? OR invocation_arn = ?) AND (? IS NULL OR tenant = ?)",
+            (identifier, identifier, tenant, tenant)
+        )
+        return records[0] if records else None
+
+    def find_variant(self, prompt: str, duration_seconds: int, fps: int, dimension: str,
+                     seed: int, task_type: str, tenant: str = DEFAULT_TENANT) -> Optional[InvocationRecord]:
+        """Return the tenant's in-progress or completed job with exactly these parameters"""
+        key = json.dumps(variant_key(prompt, duration_seconds, fps, dimension, seed, task_type))
+        statuses = tuple(status.value for status in RENDERED_STATUSES)
+        records = self._records(
+            "SELECT data, version FROM invocations WHERE variant_key = ? AND tenant = ? AND status IN (?, ?)"
+            " ORDER BY created_at DESC LIMIT 1",
+            (key, tenant) + statuses
+        )
+        return records[0] if records else None
+
+    def find_idempotent(self, idempotency_key: str, now: Optional[float] = None,
+                        tenant: str = DEFAULT_TENANT) -> Optional[InvocationRecord]:
+        """Return the job the tenant started with this idempotency key, unless the key's window has passed"""
+        records = self._records(
+            "SELECT i.data, i.version FROM idempotency_keys k JOIN invocations i ON i.job_id = k.job_id"
+            " WHERE k.idempotency_key = ? AND k.expires_at >= ?",
+            (tenant_key(tenant, idempotency_key), now or time.time())
+        )
+        return records[0] if records else None
+
+    def add_to_group(self, group_id: str, job_id: str):
+        """Tag an already tracked invocation with a group (read and written in one transaction)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT data FROM invocations WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    raise KeyError(job_id)
+                record = InvocationRecord.from_dict(json.loads(row[0]))
+                if group_id not in record.groups:
+                    record.groups += (group_id,)
+                self._insert_group_member(group_id, job_id)
+                self._conn.execute(
+                    "UPDATE invocations SET data = ?, version = version + 1 WHERE job_id = ?",
+                    (json.dumps(record.to_dict()), job_id)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def group_members(self, group_id: str) -> List[InvocationRecord]:
+        return self._records(
+            "SELECT i.data, i.version FROM invocation_groups g JOIN invocations i ON i.job_id = g.job_id"
+            " WHERE g.group_id = ? ORDER BY g.position",
+            (group_id,)
+        )
+
+    def group_tenant(self, group_id: str) -> Optional[str]:
+        """Tenant owning a group (the tenant of its first job), or None for an unknown group"""
+        rows = self._query(
+            "SELECT i.tenant FROM invocation_groups g JOIN invocations i ON i.job_id = g.job_id"
+            " WHERE g.group_id = ? ORDER BY g.position LIMIT 1",
+            (group_id,)
+        )
+        if rows:
+            return rows[0][0]
+        if self.archive:
+            self.archive.reload_group_counts()
+            return self.archive.group_tenants.get(group_id)
+        return None
+
+    def group_counts(self, group_id: str) -> Optional[Dict[str, int]]:
+        """Per-status job counts of a group, or None for an unknown group"""
+        rows = self._query("SELECT status, count FROM group_status_counts WHERE group_id = ?", (group_id,))
+        archived = None
+        if self.archive:
+            self.archive.reload_group_counts()
+            archived = self.archive.group_counts.get(group_id)
+        if not rows and archived is None:
+            return None
+        counts = {status: count for status, count in rows if count}
+        for status, count in (archived or {}).items():
+            counts[status] = counts.get(status, 0) + count
+        return counts
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Move finished invocations selected by the retention policy into the archive.
+
+        Runs inside a write transaction, so concurrent workers never archive the same job twice.
+        The archive is written once that transaction has committed, so a failed commit never
+        leaves a job both hot and archived; if writing the archive fails, the jobs are put back.
+
+        Returns:
+            Number of archived invocations
+        """
+        if not self.archive or not self.retention.enabled:
+            return 0
+
+        self._last_compact = time.monotonic()
+        now = now or datetime.now()
+        policy = self.retention
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                conditions = []
+                params: List[Any] = []
+                if not policy.archive_finished:
+                    if policy.max_age_days is not None:
+                        conditions.append("created_at < ?")
+                        params.append((now - timedelta(days=policy.max_age_days)).timestamp())
+                    if policy.max_count is not None:
+                        total = self._conn.execute("SELECT COUNT(*) FROM invocations").fetchone()[0]
+                        excess = max(total - policy.max_count, 0)
+                        conditions.append(
+                            f"job_id IN (SELECT job_id FROM invocations WHERE status IN ({_TERMINAL_PLACEHOLDERS})"
+                            " ORDER BY created_at LIMIT ?)"
+                        )
+                        params.extend(_TERMINAL_VALUES + (excess,))
+                where = f"status IN ({_TERMINAL_PLACEHOLDERS})"
+                if conditions:
+                    where += " AND (" + " OR ".join(conditions) + ")"
+                rows = self._conn.execute(
+                    f"SELECT job_id, data FROM invocations WHERE {where} ORDER BY created_at",
+                    _TERMINAL_VALUES + tuple(params)
+                ).fetchall()
+                if rows:
+                    # Group rows go first: their trigger reads the job's status to uncount it
+                    self._conn.executemany("DELETE FROM invocation_groups WHERE job_id = ?", [(job_id,) for job_id, _ in rows])
+                    self._conn.executemany("DELETE FROM invocations WHERE job_id = ?", [(job_id,) for job_id, _ in rows])
+                    self._conn.executemany("DELETE FROM idempotency_keys WHERE job_id = ?", [(job_id,) for job_id, _ in rows])
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                self._conn.execute("ROLLBACK")
+                # Keep the records hot rather than lose them
+                print(f"Warning: Could not compact invocation store: {e}", file=sys.stderr)
+                return 0
+
+        records = [json.loads(data) for _, data in rows]
+        try:
+            self.archive.append(records)
+        except Exception as e:
+            print(f"Warning: Could not archive invocations, keeping them hot: {e}", file=sys.stderr)
+            for record in records:
+                self.add(InvocationRecord.from_dict(record))
+            return 0
+        return len(rows)
+
+    def find_archived(self, identifier: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Look up an invocation that is no longer in the hot set"""
+        return self.archive.find(identifier, tenant) if self.archive else None
+
+
+class SQLiteAccountant(Accountant):
+    """
+    Accountant whose charges live in the database of a shared store.
+
+    Checking the tenant's limits and recording the charge happen in one write
+    transaction, so workers admitting jobs at the same time see each other's
+    charges and a tenant gets its limits once, not once per worker. The
+    database is the only state: nothing is rebuilt from the stored jobs, and
+    lifetime totals cover every charge made against the database.
+
+    Args:
+        store: Shared store whose database holds the charges
+        limits, tenant_limits, price_per_second: As for Accountant
+    """
+
+    def __init__(self, store: SQLiteInvocationStore, limits: Limits = Limits(),
+                 tenant_limits: Optional[Dict[str, Limits]] = None,
+                 price_per_second: float = DEFAULT_PRICE_PER_SECOND_USD):
+        super().__init__(limits, tenant_limits, price_per_second)
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(store.path, timeout=30, isolation_level=None, check_same_thread=False)
+
+    def _usage_of(self, scope: str, key: str, now: float) -> Usage:
+        """Counters of one tenant, API key or group, read from the ledger"""
+        usage = Usage()
+        totals = self._conn.execute(
+            "SELECT jobs, cost_units FROM usage_totals WHERE scope = ? AND key = ?", (scope, key)
+        ).fetchone()
+        if totals:
+            usage.jobs, usage.units = totals
+        column = _CHARGE_COLUMNS[scope]
+        for counter in usage.windows.values():
+            oldest = int(now // counter.bucket_seconds) - counter.buckets + 1
+            counter.restore(self._conn.execute(
+                "SELECT CAST(at / ? AS INTEGER) AS bucket, COUNT(*), SUM(cost_units) FROM charges"
+                f" WHERE {column} = ? AND at >= ? GROUP BY bucket ORDER BY bucket",
+                (counter.bucket_seconds, key, oldest * counter.bucket_seconds)
+            ).fetchall())
+        return usage
+
+    def charge(self, identity: Identity, group_id: Optional[str], cost_units: int,
+               now: Optional[float] = None) -> Tuple[Optional[Charge], Optional[Dict[str, Any]]]:
+        """
+        Check the tenant's limits and record the charge if they allow it, in one transaction.
+
+        Returns:
+            (charge, None) when admitted, (None, error dict) when a limit would be exceeded
+        """
+        now = time.time() if now is None else now
+        keys = self._keys(identity, group_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                denial = self._denial(identity.tenant, cost_units, now)
+                if denial is None:
+                    add_charge(self._conn, keys, cost_units, now)
+                    if now - self._last_prune >= COMPACT_INTERVAL_SECONDS:
+                        self._last_prune = now
+                        self._conn.execute("DELETE FROM charges WHERE at < ?", (now - _CHARGE_RETENTION_SECONDS,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if denial:
+            return None, denial
+        return Charge(keys, cost_units, now), None
+
+    def refund(self, charge: Charge, now: Optional[float] = None):
+        """Take back a recorded charge, e.g. when Bedrock rejected the submission"""
+        columns = dict(charge.keys)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM charges WHERE id = (SELECT id FROM charges WHERE tenant = ? AND api_key IS ?"
+                    " AND group_id IS ? AND at = ? AND cost_units = ? LIMIT 1)",
+                    (columns["tenant"], columns.get("api_key"), columns.get("group"), charge.at, charge.cost_units)
+                )
+                self._conn.executemany(
+                    "UPDATE usage_totals SET jobs = jobs - 1, cost_units = cost_units - ? WHERE scope = ? AND key = ?",
+                    [(charge.cost_units, scope, key) for scope, key in charge.keys]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def rebuild(self, records: Iterable[InvocationRecord], now: Optional[float] = None):
+        """Nothing to rebuild: the ledger already holds every worker's charges"""
+
+    def usage(self, scope: str, key: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Usage of one tenant, API key or group, as recorded by all workers"""
+        with self._lock:
+            return super().usage(scope, key, now)
@@ -0,0 +1,762 @@
+"""
+Invocation Store
+Tracks video generation invocations and keeps the lookup indexes the tools need.
+
+Every record belongs to a tenant. Lookups by identifier, variant and idempotency
+key only find records of the given tenant, and each tenant's records are indexed
+separately, so listing them costs the tenant's own job count, not everyone's.
+
+With a snapshot file configured, the history is kept in a memory-mapped snapshot
+(see snapshot.py) plus a journal of the records changed since it was written.
+Loading opens the snapshot and replays the short journal, so startup does not
+depend on the length of the history. Records are decoded when they are first
+accessed and then stay in memory like the records added since; saving appends
+the changed records to the journal, and once the journal is long enough the
+snapshot is rewritten, copying the records nobody touched without decoding them.
+The snapshot also carries a summary of its records (usage counters and
+completion-time history), which summarize() restores instead of reading them.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .accounting import Accountant
+from .archive import InvocationArchive
+from .predictor import CompletionPredictor
+from .records import InvocationRecord, JobStatus, parse_status
+from .snapshot import (
+    ARN, IDEMPOTENCY_KEY, JOB_ID, VARIANT, Snapshot, SnapshotEntry, SnapshotRow, key_hash, write_snapshot,
+)
+from .tenancy import DEFAULT_TENANT, record_tenant
+
+# Statuses for which a variant counts as already rendered (or being rendered)
+RENDERED_STATUSES = (JobStatus.IN_PROGRESS, JobStatus.COMPLETED)
+# Statuses that will not change any more
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+# Minimum time between two retention compactions triggered by save()
+COMPACT_INTERVAL_SECONDS = 60
+# How long a poll lease on a job stays valid without renewal (shared stores only)
+DEFAULT_LEASE_SECONDS = 30
+# How long an idempotency key keeps returning the job it first started
+IDEMPOTENCY_WINDOW_SECONDS = 24 * 60 * 60
+# Records read per database round trip by query()
+QUERY_CHUNK_ROWS = 1000
+# save() rewrites the snapshot once the journal holds more changed records than the larger of
+# these, so a rewrite costs each change a bounded share and the journal stays short to replay
+JOURNAL_MIN_RECORDS = 1000
+JOURNAL_HISTORY_FRACTION = 0.05
+
+
+class RetentionPolicy:
+    """
+    Which finished invocations to move from the hot working set to the archive.
+    
+    Unfinished invocations are never archived, since they still need polling.
+    
+    Args:
+        max_age_days: Archive finished jobs created more than this many days ago
+        max_count: Keep at most this many jobs in the hot set (oldest finished jobs go first)
+        archive_finished: Archive every finished job, keeping only in-flight jobs hot
+    """
+
+    def __init__(self, max_age_days: Optional[float] = None, max_count: Optional[int] = None,
+                 archive_finished: bool = False):
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.archive_finished = archive_finished
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age_days is not None or self.max_count is not None or self.archive_finished
+
+
+def variant_key(prompt: str, duration_seconds: int, fps: int, dimension: str,
+                seed: int, task_type: str) -> Tuple:
+    """Key identifying one generation variant, used to skip duplicate renders."""
+    return (prompt, duration_seconds, fps, dimension, seed, task_type)
+
+
+def tenant_key(tenant: str, key: str) -> str:
+    """Key namespaced by tenant, so equal keys of two tenants never meet (tenant names contain no ':')"""
+    return f"{tenant}:{key}"
+
+
+def client_request_token(idempotency_key: str, tenant: str = DEFAULT_TENANT, now: Optional[float] = None) -> str:
+    """
+    Bedrock clientRequestToken for a tenant's idempotency key (fixed length, printable ASCII).
+
+    The token also names the idempotency window it was made in. A key reused once its job's
+    window has passed is always in a later window, so Bedrock starts a new job for it instead
+    of returning the old one.
+    """
+    window = int((now or time.time()) // IDEMPOTENCY_WINDOW_SECONDS)
+    return hashlib.sha256(f"{tenant_key(tenant, idempotency_key)}:{window}".encode("utf-8")).hexdigest()
+
+
+class InvocationStore:
+    """
+    In-memory invocation records with optional JSON file or snapshot persistence.
+
+    Records are InvocationRecord instances keyed by job_id; the JSON file keeps
+    the invocation dict format (see InvocationRecord.to_dict). Lookups by invocation ARN, by
+    generation variant, by idempotency key, by tenant and by group are served from indexes
+    instead of scans, and per-group status counts are maintained incrementally, so status
+    changes must go through set_status and other changes must be reported with update.
+
+    With snapshot_path set, the in-memory indexes only cover the records added since the
+    snapshot was written; the snapshot's own indexes answer for the others.
+    """
+
+    def __init__(self, path: Optional[str] = None, archive: Optional[InvocationArchive] = None,
+                 retention: Optional[RetentionPolicy] = None, snapshot_path: Optional[str] = None):
+        self.path = path
+        self.archive = archive
+        self.retention = retention or RetentionPolicy()
+        self.snapshot_path = snapshot_path
+        self._last_compact = 0.0
+        self._invocations: Dict[str, InvocationRecord] = {}
+        self._by_arn: Dict[str, str] = {}
+        self._by_variant: Dict[Tuple, str] = {}
+        self._by_idempotency_key: Dict[str, str] = {}
+        self._by_tenant: Dict[str, Dict[str, None]] = {}
+        self._groups: Dict[str, Dict[str, None]] = {}
+        self._group_counts: Dict[str, Dict[str, int]] = {}
+        self._group_tenants: Dict[str, str] = {}
+        self._snapshot: Optional[Snapshot] = None
+        self._reset_snapshot_state()
+
+    @property
+    def journal_path(self) -> Optional[str]:
+        return f"{self.snapshot_path}.journal" if self.snapshot_path else None
+
+    def _reset_snapshot_state(self):
+        # Snapshot records decoded so far (also in _invocations), and those removed since
+        self._by_recno: Dict[int, InvocationRecord] = {}
+        self._recnos: Dict[str, int] = {}
+        self._removed: Set[int] = set()
+        # Groups whose snapshot members are in the in-memory group indexes
+        self._loaded_groups: Set[str] = set()
+        # Records changed since the last save, None for removed ones, and the journal length
+        self._dirty: Dict[str, Optional[InvocationRecord]] = {}
+        self._journal_records = 0
+        # Snapshot records changed since the snapshot was written (up to the last save)
+        self._changed: Set[int] = set()
+
+    def __len__(self) -> int:
+        if self._snapshot is None:
+            return len(self._invocations)
+        return self._snapshot.count - len(self._removed) + len(self._invocations) - len(self._recnos)
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def _new_job_ids(self) -> Iterator[str]:
+        """Records not in the snapshot (all of them without one), in insertion order"""
+        return (job_id for job_id in self._invocations if job_id not in self._recnos)
+
+    def _materialize(self, recno: int) -> Optional[InvocationRecord]:
+        """A snapshot record, decoded on first access; None once removed"""
+        record = self._by_recno.get(recno)
+        if record is None and recno not in self._removed:
+            record = self._snapshot.record(recno)
+            self._by_recno[recno] = record
+            self._recnos[record.job_id] = recno
+            self._invocations[record.job_id] = record
+        return record
+
+    def _snapshot_records(self, recnos: Iterable[int]) -> List[InvocationRecord]:
+        return [record for record in map(self._materialize, recnos) if record is not None]
+
+    def _lookup(self, index: int, key: str,
+                matches: Callable[[InvocationRecord], bool]) -> Optional[InvocationRecord]:
+        """The snapshot record an index maps the key to, checked against the key itself"""
+        if self._snapshot is None:
+            return None
+        for recno in self._snapshot.lookup(index, key):
+            record = self._materialize(recno)
+            if record is not None and matches(record):
+                return record
+        return None
+
+    def items(self) -> Iterator[Tuple[str, InvocationRecord]]:
+        records = self._snapshot_records(range(self._snapshot.count)) if self._snapshot is not None else []
+        return iter([(record.job_id, record) for record in records]
+                    + [(job_id, self._invocations[job_id]) for job_id in list(self._new_job_ids())])
+
+    def tenant_items(self, tenant: str) -> Iterator[Tuple[str, InvocationRecord]]:
+        """Invocations of one tenant, oldest first"""
+        records = self._snapshot_records(self._snapshot.tenant(tenant)) if self._snapshot is not None else []
+        return iter([(record.job_id, record) for record in records]
+                    + [(job_id, self._invocations[job_id]) for job_id in self._by_tenant.get(tenant, ())])
+
+    def unfinished(self) -> List[InvocationRecord]:
+        """Invocations that still need polling (unfinished snapshot records are decoded on load)"""
+        return [record for record in self._invocations.values() if record.status not in TERMINAL_STATUSES]
+
+    def query(self, tenant: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              statuses: Optional[Collection[JobStatus]] = None) -> Iterator[InvocationRecord]:
+        """
+        Stream invocations created in [since, until) with one of the statuses, oldest first.
+
+        A tenant's records are read through the tenant index; tenant None means every tenant.
+        Snapshot records are filtered by time and status before they are decoded, and those
+        not accessed before are decoded for the query only: change records found through get
+        or find, not through query.
+        """
+        if self._snapshot is not None:
+            yield from self._query_snapshot(tenant, since, until, statuses)
+        job_ids = list(self._by_tenant.get(tenant, ()) if tenant is not None else self._new_job_ids())
+        for job_id in job_ids:
+            record = self._invocations.get(job_id)
+            if record is None:
+                continue  # Archived or removed since the query started
+            if since is not None and record.created_at < since:
+                continue
+            if until is not None and record.created_at >= until:
+                continue
+            if statuses is not None and record.status not in statuses:
+                continue
+            yield record
+
+    def _query_snapshot(self, tenant: Optional[str], since: Optional[float], until: Optional[float],
+                        statuses: Optional[Collection[JobStatus]]) -> Iterator[InvocationRecord]:
+        # Keep to this snapshot even if save() replaces it while the query runs
+        snapshot, by_recno, removed = self._snapshot, self._by_recno, self._removed
+        start = snapshot.first_since(since) if since is not None else 0
+        stop = snapshot.first_since(until) if until is not None else snapshot.count
+        if tenant is None:
+            recnos = range(start, stop)
+        else:
+            postings = snapshot.tenant(tenant)
+            recnos = postings[bisect_left(postings, start):bisect_left(postings, stop)]
+        for recno in recnos:
+            if recno in removed:
+                continue
+            record = by_recno.get(recno)
+            if record is None:
+                if statuses is not None and snapshot.entry(recno).status not in statuses:
+                    continue
+                record = snapshot.record(recno)
+            elif statuses is not None and record.status not in statuses:
+                continue
+            yield record
+
+    def changes(self) -> Iterator[Tuple[Optional[InvocationRecord], Optional[InvocationRecord]]]:
+        """
+        (version in the snapshot, current version) of every invocation removed, changed or
+        added since the snapshot was written, None standing for a missing version.
+        Only these records are decoded; without a snapshot every record is new.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            for recno in sorted(self._removed):
+                yield snapshot.record(recno), None
+            dirty = (self._recnos.get(job_id) for job_id in self._dirty)
+            changed = self._changed.union(recno for recno in dirty if recno is not None)
+            for recno in sorted(changed - self._removed):
+                yield snapshot.record(recno), self._by_recno[recno]
+        for job_id in list(self._new_job_ids()):
+            yield None, self._invocations[job_id]
+
+    def summarize(self, accountant: Accountant, predictor: CompletionPredictor):
+        """
+        Rebuild usage counters and completion-time history from the invocations (on start).
+
+        With a snapshot, both are restored from the summary written with it and only the
+        changes since are applied, so startup does not decode the history.
+        """
+        summary = self._snapshot.meta.get("summary") if self._snapshot is not None else None
+        if summary is None:
+            accountant.rebuild(record for _, record in self.items())
+            predictor.rebuild(self.query(statuses=[JobStatus.COMPLETED]))
+            return
+        accountant.restore(summary["accounting"])
+        predictor.restore(summary["predictor"])
+        for old, new in self.changes():
+            accountant.replace(old, new)
+            predictor.replace(old, new)
+
+    @staticmethod
+    def _variant_key_of(record: InvocationRecord) -> Optional[Tuple]:
+        if record.seed is None or record.shots is not None:
+            return None
+        return (record_tenant(record),) + variant_key(record.prompt, record.duration_seconds, record.fps,
+                                                      record.dimension, record.seed, record.task_type)
+
+    @staticmethod
+    def _idempotency_key_of(record: InvocationRecord) -> Optional[str]:
+        idempotency_key = record.get_extra("idempotency_key")
+        return tenant_key(record_tenant(record), idempotency_key) if idempotency_key is not None else None
+
+    @staticmethod
+    def _variant_string(key: Tuple) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def _index(self, record: InvocationRecord):
+        job_id = record.job_id
+        tenant = record_tenant(record)
+        self._by_arn[record.invocation_arn] = job_id
+        self._by_tenant.setdefault(tenant, {})[job_id] = None
+        key = self._variant_key_of(record)
+        if key is not None:
+            self._by_variant[key] = job_id
+        idempotency_key = self._idempotency_key_of(record)
+        if idempotency_key is not None:
+            self._by_idempotency_key[idempotency_key] = job_id
+        self._index_groups(record)
+
+    def _index_groups(self, record: InvocationRecord):
+        for group_id in record.groups:
+            self._load_group(group_id)
+            self._add_member(group_id, record)
+
+    def _add_member(self, group_id: str, record: InvocationRecord):
+        self._group_tenants.setdefault(group_id, record_tenant(record))
+        members = self._groups.setdefault(group_id, {})
+        if record.job_id not in members:
+            members[record.job_id] = None
+            self._count(group_id, record.status, 1)
+
+    def _load_group(self, group_id: str):
+        """Add a group's snapshot members to the group indexes, before the group is first used"""
+        if self._snapshot is None or group_id in self._loaded_groups:
+            return
+        self._loaded_groups.add(group_id)
+        for record in self._snapshot_records(self._snapshot.group(group_id)):
+            if group_id in record.groups:
+                self._add_member(group_id, record)
+
+    def _count(self, group_id: str, status: JobStatus, delta: int):
+        counts = self._group_counts.setdefault(group_id, {})
+        counts[status.value] = counts.get(status.value, 0) + delta
+        if not counts[status.value]:
+            del counts[status.value]
+
+    def _reset_indexes(self):
+        self._by_arn, self._by_variant, self._by_idempotency_key, self._by_tenant = {}, {}, {}, {}
+        self._groups, self._group_counts, self._group_tenants = {}, {}, {}
+
+    def _reset(self):
+        self._invocations = {}
+        self._reset_indexes()
+        self._snapshot = None
+        self._reset_snapshot_state()
+
+    def load(self):
+        """
+        Load invocations from the snapshot and its journal, if a snapshot is configured
+        and exists, else from the JSON file (converted to a snapshot if one is configured)
+        """
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self._load_snapshot()
+        elif self.path:
+            self._load_json()
+            if self.snapshot_path:
+                self._write_snapshot()
+                if self._snapshot is not None and os.path.exists(self.path):
+                    # The JSON file is not written any more; keep it, but out of the way
+                    converted = f"{self.path}.converted"
+                    os.replace(self.path, converted)
+                    print(f"Converted {self.path} to the snapshot {self.snapshot_path}, "
+                          f"the old file is kept as {converted}", file=sys.stderr)
+        else:
+            return
+        self.compact()
+
+    def _load_json(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    invocations = json.load(f)
+                self._reset()
+                for job_id, invocation_data in invocations.items():
+                    record = InvocationRecord.from_dict(invocation_data)
+                    self._invocations[job_id] = record
+                    self._index(record)
+        except Exception as e:
+            print(f"Warning: Could not load invocations file: {e}", file=sys.stderr)
+            self._reset()
+
+    def _load_snapshot(self):
+        try:
+            self._reset()
+            self._snapshot = Snapshot(self.snapshot_path)
+            # Unfinished jobs are polled right away, and unfinished() only looks at decoded records
+            for recno in self._snapshot.unfinished:
+                self._materialize(recno)
+            self._replay_journal()
+        except Exception as e:
+            print(f"Warning: Could not load invocations snapshot: {e}", file=sys.stderr)
+            self._reset()
+
+    def _replay_journal(self):
+        """Apply the changes saved since the snapshot was written"""
+        changes: Dict[str, Optional[Dict[str, Any]]] = {}
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        print("Warning: Ignoring an incomplete line at the end of the invocations journal",
+                              file=sys.stderr)
+                        break
+                    if "removed" in data:
+                        changes[data["removed"]] = None
+                    else:
+                        changes[data["job_id"]] = data
+                    self._journal_records += 1
+        except FileNotFoundError:
+            return
+        # Swap in the changed records before any group counts are taken from them
+        updated, added, removed = [], [], []
+        for job_id, data in changes.items():
+            old = self.get(job_id)
+            if data is None:
+                if old is not None:
+                    removed.append(job_id)
+                continue
+            record = InvocationRecord.from_dict(data)
+            if old is None:
+                added.append(record)
+                continue
+            self._by_recno[self._recnos[job_id]] = self._invocations[job_id] = record
+            self._changed.add(self._recnos[job_id])
+            updated.append(record)
+        for record in updated:
+            self._index_groups(record)
+        for record in added:
+            self._invocations[record.job_id] = record
+            self._index(record)
+        for job_id in removed:
+            self._remove(job_id)
+        self._dirty = {}
+
+    def save(self):
+        """Persist invocations, running retention compaction first when it is due"""
+        if self.retention.enabled and time.monotonic() - self._last_compact >= COMPACT_INTERVAL_SECONDS:
+            self.compact()
+        else:
+            self._write()
+
+    def _write(self):
+        """Persist changes to the snapshot journal, or write the JSON file atomically, if configured"""
+        if self.snapshot_path:
+            journal_limit = max(JOURNAL_MIN_RECORDS, JOURNAL_HISTORY_FRACTION * len(self))
+            if self._snapshot is None or self._journal_records + len(self._dirty) > journal_limit:
+                self._write_snapshot()
+            else:
+                self._write_journal()
+            return
+        self._dirty = {}
+        if not self.path:
+            return
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({job_id: record.to_dict() for job_id, record in self._invocations.items()},
+                          f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Warning: Could not save invocations file: {e}", file=sys.stderr)
+
+    def _write_journal(self):
+        """Append the records changed since the last save to the journal"""
+        if not self._dirty:
+            return
+        try:
+            with open(self.journal_path, 'a') as f:
+                for job_id, record in self._dirty.items():
+                    f.write(json.dumps(record.to_dict() if record is not None else {"removed": job_id},
+                                       separators=(",", ":")))
+                    f.write("\n")
+            self._journal_records += len(self._dirty)
+            self._changed.update(self._recnos[job_id] for job_id in self._dirty if job_id in self._recnos)
+            self._dirty = {}
+        except Exception as e:
+            print(f"Warning: Could not save invocations journal: {e}", file=sys.stderr)
+
+    def _row(self, record: InvocationRecord) -> SnapshotRow:
+        variant = self._variant_key_of(record)
+        idempotency_key = self._idempotency_key_of(record)
+        return SnapshotRow(
+            blob=json.dumps(record.to_dict(), separators=(",", ":")).encode("utf-8"),
+            created_at=record.created_at,
+            status=record.status,
+            tenant=record_tenant(record),
+            finished=record.status in TERMINAL_STATUSES,
+            keys=(key_hash(record.job_id), key_hash(record.invocation_arn),
+                  key_hash(self._variant_string(variant)) if variant is not None else 0,
+                  key_hash(idempotency_key) if idempotency_key is not None else 0),
+            groups=tuple(key_hash(group_id) for group_id in record.groups),
+        )
+
+    def _write_snapshot(self):
+        """
+        Write every record to a new snapshot, replacing the old snapshot and its journal.
+
+        Decoded records are encoded again; the others are copied from the old snapshot as
+        they are, with their index entries.
+        """
+        snapshot = self._snapshot
+        # (created_at, record number in the old snapshot, decoded record, old snapshot entry)
+        items: List[Tuple[float, Optional[int], Optional[InvocationRecord], Optional[SnapshotEntry]]] = []
+        if snapshot is not None:
+            for recno, entry in enumerate(snapshot.entries()):
+                if recno in self._removed:
+                    continue
+                record = self._by_recno.get(recno)
+                items.append((entry.created_at, recno, record, None if record is not None else entry))
+        items += [(self._invocations[job_id].created_at, None, self._invocations[job_id], None)
+                  for job_id in self._new_job_ids()]
+        items.sort(key=itemgetter(0))
+
+        # The old summary plus the changes since, so the untouched records stay encoded
+        accountant, predictor = Accountant(), CompletionPredictor()
+        self.summarize(accountant, predictor)
+
+        memberships = snapshot.memberships() if snapshot is not None else {}
+
+        def rows() -> Iterator[SnapshotRow]:
+            for _, recno, record, entry in items:
+                if record is not None:
+                    yield self._row(record)
+                else:
+                    yield SnapshotRow(snapshot.blob(entry), entry.created_at, entry.status, entry.tenant,
+                                      entry.status in TERMINAL_STATUSES, entry.keys, tuple(memberships.get(recno, ())))
+
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            write_snapshot(tmp_path, rows(), {
+                "written_at": time.time(),
+                "summary": {"accounting": accountant.state(), "predictor": predictor.state()},
+            })
+        except Exception as e:
+            print(f"Warning: Could not save invocations snapshot: {e}", file=sys.stderr)
+            return
+        # Drop the old mapping before replacing its file; running queries keep their own reference
+        had_snapshot, self._snapshot = snapshot is not None, None
+        snapshot = None
+        try:
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Warning: Could not save invocations snapshot: {e}", file=sys.stderr)
+            self._snapshot = Snapshot(self.snapshot_path) if had_snapshot else None
+            return
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self._snapshot = Snapshot(self.snapshot_path)
+        # Record numbers changed; records added since the last snapshot are in it now
+        self._by_recno, self._recnos, self._removed = {}, {}, set()
+        for recno, (_, _, record, _) in enumerate(items):
+            if record is not None:
+                self._by_recno[recno] = record
+                self._recnos[record.job_id] = recno
+        self._by_arn, self._by_variant, self._by_idempotency_key, self._by_tenant = {}, {}, {}, {}
+        self._dirty, self._journal_records, self._changed = {}, 0, set()
+
+    def add(self, record: InvocationRecord) -> bool:
+        """
+        Track a new invocation.
+
+        Returns:
+            False if the job is already tracked (e.g. Bedrock returned the job of a reused
+            clientRequestToken); the tracked record is left as it is
+        """
+        if record.job_id in self:
+            return False
+        self._invocations[record.job_id] = record
+        self._index(record)
+        self._dirty[record.job_id] = record
+        return True
+
+    def set_status(self, record: InvocationRecord, status: str) -> bool:
+        """Change the status of a tracked invocation, keeping group counts current (always succeeds)"""
+        old_status, new_status = record.status, parse_status(status)
+        if old_status is new_status:
+            return True
+        for group_id in record.groups:
+            self._load_group(group_id)
+        record.status = new_status
+        for group_id in record.groups:
+            self._count(group_id, old_status, -1)
+            self._count(group_id, new_status, 1)
+        self._dirty[record.job_id] = record
+        return True
+
+    def update(self, record: InvocationRecord) -> bool:
+        """Records are live objects here, so there is no conflicting copy; the change is written by the next save()"""
+        self._dirty[record.job_id] = record
+        return True
+
+    def claim_poll(self, record: InvocationRecord) -> bool:
+        """A single process owns every job, so polling is always allowed"""
+        return True
+
+    def release_polls(self):
+        """Nothing to release: there are no poll leases"""
+        pass
+
+    def get(self, job_id: str) -> Optional[InvocationRecord]:
+        record = self._invocations.get(job_id)
+        if record is None:
+            record = self._lookup(JOB_ID, job_id, lambda record: record.job_id == job_id)
+        return record
+
+    def find(self, identifier: str, tenant: Optional[str] = None) -> Optional[InvocationRecord]:
+        """Find an invocation by job_id or invocation ARN, optionally only among a tenant's"""
+        record = self.get(identifier)
+        if record is None:
+            job_id = self._by_arn.get(identifier)
+            record = (self._invocations.get(job_id) if job_id else
+                      self._lookup(ARN, identifier, lambda record: record.invocation_arn == identifier))
+        if record is not None and tenant is not None and record_tenant(record) != tenant:
+            return None
+        return record
+
+    def find_variant(self, prompt: str, duration_seconds: int, fps: int, dimension: str,
+                     seed: int, task_type: str, tenant: str = DEFAULT_TENANT) -> Optional[InvocationRecord]:
+        """Return the tenant's in-progress or completed job with exactly these parameters"""
+        key = (tenant,) + variant_key(prompt, duration_seconds, fps, dimension, seed, task_type)
+        job_id = self._by_variant.get(key)
+        record = (self._invocations.get(job_id) if job_id else
+                  self._lookup(VARIANT, self._variant_string(key), lambda record: self._variant_key_of(record) == key))
+        if record and record.status in RENDERED_STATUSES:
+            return record
+        return None
+
+    def find_idempotent(self, idempotency_key: str, now: Optional[float] = None,
+                        tenant: str = DEFAULT_TENANT) -> Optional[InvocationRecord]:
+        """Return the job the tenant started with this idempotency key, unless the key's window has passed"""
+        key = tenant_key(tenant, idempotency_key)
+        job_id = self._by_idempotency_key.get(key)
+        record = (self._invocations.get(job_id) if job_id else
+                  self._lookup(IDEMPOTENCY_KEY, key, lambda record: self._idempotency_key_of(record) == key))
+        if record is None:
+            return None
+        if (now or time.time()) - record.created_at > IDEMPOTENCY_WINDOW_SECONDS:
+            self._by_idempotency_key.pop(key, None)
+            return None
+        return record
+
+    def add_to_group(self, group_id: str, job_id: str):
+        """Tag an already tracked invocation with a group"""
+        record = self.get(job_id)
+        if group_id not in record.groups:
+            record.groups += (group_id,)
+        self._index_groups(record)
+        self._dirty[job_id] = record
+
+    def group_members(self, group_id: str) -> List[InvocationRecord]:
+        self._load_group(group_id)
+        return [self._invocations[job_id] for job_id in self._groups.get(group_id, ())]
+
+    def group_tenant(self, group_id: str) -> Optional[str]:
+        """Tenant owning a group (the tenant of its first job), or None for an unknown group"""
+        self._load_group(group_id)
+        tenant = self._group_tenants.get(group_id)
+        if tenant is None and self.archive:
+            tenant = self.archive.group_tenants.get(group_id)
+        return tenant
+
+    def group_counts(self, group_id: str) -> Optional[Dict[str, int]]:
+        """Per-status job counts of a group in O(1), or None for an unknown group"""
+        self._load_group(group_id)
+        archived = self.archive.group_counts.get(group_id) if self.archive else None
+        if group_id not in self._groups and archived is None:
+            return None
+        counts = dict(self._group_counts.get(group_id, {}))
+        for status, count in (archived or {}).items():
+            counts[status] = counts.get(status, 0) + count
+        return counts
+
+    def _remove(self, job_id: str) -> InvocationRecord:
+        record = self._invocations[job_id]
+        # Load the groups while the record is still a member, so it is uncounted exactly once
+        for group_id in record.groups:
+            self._load_group(group_id)
+        del self._invocations[job_id]
+        recno = self._recnos.pop(job_id, None)
+        if recno is not None:
+            del self._by_recno[recno]
+            self._removed.add(recno)
+            self._changed.discard(recno)
+        self._by_arn.pop(record.invocation_arn, None)
+        self._by_tenant.get(record_tenant(record), {}).pop(job_id, None)
+        key = self._variant_key_of(record)
+        if key is not None and self._by_variant.get(key) == job_id:
+            del self._by_variant[key]
+        idempotency_key = self._idempotency_key_of(record)
+        if idempotency_key is not None and self._by_idempotency_key.get(idempotency_key) == job_id:
+            del self._by_idempotency_key[idempotency_key]
+        for group_id in record.groups:
+            members = self._groups.get(group_id, {})
+            if job_id in members:
+                del members[job_id]
+                self._count(group_id, record.status, -1)
+        self._dirty[job_id] = None
+        return record
+
+    def _scan(self) -> Iterator[Tuple[float, JobStatus, Union[int, InvocationRecord]]]:
+        """(created_at, status, record or snapshot record number) of every record, without decoding any"""
+        if self._snapshot is not None:
+            for recno, entry in enumerate(self._snapshot.entries()):
+                record = self._by_recno.get(recno)
+                if record is not None:
+                    yield record.created_at, record.status, record
+                elif recno not in self._removed:
+                    yield entry.created_at, entry.status, recno
+        for job_id in list(self._new_job_ids()):
+            record = self._invocations[job_id]
+            yield record.created_at, record.status, record
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Move finished invocations selected by the retention policy into the archive.
+        
+        Returns:
+            Number of archived invocations
+        """
+        if not self.archive or not self.retention.enabled:
+            return 0
+        
+        self._last_compact = time.monotonic()
+        now = now or datetime.now()
+        policy = self.retention
+        cutoff = (now - timedelta(days=policy.max_age_days)).timestamp() if policy.max_age_days is not None else None
+        excess = len(self) - policy.max_count if policy.max_count is not None else 0
+        
+        # Snapshot order and dict order (insertion order) are both oldest first
+        selected = []
+        for created_at, status, item in self._scan():
+            if status not in TERMINAL_STATUSES:
+                continue
+            if (policy.archive_finished or len(selected) < excess
+                    or (cutoff is not None and created_at < cutoff)):
+                selected.append(item)
+        records = [self._materialize(item) if isinstance(item, int) else item for item in selected]
+        
+        if records:
+            try:
+                self.archive.append([record.to_dict() for record in records])
+            except Exception as e:
+                # Keep the records hot rather than lose them
+                print(f"Warning: Could not write invocation archive: {e}", file=sys.stderr)
+                records = []
+            for record in records:
+                self._remove(record.job_id)
+        self._write()
+        return len(records)
+
+    def find_archived(self, identifier: str, tenant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Look up an invocation that is no longer in the hot set"""
+        return self.archive.find(identifier, tenant) if self.archive else None
@@ -0,0 +1,272 @@
+"""
+Storyboards
+Long-form videos rendered as parallel segments and stitched into one file.
+
+Nova Reel renders at most 120 seconds per job. A storyboard is an ordered list
+of scenes; scenes longer than that are split into several segments, and every
+segment is submitted as its own job, so all of them render in parallel. Once
+every segment has completed, a worker process downloads them and joins them
+with ffmpeg's concat demuxer, copying the streams without re-encoding when all
+segments share codec, resolution and frame rate (Nova Reel's always do).
+
+Each storyboard keeps a JSON manifest next to its stitched output in
+<artifacts_dir>/<storyboard_id>/. A stitch is claimed with a lock file there
+naming the host, process and time of the claim; a lock whose process is gone,
+or that outlived the stitch timeout, is stale and taken over.
+"""
+
+import json
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import time
+import uuid
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from .postprocess import MP4Error, _s3_client, parse_mp4
+from .validation import MAX_DURATION_SECONDS, MAX_PROMPT_LENGTH, MIN_DURATION_SECONDS, SHOT_DURATION_SECONDS
+
+MAX_STORYBOARD_SEGMENTS = 50
+STITCH_TIMEOUT_SECONDS = 1800
+STORYBOARD_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class StoryboardStatus(str, Enum):
+    """Status of a storyboard as a whole, kept in its manifest"""
+    RENDERING = "rendering"
+    STITCHING = "stitching"
+    COMPLETED = "completed"
+    FAILED = "failed"  # A segment failed or was cancelled, so the storyboard cannot be stitched
+    STITCH_FAILED = "stitch_failed"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+_MANIFEST_FILE = "storyboard.json"
+_STITCH_LOCK_FILE = ".stitching"
+
+
+def split_duration(duration_seconds: int) -> List[int]:
+    """
+    Split a scene into segment durations Nova Reel accepts.
+
+    Segments are as long as possible; the last two are balanced so that none is
+    shorter than the minimum duration.
+    """
+    segments = []
+    remaining = duration_seconds
+    while remaining > MAX_DURATION_SECONDS:
+        segment = MAX_DURATION_SECONDS
+        if remaining - segment < MIN_DURATION_SECONDS:
+            segment = remaining - MIN_DURATION_SECONDS
+        segments.append(segment)
+        remaining -= segment
+    segments.append(remaining)
+    return segments
+
+
+def plan_segments(scenes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Turn scenes into an ordered list of segments, validating all scenes in one pass.
+
+    Args:
+        scenes: Scenes, each with "prompt" and an optional "duration_seconds" (default 12)
+
+    Returns:
+        (segments, errors); segments carry scene, prompt and duration_seconds
+    """
+    if not scenes:
+        return [], ["scenes must be a non-empty list"]
+
+    segments = []
+    errors = []
+    for index, scene in enumerate(scenes):
+        if not isinstance(scene, dict) or not isinstance(scene.get("prompt"), str) or not scene["prompt"].strip():
+            errors.append(f"Scene {index}: 'prompt' must be a non-empty string")
+            continue
+        if len(scene["prompt"]) > MAX_PROMPT_LENGTH:
+            errors.append(f"Scene {index}: 'prompt' must be at most {MAX_PROMPT_LENGTH} characters")
+            continue
+        duration = scene.get("duration_seconds", MIN_DURATION_SECONDS)
+        if not isinstance(duration, int) or duration < MIN_DURATION_SECONDS or duration % SHOT_DURATION_SECONDS:
+            errors.append(f"Scene {index}: duration_seconds must be a multiple of {SHOT_DURATION_SECONDS}, "
+                          f"at least {MIN_DURATION_SECONDS}")
+            continue
+        for part in split_duration(duration):
+            segments.append({"scene": index, "prompt": scene["prompt"], "duration_seconds": part})
+
+    if len(segments) > MAX_STORYBOARD_SEGMENTS:
+        errors.append(f"Storyboard needs {len(segments)} segments, maximum is {MAX_STORYBOARD_SEGMENTS}")
+    return segments, errors
+
+
+def storyboard_dir(artifacts_dir: str, storyboard_id: str) -> str:
+    """Directory of a storyboard's manifest and output"""
+    if not STORYBOARD_ID_PATTERN.fullmatch(storyboard_id):
+        raise ValueError(f"Invalid storyboard id: {storyboard_id}")
+    return os.path.join(artifacts_dir, storyboard_id)
+
+
+def load_manifest(artifacts_dir: str, storyboard_id: str) -> Optional[Dict[str, Any]]:
+    """Manifest of a storyboard, or None if there is no such storyboard"""
+    if not STORYBOARD_ID_PATTERN.fullmatch(storyboard_id):
+        return None
+    try:
+        with open(os.path.join(artifacts_dir, storyboard_id, _MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_manifest(artifacts_dir: str, manifest: Dict[str, Any]):
+    """Write a manifest atomically, so readers in other processes never see half of it"""
+    directory = storyboard_dir(artifacts_dir, manifest["storyboard_id"])
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _stitch_lock_path(artifacts_dir: str, storyboard_id: str) -> str:
+    return os.path.join(storyboard_dir(artifacts_dir, storyboard_id), _STITCH_LOCK_FILE)
+
+
+def _read_stitch_lock(path: str) -> Optional[Dict[str, Any]]:
+    """Contents of a stitch lock, {} if unreadable, or None if there is no lock"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return {}
+
+
+def _stitch_lock_is_stale(lock: Dict[str, Any]) -> bool:
+    """Whether a lock outlived the stitch timeout or names a process of this host that is gone"""
+    if time.time() - lock.get("claimed_at", 0) > STITCH_TIMEOUT_SECONDS:
+        return True
+    if lock.get("host") != socket.gethostname():
+        return False  # Another host's process cannot be checked; the timeout covers it
+    try:
+        os.kill(lock["pid"], 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, KeyError, TypeError):
+        return False
+    return False
+
+
+def stitch_held(artifacts_dir: str, storyboard_id: str) -> bool:
+    """Whether a live task or process holds the stitch lock of a storyboard"""
+    lock = _read_stitch_lock(_stitch_lock_path(artifacts_dir, storyboard_id))
+    return lock is not None and not _stitch_lock_is_stale(lock)
+
+
+def claim_stitch(artifacts_dir: str, storyboard_id: str) -> bool:
+    """
+    Take the stitch lock of a storyboard; False if another live task or process holds it.
+
+    The lock is written in full under a temporary name and hard-linked into place, so it
+    never exists without its contents. A stale lock is removed and the claim tried again.
+    """
+    path = _stitch_lock_path(artifacts_dir, storyboard_id)
+    claim_path = f"{path}.{uuid.uuid4().hex}"
+    with open(claim_path, "w") as f:
+        json.dump({"host": socket.gethostname(), "pid": os.getpid(), "claimed_at": time.time()}, f)
+    try:
+        for _ in range(2):
+            try:
+                os.link(claim_path, path)
+                return True
+            except FileExistsError:
+                lock = _read_stitch_lock(path)
+                if lock is not None and not _stitch_lock_is_stale(lock):
+                    return False
+                release_stitch(artifacts_dir, storyboard_id)
+        return False
+    finally:
+        os.remove(claim_path)
+
+
+def release_stitch(artifacts_dir: str, storyboard_id: str):
+    """Drop the stitch lock once stitching has finished (or died with its process)"""
+    try:
+        os.remove(_stitch_lock_path(artifacts_dir, storyboard_id))
+    except FileNotFoundError:
+        pass
+
+
+def _local_metadata(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        def read_range(offset, length):
+            f.seek(offset)
+            return f.read(length)
+
+        return parse_mp4(read_range, os.path.getsize(path))
+
+
+def stitch_segments(directory: str, bucket: str, keys: List[str], aws_settings: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Download the segments and join them into <directory>/output.mp4 (runs in a worker process).
+
+    Returns:
+        Summary of the stitched output, or a dict with "error"
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return {"error": "ffmpeg is not installed; the segments are still available individually"}
+
+    segments_dir = os.path.join(directory, "segments")
+    output = os.path.join(directory, "output.mp4")
+    try:
+        os.makedirs(segments_dir, exist_ok=True)
+        s3 = _s3_client(aws_settings)
+        paths = []
+        for index, key in enumerate(keys):
+            path = os.path.join(segments_dir, f"{index:03d}.mp4")
+            s3.download_file(bucket, key, path)
+            paths.append(path)
+
+        # Stream copy needs identical stream parameters; anything else is re-encoded
+        signatures = set()
+        duration = 0.0
+        for path in paths:
+            metadata = _local_metadata(path)
+            signatures.add((metadata["codec"], metadata["width"], metadata["height"], metadata.get("fps")))
+            duration += metadata.get("duration_seconds", 0)
+        stream_copy = len(signatures) == 1
+        codec_args = ["-c", "copy"] if stream_copy else ["-c:v", "libx264", "-crf", "18", "-c:a", "aac"]
+
+        list_path = os.path.join(segments_dir, "segments.txt")
+        with open(list_path, "w") as f:
+            f.writelines(f"file '{path}'\n" for path in paths)
+        subprocess.run(
+            [ffmpeg, "-v", "error", "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+             *codec_args, "-movflags", "+faststart", output],
+            check=True, capture_output=True, timeout=STITCH_TIMEOUT_SECONDS
+        )
+        return {
+            "output_path": output,
+            "size_bytes": os.path.getsize(output),
+            "duration_seconds": round(duration, 3),
+            "stream_copy": stream_copy,
+            "stitched_at": time.time(),
+        }
+    except subprocess.CalledProcessError as e:
+        return {"error": f"ffmpeg failed: {e.stderr.decode('utf-8', 'replace').strip() or e}"}
+    except subprocess.TimeoutExpired:
+        return {"error": f"ffmpeg timed out after {STITCH_TIMEOUT_SECONDS}s"}
+    except (ClientError, BotoCoreError, MP4Error, struct.error, KeyError, IndexError, OSError) as e:
+        # Malformed segment headers surface as struct, key or index errors from the MP4 parser
+        return {"error": f"Stitching failed: {e}"}
+    finally:
+        shutil.rmtree(segments_dir, ignore_errors=True)
@@ -0,0 +1,136 @@
+"""
+Tenancy
+Identifies who is calling a tool, for isolation, accounting and budgets.
+
+Over HTTP and SSE the API key comes from the Authorization (Bearer) or
+X-API-Key header. The tenant is never taken on the caller's word:
+
+- With an API key map (--api-keys), the key must be listed and the tenant is
+  the one the map assigns to it.
+- With a trusted gateway (--trust-tenant-header), the tenant comes from the
+  X-NovaReel-Tenant header, which the gateway must set after authenticating.
+- Otherwise every caller belongs to the default tenant.
+
+A tenant header naming any other tenant than the one derived is rejected.
+API keys are only kept as a short hash. Every stdio session, and records
+stored before tenants existed, belong to the default tenant.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from .records import InvocationRecord
+
+try:
+    from fastmcp.server.dependencies import get_http_headers
+except ImportError:  # Older fastmcp without request access: every caller is the default tenant
+    def get_http_headers(include_all: bool = False):
+        return {}
+
+TENANT_HEADER = "x-novareel-tenant"
+API_KEY_HEADER = "x-api-key"
+DEFAULT_TENANT = os.getenv("NOVAREEL_TENANT", "default")
+TENANT_PATTERN = re.compile(r"[A-Za-z0-9_.@-]{1,64}")
+
+# API key id -> tenant (see configure_tenancy); None when API keys are not checked
+_api_key_tenants: Optional[Dict[str, str]] = None
+# Whether a gateway in front of the server sets the tenant header
+_trust_tenant_header = False
+
+
+class TenantError(ValueError):
+    """The request's API key or tenant header is missing, unknown, malformed or contradictory"""
+    pass
+
+
+class Identity(NamedTuple):
+    """Tenant and hashed API key of a caller"""
+    tenant: str
+    api_key: Optional[str] = None
+
+
+def api_key_id(api_key: str) -> str:
+    """Stable, non-reversible id of an API key"""
+    return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def record_tenant(record: InvocationRecord) -> str:
+    """Tenant owning a record"""
+    return record.get_extra("tenant") or DEFAULT_TENANT
+
+
+def load_api_keys(path: str) -> Dict[str, str]:
+    """
+    Read the API key map from a JSON file such as {"<api key>": "acme"}.
+
+    Returns:
+        Tenant of every key, keyed by API key id so the keys themselves are not kept
+
+    Raises:
+        ValueError: If the file is not valid JSON or names an invalid tenant
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("API keys must be an object mapping API keys to tenant names")
+    for tenant in data.values():
+        if not isinstance(tenant, str) or not TENANT_PATTERN.fullmatch(tenant):
+            raise ValueError(f"Invalid tenant name: {tenant!r}")
+    return {api_key_id(api_key): tenant for api_key, tenant in data.items()}
+
+
+def configure_tenancy(api_key_tenants: Optional[Dict[str, str]] = None, trust_tenant_header: bool = False):
+    """
+    Set where callers' tenants come from (on server start).
+
+    Args:
+        api_key_tenants: Tenant of every accepted API key id (see load_api_keys); None accepts any caller
+        trust_tenant_header: Take the tenant from the tenant header, set by an authenticating gateway
+    """
+    global _api_key_tenants, _trust_tenant_header
+    _api_key_tenants = api_key_tenants
+    _trust_tenant_header = trust_tenant_header
+
+
+def identity_from_headers(headers: Mapping[str, str]) -> Identity:
+    """
+    Identity of a caller from its request headers (lowercase names).
+
+    Raises:
+        TenantError: If the API key is missing or unknown while keys are checked, or the
+            tenant header is malformed or names another tenant than the caller's
+    """
+    claimed = headers.get(TENANT_HEADER)
+    if claimed is not None and not TENANT_PATTERN.fullmatch(claimed):
+        raise TenantError(f"Invalid {TENANT_HEADER} header")
+
+    api_key = headers.get(API_KEY_HEADER)
+    authorization = headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    key_id = api_key_id(api_key) if api_key else None
+
+    if _api_key_tenants is not None:
+        tenant = _api_key_tenants.get(key_id) if key_id else None
+        if tenant is None:
+            raise TenantError("A valid API key is required (Authorization: Bearer or X-API-Key header)")
+    elif _trust_tenant_header:
+        tenant = claimed or DEFAULT_TENANT
+    else:
+        tenant = DEFAULT_TENANT
+    if claimed is not None and claimed != tenant:
+        raise TenantError(f"{TENANT_HEADER} header does not match the tenant of this caller")
+    return Identity(tenant, key_id)
+
+
+def current_identity() -> Identity:
+    """
+    Identity of the caller of the current tool call.
+
+    Raises:
+        TenantError: If the caller's headers do not identify a tenant (see identity_from_headers)
+    """
+    return identity_from_headers(get_http_headers(include_all=True))
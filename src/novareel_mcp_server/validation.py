@@ -0,0 +1,194 @@
+"""
+Amazon Nova Reel Request Validation
+Local checks for generation parameters so invalid requests never reach Bedrock.
+
+What each model accepts is declared once in MODEL_CAPABILITIES. At import the
+table is compiled into frozensets per model and task type, so validating a
+request is a handful of set lookups, and every tool (single jobs, sweeps,
+storyboards) checks against the same rules.
+"""
+
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+DEFAULT_MODEL_ID = "amazon.nova-reel-v1:1"
+
+# Generation limits from the Nova Reel documentation. Durations are (min, max, step) in seconds;
+# max_prompt_length is None where the prompt is not sent (manual shots carry their own text).
+MODEL_CAPABILITIES: Dict[str, Dict[str, Any]] = {
+    "amazon.nova-reel-v1:1": {
+        "dimensions": ["1280x720"],
+        "fps": [24],
+        "task_types": {
+            "TEXT_VIDEO": {"durations": (6, 6, 6), "max_prompt_length": 512},
+            "MULTI_SHOT_AUTOMATED": {"durations": (12, 120, 6), "max_prompt_length": 4000},
+            "MULTI_SHOT_MANUAL": {"durations": (12, 120, 6), "max_prompt_length": None},
+        },
+    },
+}
+
+SHOT_DURATION_SECONDS = 6
+MIN_SHOTS = 2
+MAX_SHOTS = 20
+MAX_SHOT_TEXT_LENGTH = 512
+SHOT_IMAGE_FORMATS = ("png", "jpeg")
+
+
+class TaskCapabilities(NamedTuple):
+    """Compiled limits of one task type"""
+    durations: FrozenSet[int]
+    sorted_durations: Tuple[int, ...]
+    max_prompt_length: Optional[int]
+
+
+class ModelCapabilities(NamedTuple):
+    """Compiled limits of one model"""
+    dimensions: FrozenSet[str]
+    fps: FrozenSet[int]
+    task_types: Dict[str, TaskCapabilities]
+
+
+def _compile(capabilities: Dict[str, Any]) -> ModelCapabilities:
+    task_types = {}
+    for task_type, limits in capabilities["task_types"].items():
+        low, high, step = limits["durations"]
+        durations = tuple(range(low, high + 1, step))
+        task_types[task_type] = TaskCapabilities(frozenset(durations), durations, limits["max_prompt_length"])
+    return ModelCapabilities(frozenset(capabilities["dimensions"]), frozenset(capabilities["fps"]), task_types)
+
+
+_COMPILED: Dict[str, ModelCapabilities] = {
+    model_id: _compile(capabilities) for model_id, capabilities in MODEL_CAPABILITIES.items()
+}
+
+
+def get_capabilities(model_id: str = DEFAULT_MODEL_ID) -> ModelCapabilities:
+    """Compiled capabilities of a model"""
+    return _COMPILED[model_id]
+
+
+_NOVA_REEL = get_capabilities()
+# Multi-shot automated jobs (and storyboard segments): multiples of 6 seconds between 12 and 120
+MIN_DURATION_SECONDS = _NOVA_REEL.task_types["MULTI_SHOT_AUTOMATED"].sorted_durations[0]
+MAX_DURATION_SECONDS = _NOVA_REEL.task_types["MULTI_SHOT_AUTOMATED"].sorted_durations[-1]
+MAX_PROMPT_LENGTH = _NOVA_REEL.task_types["MULTI_SHOT_AUTOMATED"].max_prompt_length
+
+
+def _duration_error(task_type: str, task: TaskCapabilities) -> str:
+    durations = task.sorted_durations
+    if len(durations) == 1:
+        return f"{task_type} duration must be {durations[0]} seconds"
+    return (f"{task_type} duration must be a multiple of {durations[1] - durations[0]} "
+            f"in range [{durations[0]}, {durations[-1]}]")
+
+
+def validate_generation(prompt: str, duration_seconds: int, fps: int, dimension: str, task_type: str,
+                        model_id: str = DEFAULT_MODEL_ID) -> Optional[Dict[str, Any]]:
+    """
+    Check the generation parameters of one job against the model's capabilities.
+
+    Every invalid parameter is reported at once, together with the accepted values.
+
+    Returns:
+        None when valid, otherwise an error dict for the tool response
+    """
+    capabilities = _COMPILED[model_id]
+    task = capabilities.task_types.get(task_type)
+    if task is None:
+        return {
+            "error": f"Unsupported task_type: {task_type}",
+            "valid_task_types": sorted(capabilities.task_types)
+        }
+
+    errors = {}
+    result: Dict[str, Any] = {}
+    if duration_seconds not in task.durations:
+        errors["duration_seconds"] = _duration_error(task_type, task)
+        result["valid_durations"] = list(task.sorted_durations)
+    if fps not in capabilities.fps:
+        errors["fps"] = f"fps must be one of {sorted(capabilities.fps)}"
+        result["valid_fps"] = sorted(capabilities.fps)
+    if dimension not in capabilities.dimensions:
+        errors["dimension"] = f"dimension must be one of {sorted(capabilities.dimensions)}"
+        result["valid_dimensions"] = sorted(capabilities.dimensions)
+    if task.max_prompt_length is not None:
+        if not prompt.strip():
+            errors["prompt"] = "prompt must not be empty"
+        elif len(prompt) > task.max_prompt_length:
+            errors["prompt"] = f"{task_type} prompt must be at most {task.max_prompt_length} characters"
+    if not errors:
+        return None
+    if len(errors) > 1:
+        result["parameter_errors"] = errors
+    return {"error": "; ".join(errors.values()), **result}
+
+
+def _validate_shot_image(image: Any) -> Optional[str]:
+    """Check a Bedrock-style shot image block, returning an error message or None."""
+    if not isinstance(image, dict):
+        return "image must be an object with 'format' and 'source'"
+    if image.get("format") not in SHOT_IMAGE_FORMATS:
+        return f"image format must be one of {list(SHOT_IMAGE_FORMATS)}"
+    source = image.get("source")
+    if not isinstance(source, dict) or not ("bytes" in source or "s3Location" in source):
+        return "image source must contain 'bytes' (base64) or 's3Location'"
+    return None
+
+
+def validate_shots(shots: Optional[List[Dict[str, Any]]], duration_seconds: int) -> List[str]:
+    """
+    Validate all shots of a MULTI_SHOT_MANUAL request in one pass.
+
+    Every problem is reported at once so a storyboard can be fixed in a single round trip.
+
+    Args:
+        shots: List of shots, each with "text" and an optional "image" or "image_path"
+        duration_seconds: Requested video duration; each shot covers 6 seconds
+
+    Returns:
+        List of error messages (empty when the shots are valid)
+    """
+    if not shots:
+        return ["MULTI_SHOT_MANUAL requires a non-empty 'shots' list"]
+
+    errors = []
+    if not MIN_SHOTS <= len(shots) <= MAX_SHOTS:
+        errors.append(f"Number of shots must be in range [{MIN_SHOTS}, {MAX_SHOTS}], got {len(shots)}")
+
+    expected_shots = duration_seconds // SHOT_DURATION_SECONDS
+    if duration_seconds % SHOT_DURATION_SECONDS != 0 or len(shots) != expected_shots:
+        errors.append(
+            f"duration_seconds={duration_seconds} requires {expected_shots} shots of "
+            f"{SHOT_DURATION_SECONDS}s, got {len(shots)}; use duration_seconds="
+            f"{len(shots) * SHOT_DURATION_SECONDS} for {len(shots)} shots"
+        )
+
+    for index, shot in enumerate(shots):
+        if not isinstance(shot, dict):
+            errors.append(f"shots[{index}]: must be an object with 'text'")
+            continue
+        text = shot.get("text")
+        if not isinstance(text, str) or not text.strip():
+            errors.append(f"shots[{index}]: 'text' is required")
+        elif len(text) > MAX_SHOT_TEXT_LENGTH:
+            errors.append(f"shots[{index}]: text is {len(text)} characters, maximum is {MAX_SHOT_TEXT_LENGTH}")
+        if "image" in shot and "image_path" in shot:
+            errors.append(f"shots[{index}]: use either 'image' or 'image_path', not both")
+        elif "image" in shot:
+            image_error = _validate_shot_image(shot["image"])
+            if image_error:
+                errors.append(f"shots[{index}]: {image_error}")
+        elif "image_path" in shot and not isinstance(shot["image_path"], str):
+            errors.append(f"shots[{index}]: 'image_path' must be a string")
+
+    return errors
+
+
+def build_shot_params(shots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Convert validated shots into the multiShotManualParams shot list."""
+    params = []
+    for shot in shots:
+        shot_params = {"text": shot["text"]}
+        if "image" in shot:
+            shot_params["image"] = shot["image"]
+        params.append(shot_params)
+    return params
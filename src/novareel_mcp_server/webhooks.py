@@ -0,0 +1,412 @@
+"""
+Webhooks
+Delivers a signed POST to a callback URL when a job reaches a terminal state.
+
+Events are written to a persistent SQLite outbox first and delivered by an
+async dispatcher, so they survive restarts. Failed deliveries are retried with
+exponential backoff, and at most `concurrency` requests are in flight at once.
+Several processes may share one outbox: each delivery is claimed with a lock
+that expires, so an event is sent by one process at a time.
+
+An event carries only the job's outcome (see invocation_event), never its
+prompt inputs, API key or callback settings. Callback URLs are anyone's input,
+so requests to private, loopback and link-local addresses are refused, both
+when a job is submitted and again before every delivery, unless the operator
+allows private targets (e.g. for a receiver on the same host). Each delivery
+connects to the address its check approved, so the host cannot resolve to
+another address in between, and redirects are not followed.
+
+Delivered events are kept for a day, then pruned from the outbox together
+with events that were given up.
+
+Every request carries these headers:
+    X-NovaReel-Event:     e.g. "invocation.completed"
+    X-NovaReel-Delivery:  Unique event id (stable across retries, for deduplication)
+    X-NovaReel-Timestamp: Unix time the request was signed
+    X-NovaReel-Signature: "sha256=" + HMAC-SHA256(secret, "{timestamp}.{body}") in hex, if a secret is set
+"""
+
+import asyncio
+import functools
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import random
+import socket
+import sqlite3
+import ssl
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .concurrency import run_blocking
+from .records import InvocationRecord, format_timestamp
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_TIMEOUT_SECONDS = 10
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 600
+# Longest the dispatcher sleeps when nothing is due, so other processes' events are picked up
+IDLE_SECONDS = 5
+# How long delivered and given-up events stay in the outbox, and how often they are pruned
+RETENTION_SECONDS = 24 * 60 * 60
+PRUNE_INTERVAL_SECONDS = 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    delivery_id TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    event TEXT NOT NULL,
+    body TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    locked_until REAL,
+    last_error TEXT,
+    delivered_at REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS webhook_outbox_due ON webhook_outbox (delivered_at, next_attempt_at);
+"""
+
+
+class CallbackURLError(ValueError):
+    """A callback URL this server refuses to send requests to"""
+    pass
+
+
+def check_callback_url(url: str, allow_private: bool = False) -> Optional[str]:
+    """
+    Refuse a callback URL unless it is http(s) and its host only resolves to public addresses.
+
+    Resolves the host name (blocking). Raises CallbackURLError.
+
+    Returns:
+        An approved address of the host, for the request to connect to, or None if private
+        targets are allowed (the host is then resolved as usual)
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise CallbackURLError("callback_url must be an http:// or https:// URL")
+    if allow_private:
+        return None
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, parsed.port or None)
+    except (socket.gaierror, UnicodeError) as e:
+        raise CallbackURLError(f"callback_url host {parsed.hostname} does not resolve: {e}")
+    # In the resolver's order of preference, which the request then follows
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    for text in addresses:
+        address = ipaddress.ip_address(text.split("%", 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise CallbackURLError(
+                f"callback_url host {parsed.hostname} resolves to {address}, which is not a public address"
+            )
+    return addresses[0]
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection to a fixed address, whatever the host name resolves to now"""
+
+    def __init__(self, host: str, address: Optional[str] = None, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        if self.address is None:
+            return super().connect()
+        self.sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection to a fixed address; the certificate is still checked against the host name"""
+
+    def __init__(self, host: str, address: Optional[str] = None, **kwargs):
+        self.tls_context = ssl.create_default_context()
+        super().__init__(host, context=self.tls_context, **kwargs)
+        self.address = address
+
+    def connect(self):
+        if self.address is None:
+            return super().connect()
+        sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+        self.sock = self.tls_context.wrap_socket(sock, server_hostname=self.host)
+
+
+class _PinnedHandler(urllib.request.AbstractHTTPHandler):
+    """Opens http and https URLs through the pinned connections"""
+
+    def __init__(self, address: Optional[str]):
+        super().__init__()
+        self.address = address
+
+    def http_open(self, request):
+        return self.do_open(functools.partial(_PinnedHTTPConnection, address=self.address), request)
+
+    def https_open(self, request):
+        return self.do_open(functools.partial(_PinnedHTTPSConnection, address=self.address), request)
+
+    http_request = urllib.request.AbstractHTTPHandler.do_request_
+    https_request = urllib.request.AbstractHTTPHandler.do_request_
+
+
+def _opener(address: Optional[str]) -> urllib.request.OpenerDirector:
+    """
+    Opener connecting to `address` that raises HTTPError for every non-2xx response.
+
+    Built by hand rather than with build_opener, which would add redirect handling and
+    environment proxies: either would send the request somewhere the check never saw.
+    """
+    opener = urllib.request.OpenerDirector()
+    for handler in (_PinnedHandler(address), urllib.request.HTTPDefaultErrorHandler(),
+                    urllib.request.HTTPErrorProcessor()):
+        opener.add_handler(handler)
+    return opener
+
+
+def invocation_event(record: InvocationRecord) -> Dict[str, Any]:
+    """The data of a job's callback event: its outcome only, not how or by whom it was requested"""
+    return {
+        "job_id": record.job_id,
+        "invocation_arn": record.invocation_arn,
+        "status": record.status.value,
+        "video_url": record.video_url,
+        "failure_message": record.failure_message,
+        "created_at": format_timestamp(record.created_at),
+        "completed_at": format_timestamp(record.completed_at),
+        "failed_at": format_timestamp(record.failed_at),
+    }
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Signature header value for a request body"""
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def verify(secret: str, timestamp: str, body: bytes, signature: str) -> bool:
+    """Check a signature header, for use by receivers"""
+    return hmac.compare_digest(sign(secret, timestamp, body), signature)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before the next attempt: exponential with jitter, capped"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WebhookDispatcher:
+    """
+    Persistent outbox of callback events and the loop that delivers them.
+
+    Args:
+        path: SQLite outbox file (opened on first use)
+        secret: Shared secret for HMAC signatures (optional)
+        concurrency: Maximum number of deliveries in flight at once
+        max_attempts: Attempts before an event is given up
+        timeout_seconds: Per-request timeout
+        allow_private: Also deliver to private, loopback and link-local addresses
+    """
+
+    def __init__(self, path: str, secret: Optional[str] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+                 allow_private: bool = False):
+        self.path = path
+        self.secret = secret
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout_seconds = timeout_seconds
+        self.allow_private = allow_private
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune: Optional[float] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _insert(self, url: str, event: str, data: Dict[str, Any]) -> str:
+        delivery_id = uuid.uuid4().hex
+        now = time.time()
+        body = json.dumps({"event": event, "delivery_id": delivery_id, "created_at": now, "data": data})
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO webhook_outbox (delivery_id, url, event, body, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (delivery_id, url, event, body, now, now)
+            )
+        return delivery_id
+
+    async def enqueue(self, url: str, event: str, data: Dict[str, Any]) -> str:
+        """
+        Add an event to the outbox (on a thread, as the write may wait for another process) and wake the dispatcher.
+
+        Returns:
+            Delivery id of the event
+        """
+        delivery_id = await run_blocking(self._insert, url, event, data)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return delivery_id
+
+    def _claim_due(self, limit: int) -> List[Tuple]:
+        """Lock up to `limit` due events for this process, for as long as one delivery may take"""
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, delivery_id, url, event, body, attempts FROM webhook_outbox"
+                    " WHERE delivered_at IS NULL AND attempts < ? AND next_attempt_at <= ?"
+                    " AND (locked_until IS NULL OR locked_until < ?) ORDER BY next_attempt_at LIMIT ?",
+                    (self.max_attempts, now, now, limit)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE webhook_outbox SET locked_until = ? WHERE id = ?",
+                    [(now + self.timeout_seconds * 2, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _next_due_in(self) -> float:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT MIN(next_attempt_at) FROM webhook_outbox WHERE delivered_at IS NULL AND attempts < ?",
+                (self.max_attempts,)
+            ).fetchone()
+        if row[0] is None:
+            return IDLE_SECONDS
+        return min(max(row[0] - time.time(), 0), IDLE_SECONDS)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Remove events delivered or given up more than RETENTION_SECONDS ago.
+
+        Returns:
+            Number of removed events
+        """
+        cutoff = (time.time() if now is None else now) - RETENTION_SECONDS
+        with self._lock:
+            return self._db().execute(
+                "DELETE FROM webhook_outbox WHERE delivered_at < ? OR (attempts >= ? AND created_at < ?)",
+                (cutoff, self.max_attempts, cutoff)
+            ).rowcount
+
+    def _post(self, url: str, event: str, delivery_id: str, body: str):
+        """Send one request (blocking); raises on network errors, refused URLs and non-2xx responses"""
+        # Checked again here: the host may resolve differently than when the job was submitted
+        address = check_callback_url(url, self.allow_private)
+        payload = body.encode("utf-8")
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "novareel-mcp-webhooks",
+            "X-NovaReel-Event": event,
+            "X-NovaReel-Delivery": delivery_id,
+            "X-NovaReel-Timestamp": timestamp,
+        }
+        if self.secret:
+            headers["X-NovaReel-Signature"] = sign(self.secret, timestamp, payload)
+        request = urllib.request.Request(url, data=payload, headers=headers, method="POST")
+        with _opener(address).open(request, timeout=self.timeout_seconds) as response:
+            response.read()
+
+    def _record_attempt(self, row_id: int, attempts: int, error: Optional[str]):
+        now = time.time()
+        with self._lock:
+            if error is None:
+                self._db().execute(
+                    "UPDATE webhook_outbox SET attempts = ?, delivered_at = ?, locked_until = NULL, last_error = NULL"
+                    " WHERE id = ?",
+                    (attempts, now, row_id)
+                )
+            else:
+                self._db().execute(
+                    "UPDATE webhook_outbox SET attempts = ?, next_attempt_at = ?, locked_until = NULL, last_error = ?"
+                    " WHERE id = ?",
+                    (attempts, now + backoff_seconds(attempts), error, row_id)
+                )
+
+    async def _deliver(self, row: Tuple, semaphore: asyncio.Semaphore):
+        row_id, delivery_id, url, event, body, attempts = row
+        async with semaphore:
+            try:
+                await run_blocking(self._post, url, event, delivery_id, body)
+                error = None
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                error = str(e)
+        attempts += 1
+        await run_blocking(self._record_attempt, row_id, attempts, error)
+        if error is not None and attempts >= self.max_attempts:
+            print(f"Warning: Giving up webhook {delivery_id} to {url} after {attempts} attempts: {error}",
+                  file=sys.stderr)
+
+    async def deliver_due(self) -> int:
+        """
+        Deliver every event that is due, with bounded concurrency.
+
+        Returns:
+            Number of attempted deliveries
+        """
+        if self._last_prune is None or time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+            self._last_prune = time.monotonic()
+            await run_blocking(self.prune)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        attempted = 0
+        while True:
+            # No more than can start at once, so no claimed event waits out its lock in the queue
+            rows = await run_blocking(self._claim_due, self.concurrency)
+            if not rows:
+                return attempted
+            await asyncio.gather(*(self._deliver(row, semaphore) for row in rows))
+            attempted += len(rows)
+
+    async def run(self):
+        """Deliver events until cancelled, waking up as soon as one is enqueued"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await self.deliver_due()
+                timeout = await run_blocking(self._next_due_in)
+            except Exception as e:
+                print(f"Warning: Webhook delivery failed: {e}", file=sys.stderr)
+                timeout = IDLE_SECONDS
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def ensure_running(self):
+        """Start the dispatcher on the running event loop, unless it already runs"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """Stop the dispatcher; undelivered events stay in the outbox"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,10 @@
+"""
+Test configuration
+Makes the server package importable from the source tree; nothing here talks to AWS.
+"""
+
+import os
+import sys
+
+# Add src directory to path to import the server modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,41 @@
+"""
+Test factories
+Invocation records as the server stores them.
+"""
+
+import time
+from typing import Optional, Tuple
+
+from novareel_mcp_server.records import InvocationRecord, JobStatus
+
+BUCKET = "my-novareel-bucket"
+REGION = "us-east-1"
+DAY = 24 * 60 * 60
+# Records are created a second apart from here on, so their order survives the ISO 8601 round trip
+START = int(time.time()) - 2 * 60 * 60
+
+
+def make_record(index: int, status: JobStatus = JobStatus.COMPLETED, age_days: float = 0.0,
+                groups: Tuple[str, ...] = (), tenant: Optional[str] = None, **extra) -> InvocationRecord:
+    """A tracked job created about age_days ago; completed jobs finished 90 seconds after they started"""
+    job_id = f"{index:012x}abcd"
+    if tenant is not None:
+        extra["tenant"] = tenant
+    record = InvocationRecord(
+        job_id=job_id,
+        invocation_arn=f"arn:aws:bedrock:{REGION}:123456789012:async-invoke/{job_id}",
+        prompt=f"A lighthouse on a cliff at dusk, waves crashing below, take {index}",
+        duration_seconds=6,
+        fps=24,
+        dimension="1280x720",
+        seed=index,
+        task_type="TEXT_VIDEO",
+        s3_location=f"s3://{BUCKET}/{job_id}",
+        status=status,
+        created_at=START + index - age_days * DAY,
+        groups=groups,
+        extra=extra or None,
+    )
+    if status is JobStatus.COMPLETED:
+        record.completed_at = record.created_at + 90
+    return record
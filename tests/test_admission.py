@@ -0,0 +1,132 @@
+"""Admission control: queueing, slot hand-off, rejections and the tool-call middleware"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastmcp.exceptions import ToolError
+
+from novareel_mcp_server import admission, tenancy
+from novareel_mcp_server.admission import MIDDLEWARE_SUPPORTED, AdmissionController, AdmissionMiddleware
+from novareel_mcp_server.tenancy import DEFAULT_TENANT, api_key_id, configure_tenancy
+
+
+async def settle():
+    """Let queued calls reach their wait"""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_queued_call_gets_the_freed_slot():
+    controller = AdmissionController(max_in_flight=1)
+
+    async def main():
+        assert await controller.acquire("sweep", "acme") is None
+        waiting = asyncio.ensure_future(controller.acquire("sweep", "globex"))
+        await settle()
+        assert not waiting.done() and controller.snapshot()["waiting"] == 1
+
+        controller.release("sweep", "acme", 2.0)
+        assert await waiting is None
+
+    asyncio.run(main())
+    server = controller.snapshot()["server"]
+    assert (server["in_flight"], server["admitted"], server["queued"]) == (1, 2, 1)
+
+
+def test_freed_slots_go_to_waiters_that_fit():
+    controller = AdmissionController(max_in_flight=2, tenant_limit=1)
+
+    async def main():
+        assert await controller.acquire("sweep", "acme") is None
+        acme = asyncio.ensure_future(controller.acquire("sweep", "acme"))
+        await settle()
+        # Another tenant's call fits, so it does not wait behind acme's
+        assert await controller.acquire("sweep", "globex") is None
+        globex = asyncio.ensure_future(controller.acquire("sweep", "globex"))
+        await settle()
+
+        # acme's waiter is first but its tenant is still full: globex's takes the freed slot
+        controller.release("sweep", "globex")
+        assert await globex is None and not acme.done()
+        controller.release("sweep", "acme")
+        assert await acme is None
+
+    asyncio.run(main())
+    assert controller.stats(("tenant", "acme")).in_flight == controller.stats(("tenant", "globex")).in_flight == 1
+
+
+def test_full_queue_rejects_at_once():
+    controller = AdmissionController(max_in_flight=1, max_queued=1)
+
+    async def main():
+        await controller.acquire("sweep", "acme")
+        waiting = asyncio.ensure_future(controller.acquire("sweep", "acme"))
+        await settle()
+        denial = await controller.acquire("sweep", "acme")
+        waiting.cancel()
+        return denial
+
+    denial = asyncio.run(main())
+    assert denial["error"] == "Server is busy: too many calls are waiting"
+    assert denial["status"] == 503 and denial["retry_after_seconds"] >= 1.0
+    assert controller.snapshot("acme")["tenant"]["rejected_queue_full"] == 1
+
+
+def test_call_waiting_past_the_timeout_is_rejected():
+    controller = AdmissionController(max_in_flight=1, queue_timeout=0.05)
+
+    async def main():
+        await controller.acquire("sweep", "acme")
+        return await controller.acquire("sweep", "acme")
+
+    denial = asyncio.run(main())
+    assert denial["error"] == "Server is busy: no slot freed up within 0.05s"
+    stats = controller.snapshot()
+    assert stats["waiting"] == 0 and stats["server"]["rejected_timeout"] == 1
+    assert stats["server"]["max_wait_seconds"] >= 0.05
+
+
+def test_idle_tenants_are_forgotten_beyond_the_bound(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_TRACKED_TENANTS", 3)
+    controller = AdmissionController(tenant_limit=1)
+
+    async def main():
+        await controller.acquire("sweep", "busy")
+        for index in range(10):
+            await controller.acquire("sweep", f"tenant-{index}")
+            controller.release("sweep", f"tenant-{index}")
+
+    asyncio.run(main())
+    assert controller.snapshot()["tracked_tenants"] == 3
+    assert controller.stats(("tenant", "busy")).in_flight == 1
+
+
+@pytest.mark.skipif(not MIDDLEWARE_SUPPORTED, reason="fastmcp without middleware")
+def test_middleware_rejections_are_tool_errors(monkeypatch):
+    monkeypatch.setattr(tenancy, "get_http_headers", lambda include_all: {})
+    controller = AdmissionController(max_in_flight=1, max_queued=0)
+    middleware = AdmissionMiddleware(controller)
+    context = SimpleNamespace(message=SimpleNamespace(name="sweep"))
+
+    async def call_next(context):
+        return "done"
+
+    async def main():
+        assert await middleware.on_call_tool(context, call_next) == "done"
+        await controller.acquire("sweep", DEFAULT_TENANT)
+        await middleware.on_call_tool(context, call_next)
+
+    with pytest.raises(ToolError) as error:
+        asyncio.run(main())
+    assert json.loads(str(error.value))["status"] == 503
+
+    # Callers without a valid key are turned away before taking a slot
+    configure_tenancy({api_key_id("acme-key"): "acme"})
+    try:
+        with pytest.raises(ToolError, match="valid API key"):
+            asyncio.run(middleware.on_call_tool(context, call_next))
+    finally:
+        configure_tenancy()
+    assert controller.snapshot()["server"]["rejected_queue_full"] == 1
@@ -0,0 +1,73 @@
+"""Invocation export: record selection and the files written"""
+
+import csv
+import os
+
+import pytest
+
+from factories import make_record
+from novareel_mcp_server.archive import InvocationArchive
+from novareel_mcp_server.export import ExportError, iter_invocations, parse_filters, thread_safe_invocations, write_export
+from novareel_mcp_server.records import JobStatus, format_timestamp
+from novareel_mcp_server.sqlite_store import SQLiteInvocationStore
+from novareel_mcp_server.store import InvocationStore
+
+
+def test_in_memory_records_are_read_before_the_thread_starts():
+    store = InvocationStore()
+    for index in range(3):
+        store.add(make_record(index))
+
+    records = thread_safe_invocations(store, statuses={JobStatus.COMPLETED})
+    # The event loop keeps changing the store while the export thread writes
+    store.add(make_record(3))
+    store.set_status(store.get(make_record(0).job_id), "Failed")
+    assert [record.seed for record in records] == [0, 1, 2]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    archive = InvocationArchive(str(tmp_path / "archive.jsonl.gz"))
+    archive.append([make_record(index, age_days=10, tenant="acme").to_dict() for index in range(3)])
+    if request.param == "memory":
+        store = InvocationStore(str(tmp_path / "invocations.json"), archive)
+    else:
+        store = SQLiteInvocationStore(str(tmp_path / "invocations.db"), archive)
+    for index in range(3, 12):
+        status = JobStatus.FAILED if index % 3 == 0 else JobStatus.COMPLETED
+        store.add(make_record(index, status, age_days=12 - index, tenant="acme" if index % 2 else "other"))
+    return store
+
+
+def seeds(records):
+    return [record.seed for record in records]
+
+
+def test_filters_by_tenant_time_and_status(store):
+    assert seeds(iter_invocations(store, "acme")) == [3, 5, 7, 9, 11]
+    assert seeds(iter_invocations(store, "acme", include_archived=True)) == [0, 1, 2, 3, 5, 7, 9, 11]
+
+    since, until, statuses = parse_filters(format_timestamp(make_record(5, age_days=7).created_at),
+                                           format_timestamp(make_record(11, age_days=1).created_at), ["Completed"])
+    assert seeds(iter_invocations(store, None, since, until, statuses)) == [5, 7, 8, 10]
+    _, _, failed = parse_filters(statuses=["Failed"])
+    assert seeds(thread_safe_invocations(store, "acme", statuses=failed, include_archived=True)) == [3, 9]
+
+
+def test_invalid_filters_are_rejected():
+    with pytest.raises(ExportError, match="Unknown status"):
+        parse_filters(statuses=["Done"])
+    with pytest.raises(ExportError, match="Invalid time"):
+        parse_filters(since="last tuesday")
+
+
+def test_csv_export_rows(store, tmp_path):
+    path = str(tmp_path / "export.csv")
+    _, _, failed = parse_filters(statuses=["Failed"])
+    result = write_export(iter_invocations(store, statuses=failed), path, chunk_size=2)
+    assert result["rows"] == 3
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["seed"] for row in rows] == ["3", "6", "9"]
+    assert {row["tenant"] for row in rows} == {"acme", "other"}
+    assert not os.path.exists(path + ".tmp")
@@ -0,0 +1,73 @@
+"""Image input: header parsing, the input directory and the payload cache"""
+
+import io
+import os
+import struct
+import zlib
+
+import pytest
+
+from novareel_mcp_server.image_input import ImageInputError, encode_image_file, read_image_info
+
+
+def png_bytes(width, height):
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(header)) + b"IHDR" + header
+            + struct.pack(">I", zlib.crc32(b"IHDR" + header)) + b"\x00" * 64)
+
+
+def jpeg_bytes(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xd9"
+
+
+def test_png_and_jpeg_headers():
+    assert read_image_info(io.BytesIO(png_bytes(1280, 720))) == ("png", 1280, 720)
+    assert read_image_info(io.BytesIO(jpeg_bytes(1280, 720))) == ("jpeg", 1280, 720)
+
+
+@pytest.mark.parametrize("data", [
+    jpeg_bytes(1280, 720)[:24],                           # Cut off inside the frame header
+    b"\xff\xd8\xff\xe0\x00\x00" + b"\x00" * 32,          # Segment length below its own size
+    b"GIF89a" + b"\x00" * 32,
+])
+def test_malformed_headers_are_image_errors(data):
+    with pytest.raises(ImageInputError):
+        read_image_info(io.BytesIO(data))
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    directory = tmp_path / "images"
+    directory.mkdir()
+    (directory / "frame.png").write_bytes(png_bytes(1280, 720))
+    (tmp_path / "secret.png").write_bytes(png_bytes(1280, 720))
+    return str(directory)
+
+
+def test_relative_and_absolute_paths_inside_the_directory(input_dir):
+    first = encode_image_file("frame.png", "1280x720", input_dir)
+    second = encode_image_file(os.path.join(input_dir, "frame.png"), "1280x720", input_dir)
+    assert first["block"]["format"] == "png" and second["cached"]
+    assert second["sha256"] == first["sha256"]
+
+
+@pytest.mark.parametrize("path", ["../secret.png", "../missing.png", "/etc/passwd", "link.png"])
+def test_paths_outside_the_directory_are_refused_alike(input_dir, path):
+    os.symlink(os.path.join(os.path.dirname(input_dir), "secret.png"), os.path.join(input_dir, "link.png"))
+    with pytest.raises(ImageInputError, match="^Image paths must be inside the image input directory$"):
+        encode_image_file(path, "1280x720", input_dir)
+
+
+def test_read_errors_do_not_describe_the_server(input_dir):
+    os.mkdir(os.path.join(input_dir, "frames"))
+    for path in ("missing.png", "frames"):
+        with pytest.raises(ImageInputError) as error:
+            encode_image_file(path, "1280x720", input_dir)
+        assert str(error.value) == f"Cannot read image {path}"
+
+
+def test_dimension_must_match(input_dir):
+    with pytest.raises(ImageInputError, match="Image is 1280x720 but the video dimension is 1920x1080"):
+        encode_image_file("frame.png", "1920x1080", input_dir)
@@ -0,0 +1,53 @@
+"""Event-loop monitor: lag statistics, stall reports and the blocking call's stack"""
+
+import asyncio
+import time
+
+from novareel_mcp_server.loopmonitor import LoopMonitor
+
+
+def test_lag_above_the_threshold_is_a_stall():
+    monitor = LoopMonitor(threshold=0.1)
+    monitor._record(0.002)
+    monitor._record(0.3)
+
+    snapshot = monitor.snapshot()
+    assert snapshot["samples"] == 2 and snapshot["stalls"] == 1
+    assert snapshot["lag_seconds"] == {"last": 0.3, "max": 0.3, "average": 0.151}
+    assert (snapshot["histogram"]["le_0.001"], snapshot["histogram"]["le_0.005"],
+            snapshot["histogram"]["le_0.5"]) == (0, 1, 2)
+    assert [stall["duration_seconds"] for stall in snapshot["recent_stalls"]] == [0.3]
+
+    metrics = monitor.prometheus()
+    assert 'novareel_event_loop_lag_seconds_bucket{le="0.25"} 1\n' in metrics
+    assert 'novareel_event_loop_lag_seconds_bucket{le="+Inf"} 2\n' in metrics
+    assert "novareel_event_loop_stalls_total 1\n" in metrics
+
+
+def block_the_loop():
+    time.sleep(0.3)
+
+
+def test_blocking_call_is_reported_with_its_stack():
+    monitor = LoopMonitor(threshold=0.05, interval=0.01)
+    monitor.enabled = True
+
+    async def server():
+        await asyncio.sleep(0.05)
+        block_the_loop()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(monitor.watch(server()))
+    assert monitor.stalls >= 1 and monitor.lag_max >= 0.2
+    stall = max(monitor.recent_stalls, key=lambda stall: stall["duration_seconds"])
+    assert "block_the_loop" in stall["stack"]
+
+
+def test_disabled_monitor_does_not_sample():
+    monitor = LoopMonitor(interval=0.01)
+
+    async def server():
+        await asyncio.sleep(0.05)
+
+    asyncio.run(monitor.watch(server()))
+    assert monitor.samples == 0 and monitor._watchdog is None
@@ -0,0 +1,32 @@
+"""Background poller: claiming and refreshing unfinished jobs from either store"""
+
+import asyncio
+
+import pytest
+
+from factories import make_record
+from novareel_mcp_server.poller import BackgroundPoller
+from novareel_mcp_server.records import JobStatus
+from novareel_mcp_server.sqlite_store import SQLiteInvocationStore
+from novareel_mcp_server.store import InvocationStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InvocationStore(str(tmp_path / "invocations.json"))
+    return SQLiteInvocationStore(str(tmp_path / "invocations.db"))
+
+
+def test_poll_once_refreshes_unfinished_jobs(store):
+    for index in range(4):
+        store.add(make_record(index, JobStatus.IN_PROGRESS if index % 2 else JobStatus.COMPLETED))
+
+    async def refresh(record):
+        # Jobs added while a cycle runs must not disturb it
+        store.add(make_record(10 + record.seed, JobStatus.IN_PROGRESS))
+        store.set_status(record, "Completed")
+
+    poller = BackgroundPoller(store, refresh, interval_seconds=1, concurrency=2)
+    assert asyncio.run(poller.poll_once()) == 2
+    assert sorted(record.seed for record in store.unfinished()) == [11, 13]
@@ -0,0 +1,105 @@
+"""Post-processing: the ranged MP4 parser and background scheduling"""
+
+import asyncio
+import struct
+
+import pytest
+
+from novareel_mcp_server.postprocess import MAX_MOOV_BYTES, MP4Error, PostProcessor, parse_mp4
+
+
+def box(box_type, *children, payload=b""):
+    body = payload + b"".join(children)
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+
+def full_box(box_type, payload, version=0):
+    return box(box_type, payload=bytes([version, 0, 0, 0]) + payload)
+
+
+def video_moov(width=1280, height=720, frames=144, timescale=12288, duration=73728, version=0):
+    """moov of a 6-second 24 fps H.264 video; version 1 uses 64-bit times"""
+    if version == 1:
+        mvhd = struct.pack(">QQIQ", 0, 0, 1000, 6000) + b"\x00" * 80
+        mdhd = struct.pack(">QQIQ", 0, 0, timescale, duration) + b"\x00" * 4
+        tkhd = b"\x00" * 84 + struct.pack(">II", width << 16, height << 16)
+    else:
+        mvhd = struct.pack(">IIII", 0, 0, 1000, 6000) + b"\x00" * 80
+        mdhd = struct.pack(">IIII", 0, 0, timescale, duration) + b"\x00" * 4
+        tkhd = b"\x00" * 72 + struct.pack(">II", width << 16, height << 16)
+    stsd = struct.pack(">I", 1) + struct.pack(">I4s", 16, b"avc1") + b"\x00" * 8
+    stts = struct.pack(">III", 1, frames, 512)
+    stbl = box(b"stbl", full_box(b"stsd", stsd), full_box(b"stts", stts))
+    mdia = box(b"mdia", full_box(b"mdhd", mdhd, version), full_box(b"hdlr", b"\x00" * 4 + b"vide" + b"\x00" * 12),
+               box(b"minf", stbl))
+    return box(b"moov", full_box(b"mvhd", mvhd, version), box(b"trak", full_box(b"tkhd", tkhd, version), mdia))
+
+
+def ranged(data):
+    """read_range over data, recording every (offset, length) fetched"""
+    reads = []
+
+    def read_range(offset, length):
+        reads.append((offset, length))
+        return data[offset:offset + length]
+
+    return read_range, reads
+
+
+EXPECTED = {"duration_seconds": 6.0, "width": 1280, "height": 720, "codec": "avc1", "frame_count": 144, "fps": 24.0}
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_moov_after_the_media_is_read_without_the_media(version):
+    mdat = box(b"mdat", payload=b"\x00" * 100_000)
+    data = box(b"ftyp", payload=b"isom\x00\x00\x02\x00") + mdat + video_moov(version=version)
+    read_range, reads = ranged(data)
+
+    assert parse_mp4(read_range, len(data)) == {**EXPECTED, "size_bytes": len(data)}
+    assert sum(length for _, length in reads) < 1000
+
+
+def test_64_bit_box_sizes_are_skipped():
+    mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + 5000) + b"\x00" * 5000
+    data = mdat + video_moov()
+    assert parse_mp4(ranged(data)[0], len(data))["width"] == 1280
+
+
+@pytest.mark.parametrize("data", [
+    video_moov()[:-20],                                           # File ends inside the moov box
+    box(b"moov", box(b"trak", full_box(b"tkhd", b"\x00" * 10))),  # tkhd too short for its fields
+    box(b"moov", struct.pack(">I4s", 4, b"trak")),                # Child box smaller than its header
+    box(b"ftyp", payload=b"isom") + box(b"mdat", payload=b"\x00" * 64),
+    box(b"moov", full_box(b"mvhd", b"\x00" * 96)),                # No video track
+    struct.pack(">I4s", 4, b"ftyp") + video_moov(),
+], ids=["cut-moov", "short-tkhd", "short-child", "no-moov", "no-video-track", "short-top-level"])
+def test_truncated_or_odd_files_are_mp4_errors(data):
+    with pytest.raises(MP4Error):
+        parse_mp4(ranged(data)[0], len(data))
+
+
+def test_oversized_moov_is_refused_before_it_is_read():
+    data = struct.pack(">I4s", MAX_MOOV_BYTES + 9, b"moov")
+    read_range, reads = ranged(data)
+    with pytest.raises(MP4Error, match="too large"):
+        parse_mp4(read_range, MAX_MOOV_BYTES + 9)
+    assert reads == [(0, 16)]  # Only its header
+
+
+def test_schedule_reports_failures_to_on_done(tmp_path):
+    processor = PostProcessor(str(tmp_path))
+    results = []
+
+    async def failing_run(fn, *args):
+        raise RuntimeError("worker could not start")
+
+    async def on_done(result):
+        results.append(result)
+
+    async def main():
+        processor.run = failing_run
+        processor.schedule(on_done, print)
+        await asyncio.gather(*processor._tasks)
+
+    asyncio.run(main())
+    assert results == [{"error": "Post-processing failed: worker could not start"}]
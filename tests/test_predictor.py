@@ -0,0 +1,49 @@
+"""Completion-time predictor: ETAs and poll times with and without history"""
+
+from factories import make_record
+from novareel_mcp_server.predictor import CompletionPredictor
+from novareel_mcp_server.records import JobStatus
+
+
+def learnt(count=5):
+    """A predictor that saw `count` 6-second 720p jobs, each done after 90 seconds"""
+    predictor = CompletionPredictor()
+    predictor.rebuild(make_record(index) for index in range(count))
+    return predictor
+
+
+def test_without_history_the_rule_of_thumb_is_used():
+    job = make_record(10, JobStatus.IN_PROGRESS)
+    prediction = learnt(0).predict(job, now=job.created_at)
+    assert (prediction["eta_seconds"], prediction["eta_basis"], prediction["eta_samples"]) == (45, "default", 0)
+    # No poll before the fastest jobs are expected to be done
+    assert prediction["next_poll_in_seconds"] == 32
+
+
+def test_with_history_the_eta_is_the_median_generation_time():
+    job = make_record(10, JobStatus.IN_PROGRESS)
+    prediction = learnt().predict(job, now=job.created_at + 30)
+    assert (prediction["eta_seconds"], prediction["eta_basis"], prediction["eta_samples"]) == (60, "history", 5)
+    assert prediction["next_poll_in_seconds"] == 60
+
+
+def test_too_little_history_of_a_duration_borrows_the_rate_of_all_jobs():
+    assert learnt().estimate(12, "1280x720") == ((180.0,) * 5, "scaled", 5)
+    assert learnt(4).estimate(6, "1280x720")[1] == "default"
+
+
+def test_overdue_job_backs_off_within_the_poll_bounds():
+    job = make_record(10, JobStatus.IN_PROGRESS)
+    predictor = learnt()
+    prediction = predictor.predict(job, now=job.created_at + 200)
+    assert prediction["eta_seconds"] == 0 and prediction["next_poll_in_seconds"] == 55
+    assert predictor.next_poll_at(job, now=job.created_at + 1000) == job.created_at + 1000 + 60
+
+
+def test_only_completed_jobs_are_learnt():
+    failed = [make_record(index, JobStatus.FAILED) for index in range(5)]
+    for record in failed:
+        record.failed_at = record.created_at + 90
+    predictor = learnt(0)
+    predictor.rebuild(failed + [make_record(index, JobStatus.IN_PROGRESS) for index in range(5, 10)])
+    assert predictor.estimate(6, "1280x720")[1] == "default"
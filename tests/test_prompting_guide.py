@@ -0,0 +1,61 @@
+"""Prompting guide: sections, version revalidation and the prepared tool results"""
+
+import asyncio
+import json
+
+import pytest
+
+from novareel_mcp_server import prompting_guide
+from novareel_mcp_server.prompting_guide import (
+    GUIDE_VERSION, get_guide_sections, get_prompting_guide_response, get_serialized_guide, guide_tool,
+)
+
+
+def test_full_guide_and_single_section():
+    guide = get_prompting_guide_response()
+    assert guide["version"] == GUIDE_VERSION
+    assert set(guide) == {"version", *get_guide_sections()}
+
+    section = get_prompting_guide_response("camera_control")
+    assert section == {"version": GUIDE_VERSION, "section": "camera_control", "content": guide["camera_control"]}
+    assert json.loads(get_serialized_guide("camera_control")) == section["content"]
+
+
+def test_unknown_section_lists_the_available_ones():
+    response = get_prompting_guide_response("lens_flares")
+    assert response["error"] == "Unknown guide section: lens_flares"
+    assert response["available_sections"] == get_guide_sections()
+    assert get_serialized_guide("lens_flares") is None
+
+
+@pytest.mark.parametrize("known_version", [GUIDE_VERSION, f'"{GUIDE_VERSION}"'])
+def test_known_version_is_not_sent_again(known_version):
+    assert get_prompting_guide_response("camera_control", known_version) == {
+        "not_modified": True, "version": GUIDE_VERSION, "section": "camera_control"}
+
+
+def test_stale_version_gets_the_guide():
+    assert get_prompting_guide_response(known_version="0" * 16) is get_prompting_guide_response()
+
+
+@pytest.mark.skipif(prompting_guide.FunctionTool is None, reason="fastmcp without FunctionTool")
+def test_registered_tool_answers_with_prepared_results():
+    from fastmcp import FastMCP
+
+    mcp = FastMCP("test")
+
+    @guide_tool(mcp)
+    async def get_prompting_guide(section=None, known_version=None):
+        return get_prompting_guide_response(section, known_version)
+
+    # Direct callers still get the response dict
+    assert asyncio.run(get_prompting_guide("camera_control"))["section"] == "camera_control"
+
+    tool = asyncio.run(mcp.get_tool("get_prompting_guide"))
+    result = tool.convert_result(get_prompting_guide_response("camera_control"))
+    assert result is tool.convert_result(get_prompting_guide_response("camera_control"))
+    assert json.loads(result.content[0].text) == result.structured_content == get_prompting_guide_response("camera_control")
+
+    # Responses built per call are converted as usual
+    not_modified = tool.convert_result(get_prompting_guide_response(known_version=GUIDE_VERSION))
+    assert not_modified.structured_content == {"not_modified": True, "version": GUIDE_VERSION, "section": None}
@@ -0,0 +1,244 @@
+"""HTTP server against fake AWS clients: idempotent starts, cancellation and the video route"""
+
+import asyncio
+import io
+import os
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+from starlette.requests import Request
+
+from factories import BUCKET, REGION, make_record
+from novareel_mcp_server import server_http, tenancy
+from novareel_mcp_server.accounting import Accountant, Limits
+from novareel_mcp_server.store import InvocationStore
+from novareel_mcp_server.tenancy import api_key_id, configure_tenancy
+
+PROMPT = "A lighthouse on a cliff at dusk, waves crashing below, slow dolly in"
+
+
+class FakeBedrock:
+    """Starts jobs like Bedrock, returning the same job again for a clientRequestToken it has seen"""
+
+    # Like bedrock-runtime today: no operation stops an async invocation
+    meta = SimpleNamespace(service_model=SimpleNamespace(operation_names=["StartAsyncInvoke", "GetAsyncInvoke"]))
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = {}
+        self._by_token = {}
+
+    def start_async_invoke(self, **request):
+        self.requests.append(request)
+        token = request.get("clientRequestToken")
+        if token not in self._by_token:
+            job_id = f"{len(self.requests):012x}fake"
+            arn = f"arn:aws:bedrock:{REGION}:123456789012:async-invoke/{job_id}"
+            if token is None:
+                return {"invocationArn": arn}
+            self._by_token[token] = arn
+        return {"invocationArn": self._by_token[token]}
+
+    def get_async_invoke(self, invocationArn):
+        return {"invocationArn": invocationArn, "status": self.statuses.get(invocationArn, "InProgress")}
+
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    fake = FakeBedrock()
+    monkeypatch.setattr(server_http, "bedrock_client", fake)
+    monkeypatch.setattr(server_http, "s3_bucket", BUCKET)
+    monkeypatch.setattr(server_http, "store", InvocationStore())
+    monkeypatch.setattr(server_http, "accountant", Accountant())
+    return fake
+
+
+def start(prompt=PROMPT, **kwargs):
+    return asyncio.run(server_http._start_invocation(prompt, 6, 24, "1280x720", kwargs.pop("seed", None),
+                                                     "TEXT_VIDEO", persist=False, **kwargs))
+
+
+def test_repeated_key_replays_the_original_job(bedrock):
+    first = start(idempotency_key="launch-1")
+    again = start(idempotency_key="launch-1")
+    assert again["job_id"] == first["job_id"] and again["idempotent_replay"]
+    assert len(bedrock.requests) == 1
+
+
+def test_repeated_key_with_other_parameters_is_refused(bedrock):
+    first = start(idempotency_key="launch-1")
+    other = start(PROMPT + ", golden hour", idempotency_key="launch-1")
+    assert other == {"error": "idempotency_key was already used for a different request", "job_id": first["job_id"]}
+    assert len(bedrock.requests) == 1
+
+
+def test_key_reused_after_its_window_starts_a_new_job(bedrock, monkeypatch):
+    first = start(idempotency_key="launch-1")
+    later = time.time() + 25 * 60 * 60
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    again = start(idempotency_key="launch-1")
+    assert again["job_id"] != first["job_id"] and "idempotent_replay" not in again
+    tokens = [request["clientRequestToken"] for request in bedrock.requests]
+    assert len(tokens) == 2 and tokens[0] != tokens[1]
+
+
+def test_cancel_keeps_the_job_until_bedrock_reports_it_finished(bedrock):
+    job_id = start()["job_id"]
+    cancelled = asyncio.run(server_http.cancel_async_invoke(job_id))
+    assert cancelled["cancelled"] and cancelled["cancel_pending"] and not cancelled["remote_cancel"]
+    assert cancelled["status"] == "InProgress"
+    assert asyncio.run(server_http.cancel_async_invoke(job_id))["reason"] == "Cancellation already requested"
+
+    # Still unfinished, still polled and still charged while Bedrock renders it
+    record = server_http.store.get(job_id)
+    assert record in server_http.store.unfinished()
+    assert server_http.accountant.usage("tenant", "default")["jobs"] == 1
+
+    bedrock.statuses[record.invocation_arn] = "Completed"
+    asyncio.run(server_http._refresh_invocation(record))
+    record = server_http.store.get(job_id)
+    assert record.status.value == "Cancelled" and record.video_url is None
+    assert record.failure_message == "Cancelled by user"
+    assert server_http.accountant.usage("tenant", "default")["jobs"] == 1
+
+
+def test_bulk_cancel_filters_and_dry_run(bedrock):
+    jobs = [start(PROMPT + f", take {index}", group_id="batch")["job_id"] for index in range(3)]
+    start(PROMPT + ", keep this one", group_id="batch")
+
+    assert "error" in asyncio.run(server_http.bulk_cancel())
+    preview = asyncio.run(server_http.bulk_cancel(group_id="batch", prompt_contains="TAKE", dry_run=True))
+    assert preview["matched"] == 3 and sorted(job["job_id"] for job in preview["jobs"]) == sorted(jobs)
+    assert not any(record.get_extra("cancel_requested_at") for _, record in server_http.store.items())
+
+    result = asyncio.run(server_http.bulk_cancel(group_id="batch", prompt_contains="take"))
+    assert (result["matched"], result["cancelled"], result["failed"]) == (3, 3, 0)
+    # Jobs already being cancelled are not matched again
+    assert asyncio.run(server_http.bulk_cancel(group_id="batch", dry_run=True))["matched"] == 1
+
+
+def test_budgets_follow_the_tenant_of_the_api_key(bedrock, monkeypatch):
+    monkeypatch.setattr(server_http, "accountant", Accountant(Limits(jobs_per_minute=1)))
+    headers = {}
+    monkeypatch.setattr(tenancy, "get_http_headers", lambda include_all: headers)
+    configure_tenancy({api_key_id("acme-key"): "acme", api_key_id("other-key"): "other"})
+    try:
+        headers.update({"x-api-key": "acme-key"})
+        assert start()["success"]
+        assert start(PROMPT + ", again")["limit"] == "jobs_per_minute"
+
+        # Claiming acme's budget is refused, and the other key's own budget is untouched
+        headers.update({"x-api-key": "other-key", "x-novareel-tenant": "acme"})
+        assert "error" in start(PROMPT + ", again")
+        del headers["x-novareel-tenant"]
+        assert start(PROMPT + ", again")["success"]
+        assert server_http.accountant.usage("tenant", "acme")["jobs"] == 1
+        assert server_http.accountant.usage("tenant", "other")["jobs"] == 1
+    finally:
+        configure_tenancy()
+
+
+VIDEO = bytes(range(256)) * 64
+S3_ETAG = '"5d41402abc4b2a76b9719d911017c592"'
+
+
+class FakeS3:
+    """get_object over one stored video, with S3's Range and If-None-Match handling"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_object(self, Bucket, Key, Range=None, IfNoneMatch=None):
+        self.requests.append({"Key": Key, "Range": Range, "IfNoneMatch": IfNoneMatch})
+        if IfNoneMatch == S3_ETAG:
+            raise ClientError({"Error": {"Code": "304", "Message": "Not Modified"},
+                               "ResponseMetadata": {"HTTPStatusCode": 304}}, "GetObject")
+        response = {"ETag": S3_ETAG, "LastModified": datetime(2026, 1, 1, tzinfo=timezone.utc)}
+        body = VIDEO
+        if Range:
+            first, last = (int(value) for value in Range[len("bytes="):].split("-"))
+            body = VIDEO[first:last + 1]
+            response["ContentRange"] = f"bytes {first}-{last}/{len(VIDEO)}"
+        return {**response, "Body": io.BytesIO(body), "ContentLength": len(body)}
+
+
+@pytest.fixture
+def videos(bedrock, monkeypatch, tmp_path):
+    """A completed job of tenant acme, with its video in S3; returns the fake S3 client"""
+    s3 = FakeS3()
+    monkeypatch.setattr(server_http, "s3_client", s3)
+    monkeypatch.setattr(server_http.postprocessor, "artifacts_dir", str(tmp_path))
+    server_http.store.add(make_record(0, tenant="acme"))
+    configure_tenancy({api_key_id("acme-key"): "acme", api_key_id("other-key"): "other"})
+    yield s3
+    configure_tenancy()
+
+
+def get_video(identifier, **headers):
+    """Run the route like an ASGI server would; returns (status, headers, body)"""
+    scope = {
+        "type": "http", "asgi": {"spec_version": "2.4"}, "http_version": "1.1", "method": "GET",
+        "path": f"/videos/{identifier}", "query_string": b"", "path_params": {"job_id": identifier},
+        "headers": [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    messages = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    async def main():
+        response = await server_http.video_route(Request(scope))
+        await response(scope, receive, send)
+
+    asyncio.run(main())
+    start = messages[0]
+    response_headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    return start["status"], response_headers, b"".join(message.get("body", b"") for message in messages[1:])
+
+
+def test_s3_video_ranges_and_revalidation(videos):
+    job_id = make_record(0).job_id
+    status, headers, body = get_video(job_id, Authorization="Bearer acme-key", Range="bytes=100-199")
+    assert (status, body) == (206, VIDEO[100:200])
+    assert headers["content-range"] == f"bytes 100-199/{len(VIDEO)}" and headers["etag"] == S3_ETAG
+    assert videos.requests[-1] == {"Key": f"{job_id}/output.mp4", "Range": "bytes=100-199", "IfNoneMatch": None}
+
+    status, headers, body = get_video(job_id, Authorization="Bearer acme-key", If_None_Match=S3_ETAG)
+    assert (status, body) == (304, b"") and headers["etag"] == S3_ETAG
+
+
+def test_cached_video_ranges_and_revalidation(videos):
+    job_id = make_record(0).job_id
+    os.makedirs(os.path.join(server_http.postprocessor.artifacts_dir, job_id))
+    with open(os.path.join(server_http.postprocessor.artifacts_dir, job_id, "output.mp4"), "wb") as f:
+        f.write(VIDEO)
+
+    status, headers, body = get_video(job_id, Authorization="Bearer acme-key", Range="bytes=0-9")
+    assert (status, body) == (206, VIDEO[:10])
+    status, _, body = get_video(job_id, Authorization="Bearer acme-key", If_None_Match=headers["etag"])
+    assert (status, body) == (304, b"")
+    assert not videos.requests
+
+
+def test_other_tenants_videos_are_not_found(videos):
+    status, _, body = get_video(make_record(0).job_id, Authorization="Bearer other-key")
+    assert (status, body) == (404, b"Video not found or not completed")
+    assert not videos.requests
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Bearer unknown-key"},
+    {"Authorization": "Bearer other-key", "X_NovaReel_Tenant": "acme"},
+])
+def test_callers_without_a_valid_key_or_claiming_another_tenant_are_rejected(videos, headers):
+    status, _, _ = get_video(make_record(0).job_id, **headers)
+    assert status == 400
+    assert not videos.requests
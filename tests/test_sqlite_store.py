@@ -0,0 +1,175 @@
+"""Shared SQLite store: versioned writes, poll leases between workers, group counts and shared budgets"""
+
+import sqlite3
+import time
+
+import pytest
+
+from factories import make_record
+from novareel_mcp_server.accounting import Limits
+from novareel_mcp_server.archive import InvocationArchive
+from novareel_mcp_server.records import JobStatus
+from novareel_mcp_server.sqlite_store import SQLiteAccountant, SQLiteInvocationStore
+from novareel_mcp_server.store import RetentionPolicy
+from novareel_mcp_server.tenancy import Identity
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "invocations.db")
+
+
+def test_stale_update_is_rejected(db_path):
+    first, second = SQLiteInvocationStore(db_path, owner="a"), SQLiteInvocationStore(db_path, owner="b")
+    first.add(make_record(0, JobStatus.IN_PROGRESS))
+    job_id = make_record(0).job_id
+
+    # Both workers read the job; the second cancels it while the first's poll is in flight
+    polled, cancelled = first.get(job_id), second.get(job_id)
+    assert second.set_status(cancelled, "Cancelled")
+    polled.video_url = "https://example.com/output.mp4"
+    assert not first.set_status(polled, "Completed")
+
+    # The losing copy now shows the stored state, and writes based on it succeed
+    assert polled.status is JobStatus.CANCELLED and polled.video_url is None
+    polled.failure_message = "Cancelled by user"
+    assert first.update(polled)
+    assert second.get(job_id).failure_message == "Cancelled by user"
+    assert second.get(job_id).status is JobStatus.CANCELLED
+
+
+def test_add_to_group_invalidates_older_copies(db_path):
+    store = SQLiteInvocationStore(db_path)
+    store.add(make_record(0, JobStatus.IN_PROGRESS))
+    job_id = make_record(0).job_id
+
+    stale = store.get(job_id)
+    store.add_to_group("g", job_id)
+    assert not store.update(stale)
+    assert stale.groups == ("g",)
+    assert [record.job_id for record in store.group_members("g")] == [job_id]
+
+
+def test_poll_lease_is_taken_over_once_it_expires(db_path):
+    first = SQLiteInvocationStore(db_path, owner="a", lease_seconds=0.2)
+    second = SQLiteInvocationStore(db_path, owner="b", lease_seconds=0.2)
+    first.add(make_record(0, JobStatus.IN_PROGRESS))
+    record = make_record(0)
+
+    assert first.claim_poll(record)
+    assert not second.claim_poll(record)
+    assert first.claim_poll(record)  # Renewal by the owner
+    time.sleep(0.3)
+    assert second.claim_poll(record)
+    assert not first.claim_poll(record)
+
+
+def test_released_leases_are_taken_over_at_once(db_path):
+    first, second = SQLiteInvocationStore(db_path, owner="a"), SQLiteInvocationStore(db_path, owner="b")
+    for index in range(3):
+        first.add(make_record(index, JobStatus.IN_PROGRESS))
+    assert all(first.claim_poll(record) for record in first.unfinished())
+    assert not second.claim_poll(make_record(0))
+
+    first.release_polls()
+    assert all(second.claim_poll(record) for record in second.unfinished())
+
+
+def test_group_counts_follow_status_changes_and_compaction(db_path, tmp_path):
+    store = SQLiteInvocationStore(db_path, archive=InvocationArchive(str(tmp_path / "archive.jsonl.gz")),
+                                  retention=RetentionPolicy(max_age_days=1))
+    for index in range(3):
+        store.add(make_record(index, JobStatus.IN_PROGRESS, groups=("g",)))
+    store.add(make_record(3, JobStatus.IN_PROGRESS))
+    store.add_to_group("g", make_record(3).job_id)
+    assert store.group_counts("g") == {"InProgress": 4}
+    assert store.group_counts("h") is None
+
+    first, second = store.get(make_record(0).job_id), store.get(make_record(1).job_id)
+    assert store.set_status(first, "Completed") and store.set_status(second, "Failed")
+    assert store.group_counts("g") == {"InProgress": 2, "Completed": 1, "Failed": 1}
+
+    # Archived jobs move from the hot counts to the archive's, so the totals stay the same
+    store._execute("UPDATE invocations SET created_at = created_at - 259200 WHERE job_id IN (?, ?)",
+                   (first.job_id, second.job_id))
+    assert store.compact() == 2
+    assert store.group_counts("g") == {"InProgress": 2, "Completed": 1, "Failed": 1}
+
+
+def test_group_counts_are_filled_for_an_older_database(db_path):
+    store = SQLiteInvocationStore(db_path)
+    store.add(make_record(0, JobStatus.IN_PROGRESS, groups=("g",)))
+    store.add(make_record(1, groups=("g",)))
+    conn = sqlite3.connect(db_path)
+    conn.executescript("DROP TRIGGER group_member_added; DROP TRIGGER group_member_removed;"
+                       " DROP TRIGGER group_member_status; DROP TABLE group_status_counts;")
+    conn.close()
+
+    assert SQLiteInvocationStore(db_path).group_counts("g") == {"InProgress": 1, "Completed": 1}
+
+
+def test_adding_a_tracked_job_again_keeps_its_row(db_path):
+    first, second = SQLiteInvocationStore(db_path, owner="a"), SQLiteInvocationStore(db_path, owner="b")
+    assert first.add(make_record(0, JobStatus.IN_PROGRESS, groups=("g",)))
+    record = first.get(make_record(0).job_id)
+    assert first.claim_poll(record) and first.set_status(record, "Completed")
+
+    # Bedrock returned the same job for a reused clientRequestToken
+    assert not second.add(make_record(0, JobStatus.IN_PROGRESS, groups=("g",)))
+    stored = second.get(record.job_id)
+    assert stored.status is JobStatus.COMPLETED and stored.version == record.version
+    assert not second.claim_poll(stored)
+    assert second.group_counts("g") == {"Completed": 1}
+
+
+def test_failed_archive_write_keeps_jobs_hot(db_path, tmp_path, monkeypatch):
+    archive = InvocationArchive(str(tmp_path / "archive.jsonl.gz"))
+    store = SQLiteInvocationStore(db_path, archive=archive, retention=RetentionPolicy(archive_finished=True))
+    store.add(make_record(0, groups=("g",)))
+    store.add(make_record(1, JobStatus.IN_PROGRESS, groups=("g",)))
+
+    def fail(records):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(archive, "append", fail)
+    assert store.compact() == 0
+    assert make_record(0).job_id in store and store.group_counts("g") == {"Completed": 1, "InProgress": 1}
+
+    monkeypatch.undo()
+    assert store.compact() == 1
+    assert make_record(0).job_id not in store and store.group_counts("g") == {"Completed": 1, "InProgress": 1}
+    assert len(list(archive.iter_records())) == 1
+
+
+def test_workers_share_the_limits_of_a_tenant(db_path):
+    first, second = (SQLiteAccountant(SQLiteInvocationStore(db_path, owner=owner), Limits(jobs_per_minute=2))
+                     for owner in ("a", "b"))
+    acme, globex = Identity("acme", "key-1"), Identity("globex")
+
+    charge, _ = first.charge(acme, "g", 6)
+    assert second.charge(acme, None, 6)[1] is None
+    denied, denial = first.charge(acme, None, 6)
+    assert denied is None and denial["limit"] == "jobs_per_minute" and denial["used"] == 2
+    assert second.charge(globex, None, 6)[1] is None
+
+    # A refund by either worker frees the slot for both
+    second.refund(charge)
+    assert first.charge(acme, None, 6)[1] is None
+    usage = second.usage("tenant", "acme")
+    assert (usage["jobs"], usage["cost_units"], usage["last_minute"]["jobs"]) == (2, 12, 2)
+    assert usage["remaining"]["jobs_this_minute"] == 0
+    assert first.usage("api_key", "key-1")["jobs"] == 2 and first.usage("group", "g")["jobs"] == 0
+
+
+def test_stored_jobs_are_charged_once_for_an_older_database(db_path):
+    store = SQLiteInvocationStore(db_path)
+    store.add(make_record(0, tenant="acme", groups=("g",)))
+    store.add(make_record(1, JobStatus.IN_PROGRESS, tenant="acme"))
+    store.add(make_record(2, tenant="acme", age_days=40))
+    conn = sqlite3.connect(db_path)
+    conn.executescript("DROP TABLE charges; DROP TABLE usage_totals;")
+    conn.close()
+
+    for _ in range(2):
+        usage = SQLiteAccountant(SQLiteInvocationStore(db_path)).usage("tenant", "acme")
+        assert (usage["jobs"], usage["last_month"]["jobs"], usage["last_day"]["cost_units"]) == (3, 2, 12)
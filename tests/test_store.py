@@ -0,0 +1,178 @@
+"""Invocation store: JSON and snapshot persistence, journal replay, compaction and group counts"""
+
+import json
+import os
+
+import pytest
+
+from factories import make_record
+from novareel_mcp_server.accounting import Accountant
+from novareel_mcp_server.archive import InvocationArchive
+from novareel_mcp_server.predictor import CompletionPredictor
+from novareel_mcp_server.records import JobStatus
+from novareel_mcp_server.store import JOURNAL_MIN_RECORDS, InvocationStore, RetentionPolicy
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {
+        "path": str(tmp_path / "invocations.json"),
+        "snapshot_path": str(tmp_path / "invocations.snapshot"),
+        "archive": str(tmp_path / "archive.jsonl.gz"),
+    }
+
+
+def open_store(paths, snapshot=True, retention=None) -> InvocationStore:
+    store = InvocationStore(paths["path"], InvocationArchive(paths["archive"]), retention,
+                            snapshot_path=paths["snapshot_path"] if snapshot else None)
+    store.load()
+    return store
+
+
+def write_history(paths, records):
+    """Save records to the JSON file; the next snapshot store converts them into its snapshot"""
+    store = open_store(paths, snapshot=False)
+    for record in records:
+        store.add(record)
+    store.save()
+    return store
+
+
+def state(store: InvocationStore):
+    return {job_id: record.to_dict() for job_id, record in store.items()}
+
+
+def test_json_round_trip(paths):
+    store = open_store(paths, snapshot=False)
+    for index in range(5):
+        store.add(make_record(index, groups=("g",)))
+    store.save()
+
+    reloaded = open_store(paths, snapshot=False)
+    assert state(reloaded) == state(store)
+    assert reloaded.group_counts("g") == {"Completed": 5}
+
+
+def test_snapshot_conversion_and_lookups(paths):
+    records = [make_record(index, tenant="acme" if index % 2 else None, idempotency_key=f"key-{index}")
+               for index in range(20)]
+    store = write_history(paths, records)
+
+    converted = open_store(paths)
+    assert os.path.exists(paths["snapshot_path"])
+    assert len(converted) == 20
+    reloaded = open_store(paths)
+    assert state(reloaded) == state(store)
+    record = records[7]
+    assert reloaded.find(record.invocation_arn).job_id == record.job_id
+    assert reloaded.find(record.job_id, tenant="default") is None
+    assert reloaded.find_idempotent("key-7", tenant="acme").job_id == record.job_id
+    assert reloaded.find_variant(record.prompt, 6, 24, "1280x720", 7, "TEXT_VIDEO", tenant="acme") is not None
+    assert [job_id for job_id, _ in reloaded.tenant_items("acme")] == [r.job_id for r in records[1::2]]
+    assert len(list(reloaded.query(since=records[10].created_at))) == 10
+
+
+def test_journal_replay(paths):
+    write_history(paths, [make_record(index, JobStatus.IN_PROGRESS, groups=("g",)) for index in range(10)])
+
+    store = open_store(paths)
+    store.set_status(store.get(make_record(0).job_id), "Completed")
+    store.add(make_record(10, JobStatus.IN_PROGRESS, groups=("g",)))
+    store.add_to_group("h", make_record(3).job_id)
+    store.save()
+    with open(store.journal_path) as f:
+        assert len(f.readlines()) == 3
+
+    reloaded = open_store(paths)
+    assert state(reloaded) == state(store)
+    assert reloaded.group_counts("g") == {"InProgress": 10, "Completed": 1}
+    assert reloaded.group_counts("h") == {"InProgress": 1}
+    assert len(reloaded.unfinished()) == 10
+
+
+def test_snapshot_rewritten_when_journal_grows(paths):
+    store = open_store(paths)
+    store.add(make_record(0))
+    store.save()
+    for index in range(1, JOURNAL_MIN_RECORDS + 2):
+        store.add(make_record(index))
+    store.save()
+
+    assert not os.path.exists(store.journal_path)
+    reloaded = open_store(paths)
+    assert len(reloaded) == JOURNAL_MIN_RECORDS + 2
+    assert state(reloaded) == state(store)
+
+
+def test_compaction_on_load_keeps_group_counts(paths):
+    write_history(paths, [make_record(index, age_days=3, groups=("g",)) for index in range(4)]
+                  + [make_record(4, JobStatus.IN_PROGRESS, age_days=3, groups=("g",))])
+    open_store(paths)
+
+    compacted = open_store(paths, retention=RetentionPolicy(max_age_days=1))
+    assert len(compacted) == 1
+    assert compacted.group_counts("g") == {"InProgress": 1, "Completed": 4}
+    assert compacted.find_archived(make_record(0).job_id)["job_id"] == make_record(0).job_id
+
+
+def test_journal_removal_keeps_group_counts(paths):
+    write_history(paths, [make_record(index, JobStatus.IN_PROGRESS, groups=("g",)) for index in range(3)]
+                  + [make_record(3, age_days=3, groups=("g",))])
+    open_store(paths)
+
+    # The archived job is recorded in the journal and removed again on replay
+    compacted = open_store(paths, retention=RetentionPolicy(max_age_days=1))
+    with open(compacted.journal_path) as f:
+        assert [json.loads(line) for line in f] == [{"removed": make_record(3).job_id}]
+
+    reloaded = open_store(paths)
+    assert len(reloaded) == 3
+    assert reloaded.group_counts("g") == {"InProgress": 3, "Completed": 1}
+
+
+def test_compact_archives_finished_jobs_only(paths):
+    store = open_store(paths, retention=RetentionPolicy(archive_finished=True))
+    store.add(make_record(0))
+    store.add(make_record(1, JobStatus.IN_PROGRESS))
+    store.add(make_record(2, JobStatus.FAILED))
+
+    assert store.compact() == 2
+    assert [record.job_id for record in store.unfinished()] == [make_record(1).job_id]
+    assert store.get(make_record(0).job_id) is None
+    assert store.find_archived(make_record(2).job_id)["status"] == "Failed"
+
+
+def summaries(store: InvocationStore):
+    accountant, predictor = Accountant(), CompletionPredictor()
+    store.summarize(accountant, predictor)
+    usage = {key: accountant.usage(*key, now=0) for key in accountant._usage}
+    windows = {key: sorted(samples) for key, samples in
+               ((tuple(key), samples) for *key, samples in predictor.state()["windows"])}
+    return usage, windows
+
+
+def test_snapshot_summary_matches_rebuild(paths):
+    records = [make_record(index, JobStatus.IN_PROGRESS if index % 5 == 0 else JobStatus.COMPLETED,
+                           age_days=40 - index, groups=(f"g{index % 3}",), tenant=f"t{index % 2}",
+                           api_key=f"k{index % 4}") for index in range(40)]
+    write_history(paths, records)
+    open_store(paths)
+
+    # Changes after the snapshot: a completion, a new job, an archived job
+    store = open_store(paths, retention=RetentionPolicy(max_age_days=35))
+    store.set_status(store.get(records[20].job_id), "Completed")
+    store.get(records[20].job_id).completed_at = records[20].created_at + 120
+    store.update(store.get(records[20].job_id))
+    store.add(make_record(40, groups=("g1",), tenant="t0"))
+    store.save()
+
+    reloaded = open_store(paths)
+    assert reloaded._snapshot.meta["summary"]
+    rebuilt = InvocationStore()
+    for _, record in reloaded.items():
+        rebuilt.add(record)
+    usage, windows = summaries(reloaded)
+    rebuilt_usage, rebuilt_windows = summaries(rebuilt)
+    assert usage == rebuilt_usage
+    # The predictor keeps what it learnt from the 4 archived jobs
+    assert windows[(6, "1280x720")] == sorted(rebuilt_windows[(6, "1280x720")] + [90.0] * 4)
@@ -0,0 +1,93 @@
+"""Storyboards: splitting scenes into segments and the stitch lock"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from novareel_mcp_server import storyboard
+from novareel_mcp_server.storyboard import (
+    MAX_STORYBOARD_SEGMENTS, claim_stitch, plan_segments, release_stitch, split_duration, stitch_held,
+)
+from novareel_mcp_server.validation import MAX_DURATION_SECONDS, MIN_DURATION_SECONDS
+
+
+@pytest.mark.parametrize("duration, segments", [
+    (12, [12]),
+    (120, [120]),
+    (132, [120, 12]),
+    (126, [114, 12]),        # A 6-second rest would be too short, so the last two are balanced
+    (246, [120, 114, 12]),
+])
+def test_split_duration(duration, segments):
+    assert split_duration(duration) == segments
+    assert sum(segments) == duration
+    assert all(MIN_DURATION_SECONDS <= segment <= MAX_DURATION_SECONDS for segment in segments)
+
+
+def test_plan_segments_keeps_scene_order():
+    segments, errors = plan_segments([{"prompt": "Sunrise", "duration_seconds": 126}, {"prompt": "Sunset"}])
+    assert errors == []
+    assert [(segment["scene"], segment["duration_seconds"]) for segment in segments] == [(0, 114), (0, 12), (1, 12)]
+
+
+def test_plan_segments_reports_every_invalid_scene():
+    _, errors = plan_segments([
+        {"prompt": "Fine"},
+        {"prompt": "  "},
+        "not a scene",
+        {"prompt": "x" * 5000},
+        {"prompt": "Odd", "duration_seconds": 15},
+        {"prompt": "Short", "duration_seconds": 6},
+        {"prompt": "Text", "duration_seconds": "12"},
+    ])
+    assert [error.split(":")[0] for error in errors] == [f"Scene {index}" for index in range(1, 7)]
+    assert plan_segments([]) == ([], ["scenes must be a non-empty list"])
+
+
+def test_plan_segments_caps_the_segment_count():
+    scene = {"prompt": "Waves", "duration_seconds": MAX_DURATION_SECONDS}
+    segments, errors = plan_segments([scene] * MAX_STORYBOARD_SEGMENTS)
+    assert len(segments) == MAX_STORYBOARD_SEGMENTS and errors == []
+    _, errors = plan_segments([scene] * MAX_STORYBOARD_SEGMENTS + [{"prompt": "One more"}])
+    assert errors == [f"Storyboard needs {MAX_STORYBOARD_SEGMENTS + 1} segments, maximum is {MAX_STORYBOARD_SEGMENTS}"]
+
+
+@pytest.fixture
+def artifacts_dir(tmp_path):
+    os.mkdir(tmp_path / "board")
+    return str(tmp_path)
+
+
+def write_lock(artifacts_dir, **lock):
+    with open(os.path.join(artifacts_dir, "board", ".stitching"), "w") as f:
+        json.dump(lock, f)
+
+
+def test_stitch_lock_is_exclusive_until_released(artifacts_dir):
+    assert claim_stitch(artifacts_dir, "board")
+    assert stitch_held(artifacts_dir, "board")
+    assert not claim_stitch(artifacts_dir, "board")
+    release_stitch(artifacts_dir, "board")
+    assert not stitch_held(artifacts_dir, "board")
+    assert claim_stitch(artifacts_dir, "board")
+    assert os.listdir(os.path.join(artifacts_dir, "board")) == [".stitching"]
+
+
+def test_lock_of_a_dead_process_is_taken_over(artifacts_dir):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    write_lock(artifacts_dir, host=storyboard.socket.gethostname(), pid=process.pid, claimed_at=time.time())
+    assert not stitch_held(artifacts_dir, "board")
+    assert claim_stitch(artifacts_dir, "board")
+
+
+def test_lock_older_than_the_stitch_timeout_is_taken_over(artifacts_dir):
+    # Another host's process cannot be checked, so only its age frees the lock
+    write_lock(artifacts_dir, host="other-host", pid=1, claimed_at=time.time())
+    assert not claim_stitch(artifacts_dir, "board")
+    write_lock(artifacts_dir, host="other-host", pid=1, claimed_at=time.time() - storyboard.STITCH_TIMEOUT_SECONDS - 1)
+    assert claim_stitch(artifacts_dir, "board")
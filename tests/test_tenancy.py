@@ -0,0 +1,50 @@
+"""Tenancy: deriving a caller's tenant from its API key, a trusted gateway or neither"""
+
+import json
+
+import pytest
+
+from novareel_mcp_server.tenancy import (
+    DEFAULT_TENANT, Identity, TenantError, api_key_id, configure_tenancy, identity_from_headers, load_api_keys,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_tenancy():
+    yield
+    configure_tenancy()
+
+
+def test_without_keys_or_gateway_every_caller_is_the_default_tenant():
+    assert identity_from_headers({"x-api-key": "k"}) == Identity(DEFAULT_TENANT, api_key_id("k"))
+    assert identity_from_headers({"x-novareel-tenant": DEFAULT_TENANT}).tenant == DEFAULT_TENANT
+    with pytest.raises(TenantError, match="does not match"):
+        identity_from_headers({"x-novareel-tenant": "acme"})
+
+
+def test_api_key_map_decides_the_tenant(tmp_path):
+    path = tmp_path / "keys.json"
+    path.write_text(json.dumps({"acme-key": "acme", "globex-key": "globex"}))
+    configure_tenancy(load_api_keys(str(path)))
+
+    assert identity_from_headers({"authorization": "Bearer acme-key"}) == Identity("acme", api_key_id("acme-key"))
+    assert identity_from_headers({"x-api-key": "globex-key", "x-novareel-tenant": "globex"}).tenant == "globex"
+    for headers in ({}, {"x-api-key": "stolen"}, {"x-api-key": "globex-key", "x-novareel-tenant": "acme"}):
+        with pytest.raises(TenantError):
+            identity_from_headers(headers)
+
+
+def test_trusted_gateway_sets_the_tenant_header():
+    configure_tenancy(trust_tenant_header=True)
+    assert identity_from_headers({"x-novareel-tenant": "acme"}).tenant == "acme"
+    assert identity_from_headers({}).tenant == DEFAULT_TENANT
+    with pytest.raises(TenantError, match="Invalid"):
+        identity_from_headers({"x-novareel-tenant": "acme/../other"})
+
+
+@pytest.mark.parametrize("data", [["acme"], {"key": "not a tenant!"}, {"key": 7}])
+def test_malformed_api_key_files_are_refused(tmp_path, data):
+    path = tmp_path / "keys.json"
+    path.write_text(json.dumps(data))
+    with pytest.raises(ValueError):
+        load_api_keys(str(path))
@@ -0,0 +1,63 @@
+"""Generation parameter validation and the prompt linter"""
+
+import pytest
+
+from novareel_mcp_server.prompt_linter import PENALTIES, analyze_prompt, check_prompt
+from novareel_mcp_server.validation import validate_generation, validate_shots
+
+GOOD_PROMPT = "Wide shot of a lighthouse on a cliff at golden hour, camera slowly dollies toward the door"
+
+
+@pytest.mark.parametrize("task_type, duration", [("TEXT_VIDEO", 6), ("MULTI_SHOT_AUTOMATED", 12),
+                                                 ("MULTI_SHOT_AUTOMATED", 120)])
+def test_valid_generation_passes(task_type, duration):
+    assert validate_generation(GOOD_PROMPT, duration, 24, "1280x720", task_type) is None
+
+
+def test_every_invalid_parameter_is_reported_at_once():
+    error = validate_generation("", 13, 30, "1920x1080", "MULTI_SHOT_AUTOMATED")
+    assert set(error["parameter_errors"]) == {"duration_seconds", "fps", "dimension", "prompt"}
+    assert error["valid_fps"] == [24] and error["valid_dimensions"] == ["1280x720"]
+    assert error["valid_durations"][:2] == [12, 18]
+
+
+def test_unknown_task_type_and_long_prompt():
+    assert validate_generation(GOOD_PROMPT, 6, 24, "1280x720", "IMAGE_VIDEO")["valid_task_types"] == [
+        "MULTI_SHOT_AUTOMATED", "MULTI_SHOT_MANUAL", "TEXT_VIDEO"]
+    error = validate_generation("x" * 513, 6, 24, "1280x720", "TEXT_VIDEO")
+    assert error["error"] == "TEXT_VIDEO prompt must be at most 512 characters"
+
+
+def test_shot_errors_are_reported_together():
+    shots = [{"text": "A fox runs"}, {"text": ""}, {"text": "x", "image": {"format": "gif", "source": {}}}]
+    errors = validate_shots(shots, 12)
+    assert errors[0].startswith("duration_seconds=12 requires 2 shots")
+    assert errors[1:] == ["shots[1]: 'text' is required", "shots[2]: image format must be one of ['png', 'jpeg']"]
+    assert validate_shots([{"text": "A fox runs"}, {"text": "It jumps", "image_path": "a.png"}], 12) == []
+
+
+def test_well_formed_prompt_scores_full_marks():
+    analysis = analyze_prompt(GOOD_PROMPT, 12)
+    assert analysis["score"] == 100 and analysis["issues"] == []
+    assert analysis["matched"]["lighting"] == ["golden hour"]
+
+
+@pytest.mark.parametrize("prompt, duration, code", [
+    ("Close-up of a fox at dusk", 12, "too_short"),
+    ("A nice thing appears in a close-up shot under neon light at night", 12, "vague_terms"),
+    ("A red fox trots across fresh snow under soft backlighting at dawn", 12, "no_camera_terminology"),
+    ("Close-up shot of a red fox trotting across a quiet forest clearing", 12, "no_lighting"),
+    ("Close-up shot of a fox that was chased across the snow at golden hour", 12, "passive_language"),
+    ("Close-up of a fox at golden hour, it runs, it jumps, it rolls, it sleeps, it wakes", 12, "too_many_actions"),
+    ("Close-up shot of a red fox sleeping in the snow under soft golden hour light", 60, "too_few_actions"),
+])
+def test_each_rule_costs_its_penalty(prompt, duration, code):
+    analysis = analyze_prompt(prompt, duration)
+    assert [issue["code"] for issue in analysis["issues"]] == [code]
+    assert analysis["score"] == 100 - PENALTIES[code]
+
+
+def test_min_score_gate():
+    assert check_prompt("Close-up of a fox at dusk", 12, None) is None
+    assert check_prompt(GOOD_PROMPT, 12, 90) is None
+    assert check_prompt("Close-up of a fox at dusk", 12, 90)["prompt_analysis"]["score"] == 70
@@ -0,0 +1,193 @@
+"""Webhooks: event payloads, callback URL checks, signing and the outbox"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.error
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from factories import make_record
+from novareel_mcp_server import webhooks
+from novareel_mcp_server.records import JobStatus
+from novareel_mcp_server.webhooks import (
+    CallbackURLError, WebhookDispatcher, check_callback_url, invocation_event, sign, verify,
+)
+
+
+def test_event_carries_the_outcome_only():
+    record = make_record(0, JobStatus.FAILED, tenant="acme", api_key="secret-key", idempotency_key="k",
+                         callback_url="https://hooks.example.com/x", image_path="/srv/private.png")
+    record.failure_message = "ValidationException: bad prompt"
+
+    data = invocation_event(record)
+    assert set(data) == {"job_id", "invocation_arn", "status", "video_url", "failure_message",
+                         "created_at", "completed_at", "failed_at"}
+    assert data["status"] == "Failed" and data["failure_message"] == "ValidationException: bad prompt"
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:9000/hook", "http://10.0.0.8/hook", "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook", "http://[::ffff:192.168.1.1]/hook", "http://0.0.0.0/hook", "ftp://93.184.216.34/hook",
+])
+def test_internal_callback_urls_are_refused(url):
+    with pytest.raises(CallbackURLError):
+        check_callback_url(url)
+
+
+def test_public_and_allowed_private_callback_urls_pass():
+    check_callback_url("https://93.184.216.34/hook")
+    check_callback_url("http://127.0.0.1:9000/hook", allow_private=True)
+
+
+def test_claims_no_more_than_can_be_delivered_at_once(tmp_path):
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"), concurrency=2)
+    for index in range(5):
+        asyncio.run(dispatcher.enqueue("https://93.184.216.34/hook", "invocation.completed", {"index": index}))
+
+    assert len(dispatcher._claim_due(dispatcher.concurrency)) == 2
+    assert len(dispatcher._claim_due(dispatcher.concurrency)) == 2
+    assert len(dispatcher._claim_due(dispatcher.concurrency)) == 1
+
+
+def test_signature_covers_timestamp_and_body():
+    body = b'{"event": "invocation.completed"}'
+    signature = sign("s3cret", "1700000000", body)
+    assert signature == "sha256=" + hmac.new(b"s3cret", b"1700000000." + body, hashlib.sha256).hexdigest()
+    assert verify("s3cret", "1700000000", body, signature)
+    assert not verify("s3cret", "1700000001", body, signature)
+    assert not verify("other", "1700000000", body, signature)
+    assert not verify("s3cret", "1700000000", body + b" ", signature)
+
+
+@pytest.fixture
+def receiver():
+    """Local HTTP receiver recording (path, headers, body); /moved redirects to /hook"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append((self.path, self.headers, self.rfile.read(int(self.headers["Content-Length"]))))
+            if self.path == "/moved":
+                self.send_response(302)
+                self.send_header("Location", "/hook")
+            else:
+                self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.received = received
+    yield server
+    server.shutdown()
+
+
+def test_delivered_requests_are_signed(tmp_path, receiver):
+    server = receiver
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"), secret="s3cret", allow_private=True)
+
+    async def main():
+        url = f"http://127.0.0.1:{server.server_port}/hook"
+        delivery_id = await dispatcher.enqueue(url, "invocation.completed", {"job_id": "j"})
+        assert await dispatcher.deliver_due() == 1
+        return delivery_id
+
+    delivery_id = asyncio.run(main())
+    (_, headers, body), = server.received
+    assert headers["X-NovaReel-Event"] == "invocation.completed"
+    assert headers["X-NovaReel-Delivery"] == delivery_id == json.loads(body)["delivery_id"]
+    assert verify("s3cret", headers["X-NovaReel-Timestamp"], body, headers["X-NovaReel-Signature"])
+
+
+def test_failed_deliveries_are_retried_with_the_same_id(tmp_path, monkeypatch):
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"), secret="s3cret", max_attempts=3)
+    sent = []
+
+    def post(url, event, delivery_id, body):
+        sent.append(delivery_id)
+        if len(sent) < 2:
+            raise urllib.error.URLError("connection refused")
+
+    monkeypatch.setattr(dispatcher, "_post", post)
+    monkeypatch.setattr(webhooks, "backoff_seconds", lambda attempts: 0)
+
+    async def main():
+        delivery_id = await dispatcher.enqueue("https://93.184.216.34/hook", "invocation.completed", {})
+        assert await dispatcher.deliver_due() == 2
+        assert sent == [delivery_id, delivery_id]  # The retry keeps the delivery id
+        assert await dispatcher.deliver_due() == 0  # Delivered: not sent again
+
+    asyncio.run(main())
+    attempts, delivered_at, last_error = dispatcher._db().execute(
+        "SELECT attempts, delivered_at, last_error FROM webhook_outbox").fetchone()
+    assert attempts == 2 and delivered_at is not None and last_error is None
+
+
+def test_backoff_grows_and_stops_after_max_attempts(tmp_path, monkeypatch):
+    assert webhooks.backoff_seconds(1) <= 2 < webhooks.backoff_seconds(3) <= 8
+    assert webhooks.backoff_seconds(30) <= webhooks.BACKOFF_MAX_SECONDS
+
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"), max_attempts=2)
+
+    def post(url, event, delivery_id, body):
+        raise urllib.error.URLError("connection refused")
+
+    monkeypatch.setattr(dispatcher, "_post", post)
+    monkeypatch.setattr(webhooks, "backoff_seconds", lambda attempts: 0)
+
+    async def main():
+        await dispatcher.enqueue("https://93.184.216.34/hook", "invocation.failed", {})
+        return await dispatcher.deliver_due()
+
+    assert asyncio.run(main()) == 2
+    attempts, delivered_at, last_error = dispatcher._db().execute(
+        "SELECT attempts, delivered_at, last_error FROM webhook_outbox").fetchone()
+    assert attempts == 2 and delivered_at is None and "connection refused" in last_error
+
+
+def test_requests_go_to_the_checked_address(tmp_path, receiver, monkeypatch):
+    # The host would resolve elsewhere by now; the request still goes where the check approved
+    monkeypatch.setattr(webhooks, "check_callback_url", lambda url, allow_private: "127.0.0.1")
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"))
+    dispatcher._post(f"http://hooks.invalid:{receiver.server_port}/hook", "invocation.completed", "d", "{}")
+    (path, headers, _), = receiver.received
+    assert path == "/hook" and headers["Host"] == f"hooks.invalid:{receiver.server_port}"
+
+
+def test_redirects_are_not_followed(tmp_path, receiver):
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"), allow_private=True)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        dispatcher._post(f"http://127.0.0.1:{receiver.server_port}/moved", "invocation.completed", "d", "{}")
+    assert error.value.code == 302
+    assert [path for path, _, _ in receiver.received] == ["/moved"]
+
+
+def test_finished_events_are_pruned_after_the_retention(tmp_path, monkeypatch):
+    dispatcher = WebhookDispatcher(str(tmp_path / "outbox.db"), max_attempts=1)
+    outcomes = iter([None, urllib.error.URLError("connection refused"), None])
+
+    def post(url, event, delivery_id, body):
+        error = next(outcomes)
+        if error:
+            raise error
+
+    monkeypatch.setattr(dispatcher, "_post", post)
+
+    async def main():
+        for index in range(3):
+            await dispatcher.enqueue("https://93.184.216.34/hook", "invocation.completed", {"index": index})
+        assert await dispatcher.deliver_due() == 3
+        await dispatcher.enqueue("https://93.184.216.34/hook", "invocation.completed", {"index": 3})
+
+    asyncio.run(main())
+    assert dispatcher.prune() == 0
+    assert dispatcher.prune(time.time() + webhooks.RETENTION_SECONDS + 1) == 3
+    # Only the event still waiting for its delivery is left
+    assert dispatcher._db().execute("SELECT attempts, delivered_at FROM webhook_outbox").fetchall() == [(0, None)]